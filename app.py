@@ -3,9 +3,11 @@
 
 import eventlet
 eventlet.monkey_patch()
+from eventlet.hubs import trampoline
+from eventlet import patcher
 
 from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import subprocess
 import threading
 import os
@@ -14,6 +16,10 @@ import re
 import time
 import uuid
 import signal
+import ctypes
+import platform
+import json
+from array import array
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tu_secreto_seguro_media_server'
@@ -27,6 +33,22 @@ LOGS_DIR = "/app/datos"
 
 # Diccionario global para guardar procesos vivos
 procesos_activos = {}
+# Resumen de cada job en marcha (script_start) para los clientes que se conectan después
+jobs_info = {}
+
+# La salida de cada job solo va a su sala; el resto de eventos (start, complete,
+# stopped, job_resumen) son el canal de resumen y llegan a todos los clientes.
+INTERVALO_RESUMEN = 1.0  # segundos entre job_resumen de un mismo job
+
+def sala_job(process_id):
+    return f"job:{process_id}"
+
+# Prioridad por defecto de cada ejecución. Cada entrada de SCRIPTS_CONFIG puede
+# sobreescribirla con "prioridad" y cada ejecución desde el formulario también.
+#   io: clase de E/S (best-effort | idle), nice: 0-19,
+#   cpu_weight / io_weight: pesos cgroup v2 (1-10000, vacío = sin cgroup)
+PRIORIDAD_DEFECTO = {"io": "best-effort", "nice": 10, "cpu_weight": "", "io_weight": ""}
+CGROUP_BASE = os.environ.get("MM_CGROUP_BASE", "/sys/fs/cgroup/media-manager")
 
 # ==========================================
 # CONFIGURACIÓN DE SCRIPTS
@@ -35,28 +57,35 @@ SCRIPTS_CONFIG = {
     "01_organizer": {
         "nombre": "01. Organizador & Defrag",
         "archivo": "01_organizer_movies.py",
-        "desc": "Analiza, organiza y limpia basura. Opcional: Defrag.",
+        "desc": "Analiza, organiza y limpia basura. Opcional: Defrag. El Dry Run guarda el plan (plan_01_organizer.json).",
         "args_form": [
             {"name": "dry_run", "label": "Modo Simulación (Dry Run)", "type": "select", "options": [{"value": "yes", "label": "Sí"}, {"value": "no", "label": "No"}]},
-            {"name": "force_clean", "label": "Limpieza Profunda", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]}
+            {"name": "force_clean", "label": "Limpieza Profunda", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]},
+            {"name": "ejecutar_plan", "label": "Aplicar plan del último Dry Run (con Dry Run: solo validarlo)", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]},
+            {"name": "limite_mbs", "label": "Límite MB/s por disco (0 = sin límite)", "type": "number", "default": "0"},
+            {"name": "limite_iops", "label": "Límite IOPS por disco (0 = sin límite)", "type": "number", "default": "0"},
+            {"name": "adaptativo", "label": "Frenar con sesiones Plex", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]}
         ]
     },
     "02_permissions": {
         "nombre": "02. Reparar Permisos",
         "archivo": "02_fix_permissions.py",
+        "prioridad": {"io": "idle", "nice": 15},
         "desc": "Aplica chown nobody:users y chmod 2775/664 recursivamente.",
         "args_form": []
     },
     "03_catalog": {
         "nombre": "03. Catálogo Global",
         "archivo": "03_catalog_maker.py",
+        "prioridad": {"io": "idle", "nice": 15},
         "desc": "Genera catálogo CSV y HTML de Series y Películas.",
         "args_form": []
     },
     "analyze": {
         "nombre": "04. Análisis Biblioteca",
         "archivo": "04_analyze_library.py",
-        "desc": "Informe detallado por códec, resolución y tamaño.",
+        "prioridad": {"io": "idle", "nice": 15},
+        "desc": "Informe detallado por códec, resolución y tamaño. El modo resumen solo guarda el top y los totales (memoria constante).",
         "args_form": [
             {"name": "lib", "label": "Librería", "type": "select", "options": [
                 {"value": "1", "label": "Series"},
@@ -85,32 +114,58 @@ SCRIPTS_CONFIG = {
                 {"value": "2", "label": "Tamaño (Asc)"},
                 {"value": "3", "label": "Nombre"},
                 {"value": "4", "label": "Resolución"}
-            ]}
+            ]},
+            {"name": "fuente", "label": "Fuente de Resolución", "type": "select", "options": [
+                {"value": "disco", "label": "Disco (nombre de archivo)"},
+                {"value": "plex", "label": "Base de datos Plex (sin tocar el array)"}
+            ]},
+            {"name": "modo", "label": "Modo", "type": "select", "options": [
+                {"value": "completo", "label": "Completo (todos los ficheros)"},
+                {"value": "resumen", "label": "Resumen (top por tamaño y totales)"}
+            ]},
+            {"name": "top", "label": "Top N del resumen", "type": "number", "default": "500"},
+            {"name": "csv", "label": "Exportar tabla completa a CSV", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]}
         ]
     },
     "scanner": {
         "nombre": "05. Scanner Calidad",
         "archivo": "05_scanner_quality.py",
+        "prioridad": {"io": "idle", "nice": 15},
         "desc": "Detecta series con baja calidad para mover a Uploads.",
         "args_form": [
-            {"name": "porcentaje", "label": "Umbral de capítulos malos (%)", "type": "number", "default": "80"}
+            {"name": "porcentaje", "label": "Umbral de capítulos malos (%)", "type": "number", "default": "80"},
+            {"name": "fuente", "label": "Fuente de Resolución", "type": "select", "options": [
+                {"value": "disco", "label": "Disco (nombre de archivo)"},
+                {"value": "plex", "label": "Base de datos Plex (sin tocar el array)"}
+            ]}
         ]
     },
     "consolidator": {
         "nombre": "06. Consolidador Discos",
         "archivo": "06_disk_consolidator.py",
         "desc": "Mueve contenido disperso de 'Uploads/BajaCalidad' al último disco.",
-        "args_form": []
+        "args_form": [
+            {"name": "limite_mbs", "label": "Límite MB/s por disco (0 = sin límite)", "type": "number", "default": "0"},
+            {"name": "limite_iops", "label": "Límite IOPS por disco (0 = sin límite)", "type": "number", "default": "0"},
+            {"name": "adaptativo", "label": "Frenar con sesiones Plex", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]}
+        ]
     },
     "caps_analysis": {
         "nombre": "07. Análisis Capítulos",
         "archivo": "07_analyze_series_caps.py",
+        "prioridad": {"io": "idle", "nice": 15},
         "desc": "Inventario de resoluciones por capítulo y detección de mezclas.",
-        "args_form": []
+        "args_form": [
+            {"name": "fuente", "label": "Fuente de Resolución", "type": "select", "options": [
+                {"value": "disco", "label": "Disco (nombre de archivo)"},
+                {"value": "plex", "label": "Base de datos Plex (sin tocar el array)"}
+            ]}
+        ]
     },
     "baja_calidad": {
         "nombre": "08. Reporte Baja Calidad",
         "archivo": "08_analisis_carpeta_bajacalidad.py",
+        "prioridad": {"io": "idle", "nice": 15},
         "desc": "Genera reporte HTML interactivo de Series HD y Dibujos en BajaCalidad.",
         "args_form": []
     },
@@ -123,8 +178,74 @@ SCRIPTS_CONFIG = {
     "movimientos_sd": {
         "nombre": "10. Generar Movimientos SD (Pelis)",
         "archivo": "10_generar_movimientos_peliculas_sd.py",
-        "desc": "Detecta Películas < 720p, genera reporte HTML y script de movimiento.",
+        "desc": "Detecta Películas < 720p, genera reporte HTML y plan de movimiento.",
         "args_form": []
+    },
+    "reconciliar_plex": {
+        "nombre": "11. Reconciliar Disco vs Plex",
+        "archivo": "11_reconciliar_plex.py",
+        "prioridad": {"io": "idle", "nice": 15},
+        "desc": "Cruza el array con la DB de Plex: huérfanos, tamaños distintos y duplicados entre discos.",
+        "args_form": [
+            {"name": "uploads", "label": "Carpetas Uploads", "type": "select", "options": [
+                {"value": "excluir", "label": "Excluir"},
+                {"value": "incluir", "label": "Incluir"}
+            ]}
+        ]
+    },
+    "ejecutar_plan": {
+        "nombre": "12. Ejecutar Plan de Movimiento",
+        "archivo": "12_ejecutar_plan.py",
+        "desc": "Ejecuta un plan_*.json (05, 10...) con rename en el propio disco, en paralelo y reanudable.",
+        "args_form": [
+            {"name": "plan", "label": "Plan (archivo en datos)", "type": "text", "default": "plan_05_move_quality.json"},
+            {"name": "simular", "label": "Modo Simulación", "type": "select", "options": [{"value": "yes", "label": "Sí"}, {"value": "no", "label": "No"}]},
+            {"name": "hilos", "label": "Discos en paralelo", "type": "number", "default": "4"},
+            {"name": "umbral_extents", "label": "Reescribir si extents > (0 = no)", "type": "number", "default": "100"},
+            {"name": "limite_mbs", "label": "Límite MB/s por disco (0 = sin límite)", "type": "number", "default": "0"},
+            {"name": "limite_iops", "label": "Límite IOPS por disco (0 = sin límite)", "type": "number", "default": "0"},
+            {"name": "adaptativo", "label": "Frenar con sesiones Plex", "type": "select", "options": [{"value": "no", "label": "No"}, {"value": "yes", "label": "Sí"}]}
+        ]
+    },
+    "duplicados": {
+        "nombre": "13. Buscar Duplicados",
+        "archivo": "13_buscar_duplicados.py",
+        "prioridad": {"io": "idle", "nice": 15},
+        "desc": "Detecta ficheros idénticos entre discos y categorías (tamaño, hash parcial y hash completo).",
+        "args_form": [
+            {"name": "min_mb", "label": "Tamaño mínimo (MB)", "type": "number", "default": "50"}
+        ]
+    },
+    "fragmentacion": {
+        "nombre": "14. Análisis Fragmentación",
+        "archivo": "14_analisis_fragmentacion.py",
+        "prioridad": {"io": "idle", "nice": 15},
+        "desc": "Cuenta extents (FIEMAP) por disco y lista los ficheros y títulos más fragmentados.",
+        "args_form": [
+            {"name": "min_mb", "label": "Tamaño mínimo (MB)", "type": "number", "default": "100"},
+            {"name": "umbral", "label": "Fragmentado si extents >", "type": "number", "default": "100"}
+        ]
+    },
+    "tiering": {
+        "nombre": "15. Planificador Tiering",
+        "archivo": "15_planificador_tiering.py",
+        "prioridad": {"io": "idle", "nice": 15},
+        "desc": "Agrupa lo que se ve en pocos discos y lo frío en el resto para que duerman. Genera plan para 12.",
+        "args_form": [
+            {"name": "dias", "label": "Caliente si visto en los últimos (días)", "type": "number", "default": "90"},
+            {"name": "discos_calientes", "label": "Discos calientes (0 = automático)", "type": "number", "default": "0"},
+            {"name": "margen_gb", "label": "Margen libre por disco (GB)", "type": "number", "default": "50"}
+        ]
+    },
+    "reporte_completo": {
+        "nombre": "16. Reporte Completo",
+        "archivo": "16_reporte_completo.py",
+        "prioridad": {"io": "idle", "nice": 15},
+        "desc": "Genera los informes de 03, 04, 05, 07 y 08 recorriendo series y películas una sola vez.",
+        "args_form": [
+            {"name": "informes", "label": "Informes (separados por comas)", "type": "text", "default": "03,04,05,07,08"},
+            {"name": "porcentaje", "label": "Umbral de capítulos malos para 05 (%)", "type": "number", "default": "80"}
+        ]
     }
 }
 
@@ -133,7 +254,7 @@ SCRIPTS_CONFIG = {
 # ==========================================
 @app.route('/')
 def index():
-    return render_template('index.html', scripts=SCRIPTS_CONFIG)
+    return render_template('index.html', scripts=SCRIPTS_CONFIG, prioridad_defecto=PRIORIDAD_DEFECTO)
 
 @app.route('/api/files', methods=['GET'])
 def list_files():
@@ -141,7 +262,7 @@ def list_files():
     if os.path.exists(LOGS_DIR):
         try:
             for f in os.listdir(LOGS_DIR):
-                if f.startswith("report_") or f.endswith(('.log', '.sh', '.csv', '.html')):
+                if f.startswith("report_") or f.endswith(('.log', '.sh', '.csv', '.html', '.json')):
                     path = os.path.join(LOGS_DIR, f)
                     stats = os.stat(path)
                     files.append({
@@ -155,6 +276,18 @@ def list_files():
     files.sort(key=lambda x: x['mtime'], reverse=True)
     return jsonify(files)
 
+@app.route('/api/jobs/<process_id>/lines', methods=['GET'])
+def job_lines(process_id):
+    """Rango [desde, hasta) de líneas ya emitidas de un job (para el historial de la consola)."""
+    if not re.fullmatch(r"[0-9a-f]{8}", process_id):
+        return jsonify({'error': 'id inválido'}), 400
+    reg = obtener_registro(process_id)
+    if reg is None:
+        return jsonify({'error': 'job desconocido'}), 404
+    desde = max(0, request.args.get('desde', 0, type=int))
+    hasta = min(request.args.get('hasta', desde + LINEAS_POR_PETICION, type=int), desde + LINEAS_POR_PETICION)
+    return jsonify({'desde': desde, 'lineas': reg.leer(desde, hasta), 'total': reg.total})
+
 @app.route('/download/<path:filename>')
 def download_file(filename):
     return send_from_directory(LOGS_DIR, filename, as_attachment=True)
@@ -190,18 +323,365 @@ def ansi_to_html(text):
     result = ansi_escape.sub('', result)
     return result
 
+# ==========================================
+# REGISTRO DE SALIDA DE CADA JOB
+# ==========================================
+# Cada línea emitida se guarda en LOGS_DIR/jobs/<id>.log con un índice de
+# offsets en memoria, así el navegador solo guarda las últimas líneas y pide
+# las antiguas por rangos cuando el usuario sube con el scroll.
+JOBS_DIR = os.path.join(LOGS_DIR, "jobs")
+MAX_JOBS_GUARDADOS = 50
+LINEAS_POR_PETICION = 1000
+
+class RegistroJob:
+    def __init__(self, process_id, crear=False):
+        self.ruta = os.path.join(JOBS_DIR, f"{process_id}.log")
+        self.offsets = array('Q')
+        self.lock = threading.Lock()
+        self.f = None
+        if crear:
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            self.f = open(self.ruta, "wb")
+        else:
+            # Job de una ejecución anterior del servidor: se reconstruye el índice de una pasada
+            pos = 0
+            with open(self.ruta, "rb") as f:
+                for linea in f:
+                    self.offsets.append(pos)
+                    pos += len(linea)
+
+    @property
+    def total(self):
+        return len(self.offsets)
+
+    def escribir(self, linea):
+        """Añade una línea y devuelve su número (desde 0)."""
+        datos = (linea.replace("\n", " ") + "\n").encode("utf-8", "replace")
+        with self.lock:
+            n = len(self.offsets)
+            self.offsets.append(self.f.tell())
+            self.f.write(datos)
+        return n
+
+    def cerrar(self):
+        with self.lock:
+            if self.f:
+                self.f.close()
+                self.f = None
+
+    def leer(self, desde, hasta):
+        with self.lock:
+            if self.f: self.f.flush()
+            total = len(self.offsets)
+            desde, hasta = max(0, desde), min(total, hasta)
+            if desde >= hasta: return []
+            inicio = self.offsets[desde]
+            fin = self.offsets[hasta] if hasta < total else None
+        with open(self.ruta, "rb") as f:
+            f.seek(inicio)
+            datos = f.read(fin - inicio) if fin is not None else f.read()
+        return datos.decode("utf-8", "replace").split("\n")[:hasta - desde]
+
+registros_jobs = {}
+
+def obtener_registro(process_id):
+    reg = registros_jobs.get(process_id)
+    if reg is None and os.path.exists(os.path.join(JOBS_DIR, f"{process_id}.log")):
+        reg = registros_jobs[process_id] = RegistroJob(process_id)
+    return reg
+
+def podar_registros():
+    """Conserva solo los MAX_JOBS_GUARDADOS registros más recientes (disco y memoria)."""
+    try:
+        logs = sorted((os.path.join(JOBS_DIR, f) for f in os.listdir(JOBS_DIR) if f.endswith(".log")),
+                      key=os.path.getmtime)
+    except OSError:
+        return
+    for ruta in logs[:-MAX_JOBS_GUARDADOS]:
+        pid = os.path.basename(ruta)[:-4]
+        reg = registros_jobs.get(pid)
+        if reg and reg.f: continue  # job en marcha
+        registros_jobs.pop(pid, None)
+        try: os.remove(ruta)
+        except OSError: pass
+
+# ==========================================
+# PRIORIDAD (ioprio, nice, cgroup v2)
+# ==========================================
+IOPRIO_CLASES = {"best-effort": 2, "idle": 3}
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+SYS_IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}.get(platform.machine())
+# libc.syscall se resuelve aquí, en el padre: en el preexec_fn (hijo recién creado de un
+# proceso con hilos) un dlopen o una búsqueda de símbolos puede quedarse bloqueado
+try: _syscall = ctypes.CDLL(None, use_errno=True).syscall if SYS_IOPRIO_SET is not None else None
+except (OSError, AttributeError): _syscall = None
+
+def _entero(valor, minimo, maximo):
+    try: return max(minimo, min(maximo, int(valor)))
+    except (TypeError, ValueError): return None
+
+def resolver_prioridad(config, pedida):
+    """Defecto global <- entrada de SCRIPTS_CONFIG <- valores de la ejecución."""
+    prio = dict(PRIORIDAD_DEFECTO)
+    prio.update(config.get("prioridad", {}))
+    for k, v in (pedida or {}).items():
+        if k in prio and str(v).strip() != "": prio[k] = v
+    return {
+        "io": prio["io"] if prio["io"] in IOPRIO_CLASES else "best-effort",
+        "nice": _entero(prio["nice"], 0, 19) or 0,  # solo se baja la prioridad
+        "cpu_weight": _entero(prio["cpu_weight"], 1, 10000),
+        "io_weight": _entero(prio["io_weight"], 1, 10000),
+    }
+
+def describir_prioridad(prio, cgroup_info):
+    partes = [f"I/O {prio['io']}", f"nice {prio['nice']}"]
+    if prio["cpu_weight"]: partes.append(f"cpu.weight {prio['cpu_weight']}")
+    if prio["io_weight"]: partes.append(f"io.weight {prio['io_weight']}")
+    if cgroup_info: partes.append(cgroup_info)
+    return " · ".join(partes)
+
+def _escribir(ruta, valor):
+    with open(ruta, "w") as f:
+        f.write(valor)
+
+def crear_cgroup(process_id, prio):
+    """Crea CGROUP_BASE/job-<id> con los pesos pedidos. Devuelve (ruta | None, aviso)."""
+    if not prio["cpu_weight"] and not prio["io_weight"]: return None, ""
+    # Solo sobre cgroup v2 real (en v1 o sin /sys/fs/cgroup montado se crearían ficheros normales)
+    if not os.path.exists(os.path.join(os.path.dirname(CGROUP_BASE), "cgroup.controllers")):
+        return None, "cgroup v2 no disponible"
+    try:
+        os.makedirs(CGROUP_BASE, exist_ok=True)
+        # Los controladores deben estar delegados en el padre y en la base
+        for ruta in (os.path.dirname(CGROUP_BASE), CGROUP_BASE):
+            for ctrl in ("cpu", "io"):
+                try: _escribir(os.path.join(ruta, "cgroup.subtree_control"), f"+{ctrl}")
+                except OSError: pass
+        ruta = os.path.join(CGROUP_BASE, f"job-{process_id}")
+        os.mkdir(ruta)
+    except OSError as e:
+        return None, f"cgroup no disponible ({e.strerror})"
+    avisos = []
+    if prio["cpu_weight"]:
+        try: _escribir(os.path.join(ruta, "cpu.weight"), str(prio["cpu_weight"]))
+        except OSError as e: avisos.append(f"cpu.weight: {e.strerror}")
+    if prio["io_weight"]:
+        try: _escribir(os.path.join(ruta, "io.weight"), f"default {prio['io_weight']}")
+        except OSError as e: avisos.append(f"io.weight: {e.strerror}")
+    return ruta, "; ".join(avisos)
+
+def borrar_cgroup(ruta):
+    if not ruta: return
+    try: os.rmdir(ruta)
+    except OSError: pass
+
+def _ioprio_set(clase):
+    if _syscall is None or clase not in IOPRIO_CLASES: return
+    # best-effort: nivel 0-7 derivado de nice como hace el kernel; idle no usa nivel
+    nivel = min(7, (os.nice(0) + 20) // 5) if clase == "best-effort" else 0
+    _syscall(SYS_IOPRIO_SET, IOPRIO_WHO_PROCESS, 0, (IOPRIO_CLASES[clase] << IOPRIO_CLASS_SHIFT) | nivel)
+
+def preparar_hijo(prio, cgroup):
+    """preexec_fn: nueva sesión (para killpg), cgroup, nice e ioprio. Nada aquí puede lanzar."""
+    def _preexec():
+        os.setsid()
+        if cgroup:
+            try: _escribir(os.path.join(cgroup, "cgroup.procs"), "0")
+            except OSError: pass
+        try:
+            if prio["nice"]: os.nice(prio["nice"])
+        except OSError: pass
+        try: _ioprio_set(prio["io"])
+        except Exception: pass
+    return _preexec
+
+# ==========================================
+# LECTURA NO BLOQUEANTE DE LA SALIDA
+# ==========================================
+# El pipe se lee en modo no bloqueante y, cuando no hay datos, el green thread
+# se aparca en el hub de eventlet (trampoline) en vez de bloquear el proceso.
+TAM_LECTURA = 64 * 1024      # bytes por os.read
+MAX_LINEA = 8 * 1024         # bytes; lo que pase se corta (barras de progreso, volcados...)
+MAX_BUFFER_LECTURA = 256 * 1024
+# Segundos entre SIGTERM y SIGKILL. Los escaneos con checkpoint (scripts/checkpoints.py)
+# terminan la unidad en curso y guardan el progreso antes de salir con CODIGO_PARADA.
+PLAZO_PARADA = 30
+CODIGO_PARADA = 128 + signal.SIGTERM
+
+def _decodificar(b):
+    if len(b) > MAX_LINEA:
+        return b[:MAX_LINEA].decode('utf-8', errors='replace') + " … [línea cortada]"
+    return b.decode('utf-8', errors='replace')
+
+def leer_lineas(fd):
+    """Generador de líneas (str, sin fin de línea) de un pipe. \n, \r\n y \r separan líneas
+    como hacía el modo texto. Una línea de más de MAX_LINEA bytes se corta y se descarta
+    el resto hasta el siguiente salto, así el buffer nunca pasa de MAX_BUFFER_LECTURA."""
+    os.set_blocking(fd, False)
+    buf = bytearray()
+    descartando = False
+    while True:
+        try:
+            datos = os.read(fd, TAM_LECTURA)
+        except BlockingIOError:
+            trampoline(fd, read=True)
+            continue
+        eof = not datos
+        buf += datos
+        inicio = 0
+        while True:
+            fin = -1
+            for sep in (b'\n', b'\r'):
+                i = buf.find(sep, inicio)
+                if i != -1 and (fin == -1 or i < fin): fin = i
+            if fin == -1: break
+            # Un \r al final del bloque puede ser la mitad de un \r\n: esperar al siguiente
+            if buf[fin:fin + 1] == b'\r' and fin + 1 == len(buf) and not eof: break
+            salto = 2 if buf[fin:fin + 2] == b'\r\n' else 1
+            if descartando:
+                descartando = False
+            else:
+                yield _decodificar(bytes(buf[inicio:fin]))
+            inicio = fin + salto
+        del buf[:inicio]
+        if len(buf) > MAX_LINEA or len(buf) > MAX_BUFFER_LECTURA:
+            if not descartando:
+                yield _decodificar(bytes(buf))
+                descartando = True
+            del buf[:]
+        if eof:
+            if buf and not descartando: yield _decodificar(bytes(buf))
+            return
+        # Ceder tras cada bloque para que un job muy hablador no acapare el hub
+        eventlet.sleep(0)
+
+def esperar_proceso(proc, plazo=None):
+    """Espera cooperativa (no bloquea el hub). Devuelve el código o None si vence el plazo."""
+    limite = None if plazo is None else time.monotonic() + plazo
+    while proc.poll() is None:
+        if limite is not None and time.monotonic() >= limite:
+            return None
+        eventlet.sleep(0.1)
+    return proc.returncode
+
+# ==========================================
+# POOL DE SCRIPTS (opcional)
+# ==========================================
+# Con MM_POOL_SCRIPTS=1 los scripts se lanzan desde scripts/pool_scripts.py,
+# que ya tiene el intérprete arrancado, los módulos importados y los metadatos
+# de Plex cargados, en vez de arrancar 'python -u script.py' cada vez.
+USAR_POOL = os.environ.get("MM_POOL_SCRIPTS", "0") == "1"
+POOL_SOCKET = os.environ.get("MM_POOL_SOCKET", "/tmp/media-manager-pool.sock")
+# Socket sin parchear: send_fds (SCM_RIGHTS) necesita sendmsg del socket real
+_socket_real = patcher.original("socket")
+# Segundos para conectar y recibir el pid. El pool responde justo tras el fork,
+# así que solo se agota si está colgado o atascado con otra petición
+PLAZO_POOL = 30
+# returncode de un job cuyo pool se cerró sin decir cómo terminó
+CODIGO_POOL_PERDIDO = -1
+
+class ProcesoPool:
+    """Job lanzado por el pool. Imita lo que se usa de Popen: pid, stdout, poll() y returncode.
+    El socket es el real (sin parchear) pero no bloqueante: las esperas van por trampoline,
+    así el hub sigue atendiendo al resto de jobs durante el arranque."""
+    def __init__(self, archivo, args, prio, cgroup):
+        r, w = os.pipe()
+        sock = _socket_real.socket(_socket_real.AF_UNIX, _socket_real.SOCK_STREAM)
+        self._sock, self._buf, self._eof = sock, b"", False
+        limite = time.monotonic() + PLAZO_POOL
+        try:
+            sock.setblocking(False)
+            try:
+                sock.connect(POOL_SOCKET)
+            except BlockingIOError:
+                self._esperar(limite, write=True)
+                err = sock.getsockopt(_socket_real.SOL_SOCKET, _socket_real.SO_ERROR)
+                if err: raise OSError(err, os.strerror(err))
+            peticion = {"archivo": archivo, "args": args, "prioridad": prio, "cgroup": cgroup}
+            while True:
+                try:
+                    _socket_real.send_fds(sock, [json.dumps(peticion).encode("utf-8")], [w])
+                    break
+                except BlockingIOError:
+                    self._esperar(limite, write=True)
+            os.close(w)
+            w = None
+            resp = self._mensaje()
+            while resp is None and not self._eof:
+                self._esperar(limite, read=True)
+                resp = self._mensaje()
+            if resp is None: resp = {"error": "sin respuesta del pool"}
+        except Exception:
+            sock.close()
+            os.close(r)
+            if w is not None: os.close(w)
+            raise
+        if "error" in resp:
+            sock.close()
+            os.close(r)
+            raise OSError(resp["error"])
+        self.pid = resp["pid"]
+        self.returncode = None
+        self.stdout = os.fdopen(r, "rb", buffering=0)
+
+    def _esperar(self, limite, read=False, write=False):
+        """Aparca el greenlet hasta que el socket esté listo o venza el plazo del arranque."""
+        restante = limite - time.monotonic()
+        if restante <= 0: raise TimeoutError("el pool no responde")
+        trampoline(self._sock.fileno(), read=read, write=write, timeout=restante, timeout_exc=TimeoutError)
+
+    def _mensaje(self):
+        """Siguiente mensaje JSON del pool o None si aún no ha llegado. Marca _eof si el pool cerró."""
+        while b"\n" not in self._buf:
+            try: datos = self._sock.recv(4096)
+            except BlockingIOError: return None
+            if not datos:
+                self._eof = True
+                return None
+            self._buf += datos
+        linea, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(linea)
+
+    def poll(self):
+        if self.returncode is None:
+            try: msg = self._mensaje()
+            except OSError:
+                msg = None
+                self._eof = True
+            if msg and "codigo" in msg:
+                self.returncode = msg["codigo"]
+            elif self._eof:
+                # El pool se cerró sin mandar el código (murió o lo reiniciaron): se da por fallido
+                self.returncode = CODIGO_POOL_PERDIDO
+            if self.returncode is not None: self._sock.close()
+        return self.returncode
+
+def arrancar_pool():
+    """Lanza el pool en segundo plano si no hay uno escuchando (pool_scripts.py lo comprueba).
+    En su propia sesión: el grupo de app.py nunca debe ser el de un job ni el del pool."""
+    subprocess.Popen([sys.executable, "-u", os.path.join(SCRIPTS_DIR, "pool_scripts.py"), "--socket", POOL_SOCKET],
+                     start_new_session=True)
+
 # ==========================================
 # EJECUCIÓN
 # ==========================================
-def ejecutar_script_thread(script_key, params, process_id):
+def ejecutar_script_thread(script_key, params, process_id, prioridad=None):
     config = SCRIPTS_CONFIG.get(script_key)
     if not config: return
     
     script_path = os.path.join(SCRIPTS_DIR, config['archivo'])
     
     if not os.path.exists(script_path):
-        socketio.emit('script_output', {'process_id': process_id, 'data': f"<span style='color:red'>Error: No encuentro {config['archivo']}</span>"})
-        socketio.emit('script_complete', {'process_id': process_id, 'status': 'error', 'code': 404})
+        # Nadie tiene aún consola ni sala para este id: se anuncia el job y el error va a todos
+        podar_registros()
+        registro = registros_jobs[process_id] = RegistroJob(process_id, crear=True)
+        error = f"<span style='color:red'>Error: No encuentro {config['archivo']}</span>"
+        n = registro.escribir(error)
+        registro.cerrar()
+        socketio.emit('script_start', {'process_id': process_id, 'script_name': config['nombre'], 'comando': config['archivo'], 'prioridad': ''})
+        socketio.emit('script_output', {'process_id': process_id, 'data': error, 'n': n})
+        socketio.emit('script_complete', {'process_id': process_id, 'status': 'error', 'code': 404, 'lineas': registro.total})
         return
 
     cmd = [sys.executable, "-u", script_path]
@@ -212,68 +692,145 @@ def ejecutar_script_thread(script_key, params, process_id):
             # Convertimos 'force_clean' -> 'force-clean' para CLI
             clean_key = key.replace('_', '-')
             
-            # Caso especial script 1 (boolean flags)
-            if script_key == '01_organizer':
+            # Caso especial script 1 (boolean flags; los numéricos van como clave valor).
+            # --adaptativo toma yes/no en todos los scripts, así que va por el caso genérico
+            if script_key == '01_organizer' and key != 'adaptativo':
                 if val == 'yes': 
                     cmd.append(f"--{clean_key}")
+                elif val and val != 'no' and str(val).strip() != "":
+                    cmd.append(f"--{clean_key}")
+                    cmd.append(str(val))
             # Caso genérico (clave valor)
             else:
                 if val and str(val).strip() != "":
                     cmd.append(f"--{clean_key}")
                     cmd.append(str(val))
 
-    socketio.emit('script_start', {
+    prio = resolver_prioridad(config, prioridad)
+    cgroup, cgroup_info = crear_cgroup(process_id, prio)
+
+    podar_registros()
+    registro = registros_jobs[process_id] = RegistroJob(process_id, crear=True)
+
+    jobs_info[process_id] = {
         'process_id': process_id,
         'script_name': config['nombre'],
-        'comando': ' '.join(cmd)
-    })
-    
+        'comando': ' '.join(cmd),
+        'prioridad': describir_prioridad(prio, cgroup_info)
+    }
+    socketio.emit('script_start', jobs_info[process_id])
+
     try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            preexec_fn=os.setsid 
-        )
+        process = None
+        sala = sala_job(process_id)
+        if USAR_POOL:
+            try:
+                process = ProcesoPool(config['archivo'], cmd[3:], prio, cgroup)
+            except OSError as e:
+                aviso = f"<span style='color:orange'>Pool no disponible ({e}), arrancando intérprete nuevo</span>"
+                socketio.emit('script_output', {'process_id': process_id, 'data': aviso, 'n': registro.escribir(aviso)}, to=sala)
+        if process is None:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+                preexec_fn=preparar_hijo(prio, cgroup)
+            )
         
         procesos_activos[process_id] = process
+        ultimo_resumen = 0.0
         
-        for line in iter(process.stdout.readline, ''):
-            if line:
-                html_line = ansi_to_html(line.rstrip())
-                socketio.emit('script_output', {'process_id': process_id, 'data': html_line})
+        # leer_lineas ya quita los saltos: una línea vacía es una línea en blanco del script
+        for line in leer_lineas(process.stdout.fileno()):
+            html_line = ansi_to_html(line.rstrip())
+            n = registro.escribir(html_line)
+            socketio.emit('script_output', {'process_id': process_id, 'data': html_line, 'n': n}, to=sala)
+            ahora = time.monotonic()
+            if ahora - ultimo_resumen >= INTERVALO_RESUMEN:
+                ultimo_resumen = ahora
+                socketio.emit('job_resumen', {'process_id': process_id, 'lineas': n + 1})
         
-        process.wait()
+        process.stdout.close()
+        esperar_proceso(process)
+        registro.cerrar()
+        borrar_cgroup(cgroup)
+        jobs_info.pop(process_id, None)
         
         if process_id in procesos_activos:
             del procesos_activos[process_id]
 
         status = 'success' if process.returncode == 0 else 'error'
-        if process.returncode == -15 or process.returncode == -9:
+        if process.returncode in (-15, -9, CODIGO_PARADA):
             status = 'stopped'
 
         socketio.emit('script_complete', {
             'process_id': process_id,
             'status': status, 
-            'code': process.returncode
+            'code': process.returncode,
+            'lineas': registro.total
         })
             
     except Exception as e:
+        registro.cerrar()
+        borrar_cgroup(cgroup)
+        jobs_info.pop(process_id, None)
         if process_id in procesos_activos: del procesos_activos[process_id]
-        socketio.emit('script_output', {'process_id': process_id, 'data': f"<span style='color:red'>Error: {str(e)}</span>"})
+        socketio.emit('script_output', {'process_id': process_id, 'data': f"<span style='color:red'>Error: {str(e)}</span>"}, to=sala_job(process_id))
+
+@socketio.on('connect')
+def handle_connect():
+    # Jobs que ya estaban en marcha: el cliente crea sus consolas y se suscribe
+    emit('jobs_activos', list(jobs_info.values()))
+
+@socketio.on('subscribe_job')
+def handle_subscribe_job(data):
+    """Entra en la sala del job. Devuelve (ack) las líneas ya emitidas: el cliente las pide al historial."""
+    process_id = str(data.get('process_id', ''))
+    if not re.fullmatch(r"[0-9a-f]{8}", process_id):
+        return {'total': 0}
+    join_room(sala_job(process_id))
+    reg = obtener_registro(process_id)
+    return {'total': reg.total if reg else 0}
+
+@socketio.on('unsubscribe_job')
+def handle_unsubscribe_job(data):
+    leave_room(sala_job(str(data.get('process_id', ''))))
 
 @socketio.on('run_script')
 def handle_run_script(data):
     script_key = data.get('script')
     params = data.get('params', {})
+    prioridad = data.get('prioridad', {})
     
     process_id = str(uuid.uuid4())[:8]
     
-    thread = threading.Thread(target=ejecutar_script_thread, args=(script_key, params, process_id))
-    thread.daemon = True
-    thread.start()
+    # Green thread: la lectura del pipe cede el control al hub mientras no hay datos
+    socketio.start_background_task(ejecutar_script_thread, script_key, params, process_id, prioridad)
+
+def senal_grupo(proc, sig):
+    """killpg al grupo del job. Si el hijo aún no tiene sesión propia (comparte grupo con
+    este servidor), solo se señala su pid: un killpg ahí tiraría la web y todos los jobs."""
+    pgid = os.getpgid(proc.pid)
+    if pgid == os.getpgrp():
+        print(f"⚠️ PID {proc.pid} sigue en el grupo del servidor: se señala solo el proceso")
+        os.kill(proc.pid, sig)
+    else:
+        os.killpg(pgid, sig)
+
+def rematar_proceso(pid_key, proc):
+    """Tras el SIGTERM: espera PLAZO_PARADA sin bloquear el handler y, si sigue vivo, SIGKILL."""
+    try:
+        if esperar_proceso(proc, PLAZO_PARADA) is None:
+            senal_grupo(proc, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    except Exception as e:
+        print(f"Error matando proceso: {e}")
+    if pid_key in procesos_activos:
+        del procesos_activos[pid_key]
+    jobs_info.pop(pid_key, None)
+    socketio.emit('script_stopped', {'process_id': pid_key})
 
 @socketio.on('stop_script')
 def handle_stop_script(data):
@@ -283,23 +840,14 @@ def handle_stop_script(data):
         proc = procesos_activos[pid_key]
         try:
             print(f"🛑 Matando proceso UUID: {pid_key} PID: {proc.pid}")
-            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-            
-            try:
-                proc.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-            
-            if pid_key in procesos_activos:
-                del procesos_activos[pid_key]
-            
-            socketio.emit('script_stopped', {'process_id': pid_key})
-            
+            senal_grupo(proc, signal.SIGTERM)
+            socketio.start_background_task(rematar_proceso, pid_key, proc)
         except Exception as e:
             print(f"Error matando proceso: {e}")
     else:
         print(f"No se encontró proceso activo con ID {pid_key}")
 
 if __name__ == '__main__':
+    if USAR_POOL: arrancar_pool()
     print("🚀 Servidor V4.7 (Full Suite + Movimientos SD) iniciado en puerto 5000", flush=True)
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
@@ -1,6 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+"""
+Organizador de películas: limpia basura, junta en un disco los títulos
+repartidos entre varios (defrag) y genera el informe.
+
+El dry-run guarda el plan de fusión en PLAN_FILE y --ejecutar-plan lo aplica
+sin reanalizar. Ese plan tiene formato y ejecutor propios en vez de los de
+motor_movimientos, porque lo que hace es distinto:
+  - motor_movimientos resuelve cada item a renames dentro del mismo disco y
+    solo copia si se fija otro disco; una fusión de 01 siempre copia cada
+    fragmento al disco elegido y borra el original.
+  - El plan es por fichero, no por carpeta: cada uno lleva dev/ino/tamaño/mtime
+    y se valida con un stat antes de tocarlo (lo modificado desde el dry-run
+    se salta).
+  - Los hardlinks se copian una vez y se recrean en destino (nlink).
+Aplicado entero (sin títulos ni ficheros saltados), el plan queda marcado
+("aplicado") y no se vuelve a validar.
+"""
+
 import os
 import shutil
 import signal
@@ -10,11 +28,21 @@ from logging.handlers import RotatingFileHandler
 import sys
 import re
 import html
+import json
+import time
 import fcntl
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import List, Set, Dict
+from typing import List, Set, Dict, Tuple
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from uso_disco import UsoDisco
+from motor_movimientos import RESERVAS, copiar_datos
+import limitador_io
+from estado_discos import EstadoDiscos, DORMIDO
 
 # ==========================================
 # CONFIGURACIÓN VISUAL
@@ -39,6 +67,9 @@ BASE_PATH.mkdir(parents=True, exist_ok=True)
 LOG_FILE = BASE_PATH / "01_organizer_defrag.log"
 INFORME_FILE = BASE_PATH / "report_01_organizer.html"
 LOG_PATH_FALTANTES = BASE_PATH / "report_01_missing_meta.html"
+PLAN_FILE = BASE_PATH / "plan_01_organizer.json"
+MAX_ANTIGUEDAD_PLAN = 24 * 3600  # Más viejo: se avisa (cada fichero se valida igualmente)
+COLA_MOVIMIENTOS = 4  # Títulos en espera por disco destino antes de frenar el análisis
 
 CATEGORIAS = {
     "Peliculas HD": ("peliculas/Peliculas HD", "Peliculas"),
@@ -53,6 +84,11 @@ EXT_VIDEO = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.m2ts', '.mpg', '.m4v', '.
 JUNK_FILES = {'.ds_store', 'thumbs.db', '._.ds_store', 'desktop.ini', '.smbdelete'}
 BUFFER_SIZE = 10 * 1024**3  # 10 GB
 
+# Índice por disco (resumen de cada título) para no despertar discos dormidos.
+# Un disco dormido se sirve del índice hasta que despierte o pase MAX_ANTIGUEDAD_INDICE.
+INDICE_DIR = BASE_PATH / "cache"
+MAX_ANTIGUEDAD_INDICE = 7 * 24 * 3600
+
 # ==========================================
 # LOGGING
 # ==========================================
@@ -115,11 +151,13 @@ def get_disks() -> List[Path]:
 DISCOS_DISPONIBLES = get_disks()
 DISCO_MAP = {d.name: d for d in DISCOS_DISPONIBLES}
 
+# En dry-run no se mueve nada: aquí se apunta lo que cada disco ganaría o perdería con
+# las consolidaciones ya planificadas, para que el plan elija los mismos destinos que la ejecución real.
+ESPACIO_SIMULADO: Dict[str, int] = defaultdict(int)
+
 def obtener_espacio_libre(path: Path) -> int:
-    try:
-        st = os.statvfs(path)
-        return st.f_frsize * st.f_bavail
-    except OSError: return 0
+    # statvfs menos lo que tienen reservado las copias en curso
+    return RESERVAS.libre(str(path)) + ESPACIO_SIMULADO[path.name]
 
 def set_unraid_permissions(path: Path):
     try:
@@ -148,39 +186,69 @@ def ensure_path_permissions(path: Path):
 # ==========================================
 # LIMPIEZA
 # ==========================================
-def limpiar_vacios_recursivo(base_paths: List[Path]):
-    max_pasadas = 3
-    for i in range(max_pasadas):
-        cambios = False
-        for base in base_paths:
-            if not base.exists(): continue
-            for root, dirs, files in os.walk(base, topdown=False):
-                current = Path(root)
-                for f in files:
-                    if f.lower() in JUNK_FILES:
-                        try: (current / f).unlink()
-                        except: pass
+def _limpiar_dir(path: str, stats: Dict[str, int], partial: bool, basura: bool, vacios: bool) -> int:
+    """Limpia 'path' de abajo a arriba y devuelve cuántas entradas le quedan."""
+    if STOP_REQUESTED: return 1
+    try:
+        with os.scandir(path) as it: entradas = list(it)
+    except OSError: return 1
+
+    restantes = 0
+    for e in entradas:
+        try: es_dir = e.is_dir(follow_symlinks=False)
+        except OSError: es_dir = False
+        if es_dir:
+            if _limpiar_dir(e.path, stats, partial, basura, vacios) == 0 and vacios:
                 try:
-                    if not any(current.iterdir()):
-                        if current != base:
-                            current.rmdir()
-                            logger.debug(f"🧹 Eliminada carpeta vacía: {current}")
-                            cambios = True
+                    os.rmdir(e.path)
+                    stats["carpetas"] += 1
+                    logger.debug(f"🧹 Eliminada carpeta vacía: {e.path}")
+                    continue
                 except OSError: pass
-        if not cambios: break
-
-def limpiar_partial_huerfanos(discos: List[Path]):
-    count = 0
-    for disco in discos:
-        for root, _, files in os.walk(disco):
-            for f in files:
-                if f.endswith(".partial"):
-                    try: 
-                        (Path(root) / f).unlink()
-                        count += 1
-                    except: pass
-    if count > 0:
-        log_bonito(f"Eliminados {count} archivos .partial huérfanos", "exito")
+            restantes += 1
+            continue
+        nombre = e.name.lower()
+        if (basura and nombre in JUNK_FILES) or (partial and nombre.endswith(".partial")):
+            try:
+                os.unlink(e.path)
+                stats["partial" if nombre.endswith(".partial") else "basura"] += 1
+                continue
+            except OSError: pass
+        restantes += 1
+    return restantes
+
+def limpiar_arbol(base: Path, partial: bool = False, basura: bool = True, vacios: bool = True,
+                  borrar_raiz: bool = False) -> Dict[str, int]:
+    """
+    Una sola pasada ascendente: borra basura, .partial (opcional) y las carpetas
+    que quedan vacías, contando hijos restantes en vez de volver a recorrer.
+    """
+    stats = {"basura": 0, "partial": 0, "carpetas": 0, "raiz": 0}
+    if not base.is_dir(): return stats
+    restantes = _limpiar_dir(str(base), stats, partial, basura, vacios)
+    if borrar_raiz and restantes == 0:
+        try:
+            base.rmdir()
+            stats["raiz"] = 1
+        except OSError: pass
+    return stats
+
+def limpiar_discos(rutas_por_disco: Dict[str, List[Path]], **opciones) -> Dict[str, int]:
+    """Ejecuta limpiar_arbol en paralelo: un hilo por disco, sus rutas en serie."""
+    total = {"basura": 0, "partial": 0, "carpetas": 0, "raiz": 0}
+    def _trabajar(rutas):
+        parcial = {k: 0 for k in total}
+        for r in rutas:
+            for k, v in limpiar_arbol(r, **opciones).items(): parcial[k] += v
+        return parcial
+    if not rutas_por_disco: return total
+    with ThreadPoolExecutor(max_workers=len(rutas_por_disco)) as pool:
+        for parcial in pool.map(_trabajar, rutas_por_disco.values()):
+            for k, v in parcial.items(): total[k] += v
+    return total
+
+def rutas_contenido(discos: List[Path]) -> Dict[str, List[Path]]:
+    return {d.name: [d / "peliculas", d / "series"] for d in discos}
 
 # ==========================================
 # MOVIMIENTO (CORE)
@@ -209,7 +277,9 @@ def safe_copy_and_delete(src: Path, dst: Path, dry_run: bool = False) -> bool:
     dst_temp = dst.with_suffix(dst.suffix + ".partial")
     try:
         ensure_path_permissions(dst.parent)
-        shutil.copy2(src, dst_temp)
+        # Reserva + posix_fallocate: sin espacio falla aquí, no tras escribir medio fichero
+        copiar_datos(str(src), str(dst_temp))
+        shutil.copystat(src, dst_temp)
         if src.stat().st_size == dst_temp.stat().st_size:
             dst_temp.rename(dst)
             set_unraid_permissions(dst)
@@ -225,36 +295,250 @@ def safe_copy_and_delete(src: Path, dst: Path, dry_run: bool = False) -> bool:
             except: pass
         return False
 
-def fusionar_item(item_name: str, fragments: List[Path], dest_disk: Path, rel_path: str, dry_run: bool):
+# (st_dev, st_ino, tamaño, mtime) de origen -> primera copia en destino, para rehacer hardlinks
+# en vez de duplicar datos. Tras mover el primer nombre los demás quedan con st_nlink == 1.
+ENLACES_MOVIDOS: Dict[Tuple[int, int, int, int], Path] = {}
+
+def recrear_hardlink(src: Path, existente: Path, dst: Path, dry_run: bool = False) -> bool:
+    """Si otro enlace del mismo inodo ya se movió, enlaza dst a esa copia y borra src."""
+    if dst.exists(): return False
+    msg_mov = f"[{src.parts[2]} -> {dst.parts[2]}] {src.name} (hardlink)"
+    if dry_run:
+        log_bonito(f"[DRY-RUN] {msg_mov}", "movimiento")
+        return True
+    try:
+        ensure_path_permissions(dst.parent)
+        os.link(existente, dst)
+        src.unlink()
+        log_bonito(msg_mov, "movimiento")
+        return True
+    except OSError:
+        # Otro disco o la copia ya no existe: se hará una copia normal
+        return False
+
+# ==========================================
+# PLAN DE FUSIÓN
+# ==========================================
+# Una consolidación se planifica (qué fichero va a dónde, con su tamaño y mtime)
+# y luego se ejecuta. El dry-run guarda los planes en PLAN_FILE y --ejecutar-plan
+# los aplica tal cual, validando cada fichero con un stat en vez de reanalizar.
+def planificar_fusion(item_name: str, fragments: List[Path], dest_disk: Path, rel_path: str) -> dict:
+    """Operaciones para juntar el título en dest_disk. Solo lee (walk + stat)."""
     dest_base = dest_disk / rel_path / item_name
-    disk_name_dest = dest_disk.name
+    ops = []
+    fragmentos = []
+    bytes_por_disco: Dict[str, int] = defaultdict(int)
+    vistos = set()
     for frag_path in fragments:
-        if len(frag_path.parts) > 2 and frag_path.parts[2] == disk_name_dest:
+        if len(frag_path.parts) > 2 and frag_path.parts[2] == dest_disk.name:
             continue
-        for r, _, files in os.walk(frag_path):
+        fragmentos.append(str(frag_path))
+        for r, dirs, files in os.walk(frag_path):
             if ".RecycleBin" in r: continue
-            if STOP_REQUESTED: break
-            for f in files:
+            dirs.sort()
+            for f in sorted(files):
                 if f.endswith(UPLOAD_SUFFIX): continue
                 src = Path(r) / f
                 if f.lower() in JUNK_FILES:
-                    if not dry_run:
-                        try: src.unlink()
-                        except: pass
+                    ops.append({"tipo": "borrar", "src": str(src)})
                     continue
                 try:
                     rel_file = src.relative_to(frag_path)
-                    dst = dest_base / rel_file
-                    safe_copy_and_delete(src, dst, dry_run)
-                except ValueError: continue
-        
-        if not dry_run and not STOP_REQUESTED:
-            limpiar_vacios_recursivo([frag_path])
+                    st = src.stat()
+                except (ValueError, OSError): continue
+                ops.append({
+                    "tipo": "mover", "src": str(src), "dst": str(dest_base / rel_file),
+                    "tamano": st.st_size, "mtime_ns": st.st_mtime_ns,
+                    "dev": st.st_dev, "ino": st.st_ino, "nlink": st.st_nlink,
+                })
+                # Hardlinks: los datos solo se copian (y se liberan) una vez
+                if (st.st_dev, st.st_ino) not in vistos:
+                    vistos.add((st.st_dev, st.st_ino))
+                    bytes_por_disco[frag_path.parts[2]] += st.st_size
+    return {
+        "titulo": item_name, "subpath": rel_path, "disco_destino": dest_disk.name,
+        "fragmentos": fragmentos, "bytes": sum(bytes_por_disco.values()),
+        "bytes_por_disco": dict(bytes_por_disco), "operaciones": ops,
+    }
+
+def simular_fusion(plan_item: dict):
+    """Dry-run: el destino pierde lo que recibe y cada origen gana lo que deja."""
+    ESPACIO_SIMULADO[plan_item["disco_destino"]] -= plan_item["bytes"]
+    for disco, n in plan_item["bytes_por_disco"].items():
+        ESPACIO_SIMULADO[disco] += n
+
+def comprobar_operacion(op: dict) -> str:
+    """'ok', 'hecha' (ya está en destino) o el motivo por el que el plan ya no vale. Solo stat."""
+    try:
+        st = os.stat(op["src"])
+    except FileNotFoundError:
+        try:
+            if os.stat(op["dst"]).st_size == op["tamano"]: return "hecha"
+        except OSError: pass
+        return "origen desaparecido"
+    except OSError as e:
+        return f"origen ilegible ({e.strerror})"
+    if st.st_size != op["tamano"] or st.st_mtime_ns != op["mtime_ns"]:
+        return "origen modificado desde el plan"
+    return "ok"
+
+def ejecutar_fusion(plan_item: dict, dry_run: bool, operaciones: List[dict] = None, reserva: Path = None):
+    """'reserva': disco destino si el título tiene su espacio reservado en RESERVAS. Cada fichero
+    devuelve su parte justo antes de que copiar_datos reserve la suya; el resto se libera al final."""
+    restante = plan_item["bytes"] if reserva else 0
+    liberados = set()
+    try:
+        for op in plan_item["operaciones"] if operaciones is None else operaciones:
+            if STOP_REQUESTED: break
+            src = Path(op["src"])
+            if op["tipo"] == "borrar":
+                if not dry_run:
+                    try: src.unlink()
+                    except: pass
+                continue
+            dst = Path(op["dst"])
+            if restante and (op["dev"], op["ino"]) not in liberados:
+                liberados.add((op["dev"], op["ino"]))
+                parte = min(restante, op["tamano"])
+                RESERVAS.liberar(str(reserva), parte)
+                restante -= parte
+            clave = (op["dev"], op["ino"], op["tamano"], op["mtime_ns"])
+            if clave in ENLACES_MOVIDOS:
+                if recrear_hardlink(src, ENLACES_MOVIDOS[clave], dst, dry_run): continue
+            if safe_copy_and_delete(src, dst, dry_run) and op["nlink"] > 1:
+                ENLACES_MOVIDOS[clave] = dst
+    finally:
+        if restante: RESERVAS.liberar(str(reserva), restante)
+
+    if not dry_run and not STOP_REQUESTED:
+        for frag in plan_item["fragmentos"]:
+            if limpiar_arbol(Path(frag), borrar_raiz=True)["raiz"]:
+                log_bonito(f"Fragmento limpio y eliminado: {frag}", "exito")
+
+# ==========================================
+# MOVEDORES (PIPELINE ANÁLISIS -> COPIAS)
+# ==========================================
+class Movedores:
+    """
+    Un hilo por disco destino, cada uno con su cola acotada. El análisis encola
+    cada título en cuanto lo planifica y sigue con el siguiente, así la lectura
+    de unos discos se solapa con las copias hacia otros. Si la cola de un disco
+    se llena, el análisis espera. El informe lo sigue construyendo el hilo de
+    análisis en orden, así que no depende de cuándo termina cada copia.
+    """
+    def __init__(self, dry_run: bool, tam_cola: int = COLA_MOVIMIENTOS):
+        self.dry_run = dry_run
+        self.tam_cola = tam_cola
+        self.colas: Dict[str, queue.Queue] = {}
+        self.hilos: List[threading.Thread] = []
+
+    def encolar(self, plan_item: dict):
+        disco = plan_item["disco_destino"]
+        if disco not in self.colas:
+            cola = queue.Queue(maxsize=self.tam_cola)
+            hilo = threading.Thread(target=self._trabajar, args=(cola,), name=f"mover-{disco}", daemon=True)
+            self.colas[disco] = cola
+            self.hilos.append(hilo)
+            hilo.start()
+        self.colas[disco].put(plan_item)
+
+    def _trabajar(self, cola: queue.Queue):
+        while True:
+            item = cola.get()
+            if item is None: return
+            destino = DISCO_MAP[item["disco_destino"]]
             try:
-                if frag_path.exists() and not any(frag_path.iterdir()):
-                    frag_path.rmdir()
-                    log_bonito(f"Fragmento limpio y eliminado: {frag_path}", "exito")
-            except OSError: pass
+                # Tras una parada ejecutar_fusion no copia nada, pero libera la reserva
+                ejecutar_fusion(item, self.dry_run, reserva=None if self.dry_run else destino)
+            except Exception as e:
+                log_bonito(f"Error consolidando '{item['titulo']}': {e}", "error")
+            if not self.dry_run:
+                for d in {destino.name, *(Path(f).parts[2] for f in item["fragmentos"])}: invalidar_indice(Path("/mnt") / d)
+
+    def terminar(self):
+        for cola in self.colas.values(): cola.put(None)
+        for hilo in self.hilos: hilo.join()
+
+def guardar_plan(items: List[dict], libre_antes: Dict[str, int]) -> Path:
+    discos = {d: {"libre_antes": libre, "libre_despues": libre + ESPACIO_SIMULADO[d]} for d, libre in libre_antes.items()}
+    plan = {
+        "fecha": time.time(), "generado": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "bytes_total": sum(i["bytes"] for i in items), "discos": discos, "items": items,
+    }
+    return escribir_plan(plan)
+
+def escribir_plan(plan: dict) -> Path:
+    tmp = PLAN_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, PLAN_FILE)
+    return PLAN_FILE
+
+def ejecutar_plan_guardado(dry_run: bool) -> bool:
+    """Aplica PLAN_FILE. Cada fichero se comprueba con stat; lo que cambió se salta."""
+    try:
+        with open(PLAN_FILE, encoding="utf-8") as f:
+            plan = json.load(f)
+    except (OSError, ValueError) as e:
+        log_bonito(f"No se pudo leer el plan {PLAN_FILE}: {e}", "error")
+        return False
+
+    if plan.get("aplicado"):
+        log_bonito(f"El plan del {plan.get('generado', '?')} ya se aplicó el {plan['aplicado']}; "
+                   f"haz un dry-run nuevo para generar otro", "info")
+        return True
+
+    edad = time.time() - plan.get("fecha", 0)
+    log_bonito(f"Plan del {plan.get('generado', '?')}: {len(plan['items'])} títulos, "
+               f"{plan.get('bytes_total', 0) / 1024**3:.2f} GB", "info")
+    if edad > MAX_ANTIGUEDAD_PLAN:
+        log_bonito(f"El plan tiene {edad / 3600:.0f} h; se validará fichero a fichero", "aviso")
+
+    aplicados = saltados = ya_hechos = ficheros_saltados = 0
+    for item in plan["items"]:
+        if STOP_REQUESTED: break
+        nombre = f"{item.get('categoria', item['subpath'])} / {item['titulo']}"
+        pendientes = []
+        for op in item["operaciones"]:
+            if op["tipo"] == "borrar":
+                pendientes.append(op)
+                continue
+            estado = comprobar_operacion(op)
+            if estado == "ok": pendientes.append(op)
+            elif estado != "hecha":
+                log_bonito(f"Se salta ({estado}): {op['src']}", "aviso")
+                ficheros_saltados += 1
+        movidos = [op for op in pendientes if op["tipo"] == "mover"]
+        if not movidos:
+            ya_hechos += 1
+            continue
+
+        destino = DISCO_MAP.get(item["disco_destino"])
+        necesario = sum({(op["dev"], op["ino"]): op["tamano"] for op in movidos}.values())
+        if not destino:
+            log_bonito(f"Disco destino {item['disco_destino']} no disponible: {nombre}", "error")
+            saltados += 1
+            continue
+        if obtener_espacio_libre(destino) < necesario + BUFFER_SIZE:
+            log_bonito(f"Sin espacio en {destino.name} para {nombre}", "error")
+            saltados += 1
+            continue
+
+        log_bonito(f"🔧 Consolidando '{item['titulo']}' en {destino.name} (plan)", "aviso")
+        ejecutar_fusion(item, dry_run, pendientes)
+        if not dry_run:
+            for d in {destino.name, *(Path(f).parts[2] for f in item["fragmentos"])}: invalidar_indice(Path("/mnt") / d)
+        aplicados += 1
+
+    log_bonito(f"Plan: {aplicados} aplicados, {ya_hechos} ya estaban hechos, {saltados} saltados, "
+               f"{ficheros_saltados} ficheros saltados", "exito")
+    # Con algo saltado (sin espacio, disco ausente, ficheros cambiados) el plan sigue abierto:
+    # la próxima ejecución vuelve a validarlo y lo que quede pendiente se verá en el log
+    if not dry_run and not STOP_REQUESTED and not saltados and not ficheros_saltados:
+        plan["aplicado"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+        try: escribir_plan(plan)
+        except OSError as e: log_bonito(f"No se pudo marcar el plan como aplicado: {e}", "aviso")
+    return True
 
 # ==========================================
 # ANÁLISIS
@@ -264,7 +548,8 @@ def init_conteo():
 
 class ItemStats:
     def __init__(self):
-        self.size_bytes = 0
+        self.size_bytes = 0          # Aparente (suma por ruta)
+        self.size_real = 0           # Real: cada inodo (hardlink) una vez
         self.file_count = 0
         self.dir_count = 0
         self.has_jpg = False
@@ -272,11 +557,85 @@ class ItemStats:
         self.disks: Set[str] = set()
         self.path_ref: str = ""
 
-def procesar_y_analizar(dry_run: bool):
+def resumir_fragmento(frag: Path) -> dict:
+    """Recorre un fragmento (título en un disco) y devuelve su resumen serializable."""
+    r = {"carpetas": 0, "jpg": False, "nfo": False, "conteo": init_conteo()}
+    uso = UsoDisco()
+    for root, dirs, files in os.walk(frag):
+        r["carpetas"] += len(dirs)
+        for f in files:
+            if f.endswith(UPLOAD_SUFFIX) or f.lower() in JUNK_FILES: continue
+            ext = os.path.splitext(f)[1].lower()
+            if ext == ".jpg": r["jpg"] = True
+            if ext == ".nfo": r["nfo"] = True
+            if ext in EXT_VIDEO: r["conteo"]["videos"] += 1
+            elif ext == ".jpg": r["conteo"]["jpg"] += 1
+            elif ext == ".nfo": r["conteo"]["nfo"] += 1
+            elif ext == ".srt": r["conteo"]["srt"] += 1
+            else: r["conteo"]["otros"] += 1
+            try: uso.sumar(os.stat(os.path.join(root, f)))
+            except OSError: pass
+    # Los hardlinks no cruzan discos: el uso real por fragmento suma exacto por título
+    r.update(tamano=uso.aparente, real=uso.real, ficheros=uso.ficheros)
+    return r
+
+def ruta_indice(disco: Path) -> Path:
+    return INDICE_DIR / f"indice_01_{disco.name}.json"
+
+def invalidar_indice(disco: Path):
+    try: ruta_indice(disco).unlink()
+    except OSError: pass
+
+def indexar_disco(disco: Path, estados: EstadoDiscos) -> Dict[str, Dict[str, dict]]:
+    """{subpath: {titulo: resumen}} del disco. Dormido y con índice reciente: sin tocar el disco."""
+    ruta = ruta_indice(disco)
+    if estados.estado(disco) == DORMIDO:
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                indice = json.load(f)
+            edad = time.time() - indice["fecha"]
+            if edad < MAX_ANTIGUEDAD_INDICE:
+                log_bonito(f"💤 {disco.name} dormido: índice de hace {edad / 3600:.1f} h", "info")
+                return indice["categorias"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    categorias = {}
+    for subpath, _ in CATEGORIAS.values():
+        if STOP_REQUESTED: return categorias
+        search_path = disco / subpath
+        if not search_path.exists(): continue
+        categorias[subpath] = {e.name: resumir_fragmento(e) for e in search_path.iterdir() if e.is_dir()}
+    try:
+        INDICE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fecha": time.time(), "categorias": categorias}, f)
+        os.replace(tmp, ruta)
+    except OSError:
+        pass
+    return categorias
+
+def procesar_y_analizar(dry_run: bool, estados: EstadoDiscos):
     report_data = []
+    plan_items = []
     missing_metadata = []
     resumen_categorias = {}
 
+    # Un hilo por disco; los dormidos se sirven del índice en caché
+    with ThreadPoolExecutor(max_workers=max(1, len(DISCOS_DISPONIBLES))) as pool:
+        indices = dict(zip(DISCOS_DISPONIBLES, pool.map(lambda d: indexar_disco(d, estados), DISCOS_DISPONIBLES)))
+
+    movedores = Movedores(dry_run)
+    try:
+        _analizar_categorias(dry_run, indices, movedores, report_data, missing_metadata, resumen_categorias, plan_items)
+    finally:
+        # Espera a que terminen las copias encoladas (o a que se descarten tras una parada)
+        movedores.terminar()
+
+    return report_data, missing_metadata, resumen_categorias, plan_items
+
+def _analizar_categorias(dry_run, indices, movedores, report_data, missing_metadata, resumen_categorias, plan_items):
     for cat_name, (subpath, tipo_contenido) in CATEGORIAS.items():
         if STOP_REQUESTED: break
         log_bonito(f"Analizando: {cat_name} ({tipo_contenido})", "subtitulo")
@@ -288,12 +647,12 @@ def procesar_y_analizar(dry_run: bool):
             }
 
         items_map: Dict[str, List[Path]] = {}
+        resumenes: Dict[Path, dict] = {}
         for disco in DISCOS_DISPONIBLES:
-            search_path = disco / subpath
-            if not search_path.exists(): continue
-            for entry in search_path.iterdir():
-                if entry.is_dir():
-                    items_map.setdefault(entry.name, []).append(entry)
+            for nombre, resumen in indices[disco].get(subpath, {}).items():
+                frag = disco / subpath / nombre
+                items_map.setdefault(nombre, []).append(frag)
+                resumenes[frag] = resumen
 
         for name, frags in items_map.items():
             if STOP_REQUESTED: break
@@ -302,31 +661,17 @@ def procesar_y_analizar(dry_run: bool):
             conteo_cat = resumen_categorias[cat_name]["conteo"]
 
             for frag in frags:
-                current_frag_size = 0
+                r = resumenes[frag]
                 if len(frag.parts) > 2: stats.disks.add(frag.parts[2])
                 stats.path_ref = str(frag)
-                for root, dirs, files in os.walk(frag):
-                    stats.dir_count += len(dirs)
-                    for f in files:
-                        if f.endswith(UPLOAD_SUFFIX) or f.lower() in JUNK_FILES: continue
-                        file_path = Path(root) / f
-                        ext = file_path.suffix.lower()
-                        
-                        if ext == ".jpg": stats.has_jpg = True
-                        if ext == ".nfo": stats.has_nfo = True
-                        if ext in EXT_VIDEO: conteo_cat["videos"] += 1
-                        elif ext == ".jpg": conteo_cat["jpg"] += 1
-                        elif ext == ".nfo": conteo_cat["nfo"] += 1
-                        elif ext == ".srt": conteo_cat["srt"] += 1
-                        else: conteo_cat["otros"] += 1
-                        
-                        try:
-                            s = file_path.stat().st_size
-                            stats.size_bytes += s
-                            current_frag_size += s
-                            stats.file_count += 1
-                        except: pass
-                frag_sizes[frag] = current_frag_size
+                stats.dir_count += r["carpetas"]
+                stats.file_count += r["ficheros"]
+                stats.size_bytes += r["tamano"]
+                stats.size_real += r["real"]
+                stats.has_jpg = stats.has_jpg or r["jpg"]
+                stats.has_nfo = stats.has_nfo or r["nfo"]
+                for k, v in r["conteo"].items(): conteo_cat[k] += v
+                frag_sizes[frag] = r["real"]
 
             estado = "Desfragmentada"
             destino_final = "-"
@@ -338,20 +683,30 @@ def procesar_y_analizar(dry_run: bool):
                     disk_name = candidate_frag.parts[2]
                     c_disk = DISCO_MAP.get(disk_name)
                     if not c_disk: continue
-                    needed = stats.size_bytes - frag_sizes[candidate_frag]
+                    needed = stats.size_real - frag_sizes[candidate_frag]
                     if obtener_espacio_libre(c_disk) > (needed + BUFFER_SIZE):
                         target_disk = c_disk
                         break
                 if not target_disk:
                     all_disks_sorted = sorted(DISCOS_DISPONIBLES, key=obtener_espacio_libre, reverse=True)
                     for d in all_disks_sorted:
-                        if obtener_espacio_libre(d) > (stats.size_bytes + BUFFER_SIZE):
+                        if obtener_espacio_libre(d) > (stats.size_real + BUFFER_SIZE):
                             target_disk = d
                             break
+                plan_item = None
                 if target_disk:
+                    plan_item = planificar_fusion(name, frags, target_disk, subpath)
+                    plan_item["categoria"] = cat_name
+                    if dry_run:
+                        simular_fusion(plan_item)
+                    elif not RESERVAS.reservar(str(target_disk), plan_item["bytes"], BUFFER_SIZE):
+                        # Las copias en curso o encoladas ya cuentan con ese hueco
+                        plan_item = None
+                if plan_item:
                     destino_final = target_disk.name
                     log_bonito(f"🔧 Consolidando '{name}' en {destino_final}", "aviso")
-                    fusionar_item(name, frags, target_disk, subpath, dry_run)
+                    plan_items.append(plan_item)
+                    movedores.encolar(plan_item)
                     estado = "Consolidado"
                 else:
                     log_bonito(f"Sin espacio para consolidar: {name}", "error")
@@ -376,11 +731,9 @@ def procesar_y_analizar(dry_run: bool):
                 "discos": sorted(list(stats.disks)) if estado != "Consolidado" else [destino_final],
                 "temps": stats.dir_count if tipo_contenido == "Series" else "-",
                 "ficheros": stats.file_count, "jpg": stats.has_jpg, "nfo": stats.has_nfo,
-                "tamano": stats.size_bytes / (1024**3), "estado": estado
+                "tamano": stats.size_bytes / (1024**3), "tamano_real": stats.size_real / (1024**3), "estado": estado
             })
 
-    return report_data, missing_metadata, resumen_categorias
-
 # ==========================================
 # GENERACIÓN DE INFORMES (HTML PRO + INTERACTIVO)
 # ==========================================
@@ -578,6 +931,8 @@ def generar_informe(datos, missing_meta):
             <div class="stats-grid">
                 <div class="stat-card info"><div class="stat-label">Items Totales</div><div class="stat-value">{len(datos)}</div></div>
                 <div class="stat-card info"><div class="stat-label">Categorías</div><div class="stat-value">{len(datos_por_cat)}</div></div>
+                <div class="stat-card info"><div class="stat-label">Tamaño Aparente</div><div class="stat-value">{sum(d['tamano'] for d in datos):.2f} GB</div></div>
+                <div class="stat-card info"><div class="stat-label">Uso Real (Hardlinks 1x)</div><div class="stat-value">{sum(d['tamano_real'] for d in datos):.2f} GB</div></div>
             </div>
     """
     
@@ -601,7 +956,7 @@ def generar_informe(datos, missing_meta):
                     </select>
                 </div>
                 <table>
-                    <thead><tr><th>Título</th><th>Discos</th><th>Archivos</th><th>JPG</th><th>NFO</th><th>Tamaño</th><th>Estado</th></tr></thead>
+                    <thead><tr><th>Título</th><th>Discos</th><th>Archivos</th><th>JPG</th><th>NFO</th><th>Tamaño</th><th>Uso Real</th><th>Estado</th></tr></thead>
                     <tbody>
         """
         for d in items:
@@ -614,6 +969,7 @@ def generar_informe(datos, missing_meta):
                 <td><span class="badge {'yes' if d['jpg'] else 'no'}">{'SI' if d['jpg'] else 'NO'}</span></td>
                 <td><span class="badge {'yes' if d['nfo'] else 'no'}">{'SI' if d['nfo'] else 'NO'}</span></td>
                 <td>{d['tamano']:.2f} GB</td>
+                <td>{d['tamano_real']:.2f} GB</td>
                 <td class="{'status-frag' if 'Fallo' in d['estado'] else ('status-warn' if 'Consolidado' in d['estado'] else 'status-ok')}">{d['estado']}</td>
             </tr>
             """
@@ -633,16 +989,11 @@ def generar_informe(datos, missing_meta):
     else:
         print(f"{Color.GREEN}🎉 Todo perfecto. Metadatos completos.{Color.ENDC}")
 
-def limpiar_uploads_antiguos():
+def limpiar_uploads_antiguos(discos: List[Path]):
     if not DISCOS_DISPONIBLES: return
     log_bonito("Limpiando carpetas 'Uploads' antiguas...", "info")
-    for disco in DISCOS_DISPONIBLES[:-1]:
-        for rel in ["peliculas/Uploads", "series/Uploads"]:
-            p = disco / rel
-            limpiar_vacios_recursivo([p])
-            try:
-                if p.exists() and not any(p.iterdir()): p.rmdir()
-            except: pass
+    rutas = {d.name: [d / "peliculas/Uploads", d / "series/Uploads"] for d in DISCOS_DISPONIBLES[:-1] if d in discos}
+    limpiar_discos(rutas, borrar_raiz=True)
 
 def crear_uploads_ultimo():
     if not DISCOS_DISPONIBLES: return
@@ -667,28 +1018,65 @@ if __name__ == "__main__":
                 print(f"{Color.FAIL}❌ Ya está en ejecución.{Color.ENDC}"); sys.exit(1)
 
             log_bonito("DESFRAGMENTADOR Y ORGANIZADOR (01)", "titulo")
-            limpiar_partial_huerfanos(DISCOS_DISPONIBLES)
 
             parser = argparse.ArgumentParser()
             parser.add_argument("--dry-run", action="store_true", help="Simular")
             parser.add_argument("--force-clean", action="store_true", help="Limpieza profunda")
+            parser.add_argument("--limite-mbs", type=int, default=None, help="MB/s máximos por disco en las copias")
+            parser.add_argument("--limite-iops", type=int, default=None, help="Operaciones/s máximas por disco")
+            parser.add_argument("--adaptativo", default=None, choices=["yes", "no"], help="Frenar copias mientras Plex tenga sesiones")
+            parser.add_argument("--ejecutar-plan", action="store_true", help=f"Aplicar {PLAN_FILE.name} (del último dry-run) sin reanalizar")
             args = parser.parse_args()
 
+            limites = limitador_io.configurar(args.limite_mbs, args.limite_iops,
+                                                  None if args.adaptativo is None else args.adaptativo == "yes")
+            if not args.dry_run: log_bonito(f"Límite de E/S: {limites.descripcion()}", "info")
+
+            if args.ejecutar_plan:
+                # Con --dry-run solo se valida el plan contra el estado actual
+                if args.dry_run: log_bonito("MODO DRY-RUN: solo validación del plan", "aviso")
+                ok = ejecutar_plan_guardado(args.dry_run)
+                estados = EstadoDiscos()
+                for d in DISCOS_DISPONIBLES: estados.registrar(d)
+                estados.guardar()
+                sys.exit(0 if ok else 1)
+
+            # .partial huérfanos antes de analizar (no deben contar en el informe). La limpieza profunda
+            # va después de las consolidaciones, para que recoja también las carpetas que vacían.
+            # Los discos dormidos se saltan para no despertarlos (se limpiarán cuando estén activos).
+            estados = EstadoDiscos()
+            despiertos = [d for d in DISCOS_DISPONIBLES if estados.estado(d) != DORMIDO]
+            if len(despiertos) < len(DISCOS_DISPONIBLES):
+                dormidos = ", ".join(d.name for d in DISCOS_DISPONIBLES if d not in despiertos)
+                log_bonito(f"💤 Discos dormidos (sin limpieza, índice en caché): {dormidos}", "info")
+            res = limpiar_discos(rutas_contenido(despiertos), partial=True, basura=False, vacios=False)
+            if res["partial"] > 0:
+                log_bonito(f"Eliminados {res['partial']} archivos .partial huérfanos", "exito")
+
             if args.dry_run: log_bonito("MODO DRY-RUN", "aviso")
+            libre_antes = {d.name: obtener_espacio_libre(d) for d in DISCOS_DISPONIBLES}
             
-            datos, meta, resumen = procesar_y_analizar(args.dry_run)
+            datos, meta, resumen, plan = procesar_y_analizar(args.dry_run, estados)
             imprimir_tabla_resumen(resumen)
             generar_informe(datos, meta)
+            if args.dry_run and not STOP_REQUESTED:
+                log_bonito(f"Plan guardado ({len(plan)} consolidaciones): {guardar_plan(plan, libre_antes)}", "exito")
 
             if args.force_clean and not args.dry_run:
-                base_paths = []
-                for d in DISCOS_DISPONIBLES: base_paths += [d/"peliculas", d/"series"]
-                limpiar_vacios_recursivo(base_paths)
-            
+                # Misma pasada única por disco, ya con las copias terminadas
+                res = limpiar_discos(rutas_contenido(despiertos), basura=True, vacios=True)
+                log_bonito(f"Limpieza profunda: {res['carpetas']} carpetas vacías y {res['basura']} ficheros basura eliminados", "exito")
+                if res["carpetas"] or res["basura"]:
+                    for d in despiertos: invalidar_indice(d)
+
             if not args.dry_run:
-                limpiar_uploads_antiguos()
+                limpiar_uploads_antiguos(despiertos)
                 crear_uploads_ultimo()
 
+            # Muestra de actividad tras todo lo que ha hecho este script (su propia E/S cuenta)
+            for d in DISCOS_DISPONIBLES: estados.registrar(d)
+            estados.guardar()
+
             print(f"\n{Color.GREEN}Finalizado.{Color.ENDC}")
             print(f"📄 {INFORME_FILE}")
     finally: pass
@@ -8,6 +8,9 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+import checkpoints
+from uso_disco import UsoDisco
+
 # ==========================================
 # CONFIGURACIÓN
 # ==========================================
@@ -40,7 +43,44 @@ VID_EXT = {
 # ==========================================
 # LÓGICA DE ESCANEO (OPTIMIZADA 1 PASS)
 # ==========================================
-def escanear_contenido(rutas_dict, es_serie=False):
+def clasificar_fichero(nombre):
+    """'video', 'nfo', 'img' o None según la extensión."""
+    ext = Path(nombre).suffix.lower()
+    if ext in VID_EXT: return "video"
+    if ext == '.nfo': return "nfo"
+    if ext in ['.jpg', '.png', '.jpeg', '.tbn']: return "img"
+    return None
+
+def armar_item(categoria, entrada, uso, video_count, has_nfo, has_jpg, subdirs=None):
+    """Fila del catálogo de un título. 'subdirs': nombres de sus subcarpetas directas (series)."""
+    nombre = entrada.name
+    item = {
+        "Categoria": categoria,
+        "Titulo": nombre,
+        "Ruta": str(entrada),
+        "Tamano": f"{uso.aparente / (1024**3):.2f} GB",
+        "Real": f"{uso.real / (1024**3):.2f} GB",
+        "Year": "-",
+        "Estado": "OK",
+        "Archivos": video_count,
+        "NFO": has_nfo,
+        "Cover": has_jpg,
+        "Extras": "-"
+    }
+
+    # Extraer Año
+    match = re.search(r'\((\d{4})\)', nombre)
+    if match:
+        item["Year"] = match.group(1)
+
+    # Contar temporadas (solo si es serie)
+    if subdirs:
+        temps = [d for d in subdirs if "season" in d.lower() or "temporada" in d.lower()]
+        if temps:
+            item["Extras"] = f"{len(temps)} Temps"
+    return item
+
+def escanear_contenido(rutas_dict, es_serie=False, cp=None):
     items = []
     
     for categoria, path_obj in rutas_dict.items():
@@ -61,10 +101,16 @@ def escanear_contenido(rutas_dict, es_serie=False):
             if i % 50 == 0:
                 print(f"   ... procesando {i}/{total_entradas}: {entrada.name}", flush=True)
 
-            nombre = entrada.name
-            
+            # Cada título es una unidad del checkpoint
+            unidad = f"{categoria}|{entrada}"
+            if cp:
+                cp.punto_seguro()
+                if cp.hecho(unidad):
+                    items.append(cp.datos(unidad))
+                    continue
+
             # Variables acumuladoras
-            total_size = 0
+            uso = UsoDisco()
             video_count = 0
             has_nfo = False
             has_jpg = False
@@ -73,49 +119,26 @@ def escanear_contenido(rutas_dict, es_serie=False):
             for root, dirs, files in os.walk(entrada):
                 for file in files:
                     fp = os.path.join(root, file)
-                    ext = Path(file).suffix.lower()
                     
-                    # 1. Tamaño
-                    try:
-                        total_size += os.path.getsize(fp)
-                    except OSError: pass
+                    # 1. Tamaño (los hardlinks solo cuentan una vez en el uso real; los symlinks
+                    #    cuentan lo que ocupa su destino, como con os.path.getsize)
+                    uso.sumar_ruta(fp, seguir_enlaces=True)
 
                     # 2. Detección
-                    if ext in VID_EXT: video_count += 1
-                    elif ext == '.nfo': has_nfo = True
-                    elif ext in ['.jpg', '.png', '.jpeg', '.tbn']: has_jpg = True
-
-            # Formatear tamaño
-            gb = total_size / (1024**3)
-            tamano_str = f"{gb:.2f} GB"
+                    tipo = clasificar_fichero(file)
+                    if tipo == "video": video_count += 1
+                    elif tipo == "nfo": has_nfo = True
+                    elif tipo == "img": has_jpg = True
 
-            item = {
-                "Categoria": categoria,
-                "Titulo": nombre,
-                "Ruta": str(entrada),
-                "Tamano": tamano_str,
-                "Year": "-",
-                "Estado": "OK",
-                "Archivos": video_count,
-                "NFO": has_nfo,
-                "Cover": has_jpg,
-                "Extras": "-"
-            }
-
-            # Extraer Año
-            match = re.search(r'\((\d{4})\)', nombre)
-            if match:
-                item["Year"] = match.group(1)
-            
-            # Contar temporadas (solo si es serie)
+            # Subcarpetas directas (solo series, para contar temporadas)
+            subdirs = None
             if es_serie:
-                try:
-                    temps = [x for x in entrada.iterdir() if x.is_dir() and ("season" in x.name.lower() or "temporada" in x.name.lower())]
-                    if temps:
-                        item["Extras"] = f"{len(temps)} Temps"
-                except: pass
+                try: subdirs = [x.name for x in entrada.iterdir() if x.is_dir()]
+                except: subdirs = []
 
+            item = armar_item(categoria, entrada, uso, video_count, has_nfo, has_jpg, subdirs)
             items.append(item)
+            if cp: cp.marcar(unidad, item)
 
     return items
 
@@ -223,7 +246,7 @@ def generar_html_individual(datos, titulo_informe, filepath):
             <td><span class="badge" style="background:#333">{c_safe}</span></td>
             <td style="font-weight:bold; color:#fff">{t_safe}</td>
             <td>{item['Year']}</td>
-            <td>{item['Tamano']}</td>
+            <td>{item['Tamano']}{'' if item['Real'] == item['Tamano'] else f" <span style='color:#888; font-size:0.8rem'>(real {item['Real']})</span>"}</td>
             <td style="color:#aaa; font-size:0.9rem">{item['Archivos']} files | {item['Extras']}</td>
             <td>{badges}</td>
         </tr>"""
@@ -244,13 +267,18 @@ def generar_html_individual(datos, titulo_informe, filepath):
 
 if __name__ == "__main__":
     print("🚀 Iniciando Escaneo (Full Ext)...", flush=True)
+    cp = checkpoints.Checkpoint("03_catalogo", {
+        "series": {k: str(v) for k, v in RUTAS_SERIES.items()},
+        "peliculas": {k: str(v) for k, v in RUTAS_PELICULAS.items()},
+    })
     
     print("\n=== SERIES ===", flush=True)
-    d_series = escanear_contenido(RUTAS_SERIES, True)
+    d_series = escanear_contenido(RUTAS_SERIES, True, cp)
     generar_html_individual(d_series, "Catálogo de Series", FILE_SERIES)
     
     print("\n=== PELÍCULAS ===", flush=True)
-    d_movies = escanear_contenido(RUTAS_PELICULAS, False)
+    d_movies = escanear_contenido(RUTAS_PELICULAS, False, cp)
     generar_html_individual(d_movies, "Catálogo de Películas", FILE_MOVIES)
     
+    cp.terminar()
     print("\n🏁 Finalizado.", flush=True)
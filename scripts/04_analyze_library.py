@@ -4,14 +4,23 @@
 import os
 import re
 import sys
+import csv
+import math
+import heapq
 import time
 import html
 import signal
+import sqlite3
 import argparse
-from collections import defaultdict
+from array import array
+from collections import defaultdict, Counter
 from datetime import datetime
 from pathlib import Path
 
+import checkpoints
+import plex_metadata
+from uso_disco import UsoDisco
+
 # ==========================================
 # CONFIGURACIÓN
 # ==========================================
@@ -25,6 +34,12 @@ VIDEO_EXT = {".mp4", ".mkv", ".avi", ".mov", ".wmv", ".m2ts", ".mpg", ".m4v", ".
 RESOLUCIONES_VALIDAS = ["2160p", "1440p", "1080p", "720p", "576p", "540p", "480p", "360p", "SD"]
 ORDEN_RESOL = {r: i for i, r in enumerate(RESOLUCIONES_VALIDAS)}
 
+# Modo resumen: tamaño del top por defecto y percentiles que se muestran
+TOP_DEFECTO = 500
+PERCENTILES = (50, 90, 99)
+# Cubetas del histograma de tamaños por cada potencia de 2 (8 -> error del percentil < 5%)
+SUBDIVISIONES = 8
+
 # Rutas Normalizadas
 SCRIPT_DIR = Path("/mnt/user/appdata/media-manager/datos")
 SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
@@ -46,8 +61,6 @@ def signal_handler(signum, frame):
     print(f"\n\n{Color.FAIL}🛑 Operación cancelada.{Color.ENDC}")
     sys.exit(0)
 
-signal.signal(signal.SIGINT, signal_handler)
-
 def print_header(text):
     print(f"\n{Color.HEADER}╔{'═'*60}╗", flush=True)
     print(f"║ {text:^58} ║", flush=True)
@@ -76,47 +89,240 @@ def extraer_codec(nombre):
     if any(x in n for x in ["mpeg", "mpg"]): return "MPEG"
     return "Otros"
 
+# Códecs tal y como los guarda Plex en media_items.video_codec
+CODECS_PLEX = {
+    "hevc": "HEVC (x265)", "h265": "HEVC (x265)",
+    "h264": "AVC (x264)", "avc": "AVC (x264)",
+    "av1": "AV1", "vp9": "VP9",
+    "mpeg4": "XviD/DivX", "msmpeg4": "XviD/DivX", "msmpeg4v2": "XviD/DivX", "msmpeg4v3": "XviD/DivX",
+    "divx": "XviD/DivX", "xvid": "XviD/DivX",
+    "mpeg1video": "MPEG", "mpeg2video": "MPEG",
+}
+
+def codec_desde_plex(codec):
+    return CODECS_PLEX.get((codec or "").lower(), "Otros")
+
 def formatear_tamano(b):
     if b < 1024: return f"{b} B"
     if b < 1024**2: return f"{b/1024:.1f} KB"
     if b < 1024**3: return f"{b/1024**2:.1f} MB"
     return f"{b/1024**3:.2f} GB"
 
+# ==========================================
+# ALMACÉN DE REGISTROS (COLUMNAS)
+# ==========================================
+class Etiquetas:
+    """Internado de etiquetas (resoluciones, códecs, carpetas): texto <-> código pequeño."""
+    def __init__(self):
+        self.textos = []
+        self.codigos = {}
+
+    def codigo(self, texto):
+        c = self.codigos.get(texto)
+        if c is None:
+            c = self.codigos[texto] = len(self.textos)
+            self.textos.append(texto)
+        return c
+
+    def que_contienen(self, filtro):
+        """Códigos cuyo texto contiene 'filtro' (sin mayúsculas); todos si el filtro está vacío."""
+        return {c for c, t in enumerate(self.textos) if filtro in t.lower()}
+
+class Registros:
+    """
+    Vídeos de la librería en columnas en vez de un dict por fichero: la carpeta
+    se guarda una vez y cada fichero apunta a ella, resolución y códec son
+    códigos de un byte y tamaños en array('q'). Filtrar y ordenar trabaja con
+    índices sobre las columnas; el texto (rutas, tamaños legibles) se monta
+    solo al pintar el HTML.
+    """
+    SIN_DATO = -1  # 'real' desconocido (la fuente no sabe de hardlinks, p.ej. Plex)
+
+    def __init__(self):
+        self.carpetas = Etiquetas()
+        self.resoluciones = Etiquetas()
+        self.codecs = Etiquetas()
+        self.carpeta = array('I')
+        self.nombre = []
+        self.res = array('B')
+        self.cod = array('B')
+        self.size = array('q')
+        self.real = array('q')
+
+    def __len__(self):
+        return len(self.size)
+
+    def anadir(self, f_path, f, res, cod, size, real):
+        self.carpeta.append(self.carpetas.codigo(os.path.dirname(f_path)))
+        self.nombre.append(f)
+        self.res.append(self.resoluciones.codigo(res))
+        self.cod.append(self.codecs.codigo(cod))
+        self.size.append(size)
+        self.real.append(self.SIN_DATO if real is None else real)
+
+    def ruta(self, i):
+        return os.path.join(self.carpetas.textos[self.carpeta[i]], self.nombre[i])
+
+    def etiqueta_res(self, i):
+        return self.resoluciones.textos[self.res[i]]
+
+    def etiqueta_cod(self, i):
+        return self.codecs.textos[self.cod[i]]
+
+    def stats(self):
+        """Ficheros por (resolución, códec)."""
+        conteo = Counter(zip(self.res, self.cod))
+        return {(self.resoluciones.textos[r], self.codecs.textos[c]): n for (r, c), n in conteo.items()}
+
+    def filtrar(self, f_res="", f_cod=""):
+        """Índices de los registros cuya resolución y códec contienen los filtros."""
+        if not f_res and not f_cod: return array('I', range(len(self)))
+        cods_res = self.resoluciones.que_contienen(f_res)
+        cods_cod = self.codecs.que_contienen(f_cod)
+        res, cod = self.res, self.cod
+        return array('I', (i for i in range(len(self)) if res[i] in cods_res and cod[i] in cods_cod))
+
+    def ordenar(self, indices, ord_opt):
+        if ord_opt == "2": clave, inverso = self.size.__getitem__, False
+        elif ord_opt == "3": clave, inverso = self.nombre.__getitem__, False
+        elif ord_opt == "4":
+            orden = [ORDEN_RESOL.get(t, 99) for t in self.resoluciones.textos]
+            res = self.res
+            clave, inverso = (lambda i: orden[res[i]]), False
+        else: clave, inverso = self.size.__getitem__, True
+        return array('I', sorted(indices, key=clave, reverse=inverso))
+
+# ==========================================
+# MODO RESUMEN (MEMORIA CONSTANTE)
+# ==========================================
+class Agregado:
+    """
+    Conteo, bytes, mínimo y máximo exactos. Los percentiles de tamaño salen de un
+    histograma logarítmico (SUBDIVISIONES cubetas por potencia de 2), así que son
+    aproximados pero la memoria no crece con el número de ficheros.
+    """
+    __slots__ = ("n", "bytes", "real", "minimo", "maximo", "cubetas")
+
+    def __init__(self):
+        self.n = 0
+        self.bytes = 0
+        self.real = 0  # None en cuanto un fichero no lo sabe (fuente Plex)
+        self.minimo = None
+        self.maximo = 0
+        self.cubetas = Counter()
+
+    def sumar(self, size, real):
+        self.n += 1
+        self.bytes += size
+        if self.real is not None: self.real = None if real is None else self.real + real
+        self.minimo = size if self.minimo is None else min(self.minimo, size)
+        self.maximo = max(self.maximo, size)
+        self.cubetas[int(math.log2(size) * SUBDIVISIONES) if size > 0 else -1] += 1
+
+    def percentil(self, p):
+        if not self.n: return 0
+        objetivo = math.ceil(self.n * p / 100)
+        acumulado = 0
+        for c in sorted(self.cubetas):
+            acumulado += self.cubetas[c]
+            if acumulado >= objetivo:
+                if c < 0: return 0
+                # Centro geométrico de la cubeta, sin salirse de los extremos reales
+                return int(min(max(2 ** ((c + 0.5) / SUBDIVISIONES), self.minimo), self.maximo))
+        return self.maximo
+
+class Resumen:
+    """Top-N por tamaño en un heap acotado y agregados por resolución, códec y carpeta."""
+    DIMENSIONES = ("Resolución", "Códec", "Carpeta")
+
+    def __init__(self, base_path, top=TOP_DEFECTO):
+        self.base_path = base_path
+        self.top = max(0, top)
+        # (size, -orden, registro): en la raíz queda el más pequeño y, a igualdad, el último en llegar
+        self.heap = []
+        self.orden = 0
+        self.total = Agregado()
+        self.por = {d: defaultdict(Agregado) for d in self.DIMENSIONES}
+
+    def carpeta(self, f_path):
+        """Primera carpeta bajo la librería (la categoría)."""
+        partes = os.path.relpath(f_path, self.base_path).split(os.sep)
+        return partes[0] if len(partes) > 1 else "(raíz)"
+
+    def anadir(self, f_path, f, res, cod, size, real):
+        self.orden += 1
+        self.total.sumar(size, real)
+        for dim, clave in zip(self.DIMENSIONES, (res, cod, self.carpeta(f_path))):
+            self.por[dim][clave].sumar(size, real)
+        if not self.top: return
+        entrada = (size, -self.orden, (f_path, f, res, cod, size, real))
+        if len(self.heap) < self.top: heapq.heappush(self.heap, entrada)
+        elif entrada[:2] > self.heap[0][:2]: heapq.heapreplace(self.heap, entrada)
+
+    def mayores(self):
+        """El top ordenado por tamaño descendente; a igualdad, en el orden en que llegaron."""
+        return [e[2] for e in sorted(self.heap, key=lambda e: e[:2], reverse=True)]
+
+class ExportCSV:
+    """Tabla completa en CSV, fila a fila (opcional con --csv yes)."""
+    def __init__(self, config):
+        self.ruta = SCRIPT_DIR / f"report_04_library_{nombre_informe(config)}.csv"
+        self.f = open(self.ruta, "w", newline="", encoding="utf-8")
+        self.csv = csv.writer(self.f)
+        self.csv.writerow(["ruta", "nombre", "resolucion", "codec", "bytes", "bytes_reales"])
+
+    def fila(self, f_path, f, res, cod, size, real):
+        self.csv.writerow([f_path, f, res, cod, size, "" if real is None else real])
+
+    def cerrar(self):
+        self.f.close()
+
 # ==========================================
 # GENERADOR HTML PRO
 # ==========================================
-def generar_html_pro(filtrados, config, stats, filters_info):
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+def nombre_informe(config):
     # Nombre normalizado según el tipo de librería
-    safe_name = config['nombre'].lower().replace("películas", "peliculas") # Asegurar sin tildes en filename
-    filename_html = SCRIPT_DIR / f"report_04_library_{safe_name}.html"
-    
-    total_size_bytes = sum(d['size'] for d in filtrados)
-    total_size_fmt = formatear_tamano(total_size_bytes)
-    
-    # Top resolución
-    top_res = "N/A"
-    res_counts = defaultdict(int)
-    for f in filtrados: res_counts[f['res']] += 1
-    if res_counts: top_res = max(res_counts, key=res_counts.get)
+    return config['nombre'].lower().replace("películas", "peliculas") # Asegurar sin tildes en filename
 
+def filas_html(reg, indices, config):
     rows_html = ""
-    for d in filtrados:
-        res_class = "res-4k" if "2160p" in d['res'] else ("res-1080p" if "1080p" in d['res'] else "res-sd")
-        safe_name = html.escape(d['nombre'])
-        safe_path = html.escape(d['ruta'].replace(config['ruta'], ""))
+    for i in indices:
+        res = reg.etiqueta_res(i)
+        size = reg.size[i]
+        res_class = "res-4k" if "2160p" in res else ("res-1080p" if "1080p" in res else "res-sd")
+        safe_name = html.escape(reg.nombre[i])
+        safe_path = html.escape(reg.ruta(i).replace(config['ruta'], ""))
         
         rows_html += f"""
         <tr>
-            <td><span class="badge {res_class}">{d['res']}</span></td>
-            <td>{d['cod']}</td>
-            <td data-order="{d['size']}" class="text-right font-mono">{d['size_fmt']}</td>
+            <td><span class="badge {res_class}">{res}</span></td>
+            <td>{reg.etiqueta_cod(i)}</td>
+            <td data-order="{size}" class="text-right font-mono">{formatear_tamano(size)}{' <span title="Hardlink: ya contado en el uso real">🔗</span>' if reg.real[i] == 0 and size else ''}</td>
             <td>
                 <div class="file-title">{safe_name}</div>
                 <div class="path-cell">{safe_path}</div>
             </td>
         </tr>
         """
+    return rows_html
+
+def generar_html_pro(reg, filtrados, config, stats, filters_info):
+    """'filtrados': índices de 'reg' ya en el orden del informe."""
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    filename_html = SCRIPT_DIR / f"report_04_library_{nombre_informe(config)}.html"
+    
+    total_size_bytes = sum(reg.size[i] for i in filtrados)
+    total_size_fmt = formatear_tamano(total_size_bytes)
+    # Uso real: cada inodo una vez (SIN_DATO si la fuente no lo sabe, p.ej. Plex)
+    reales = [reg.real[i] for i in filtrados]
+    total_real_fmt = "n/d" if Registros.SIN_DATO in reales else formatear_tamano(sum(reales))
+    
+    # Top resolución
+    top_res = "N/A"
+    res_counts = Counter(reg.res[i] for i in filtrados)
+    if res_counts: top_res = reg.resoluciones.textos[max(res_counts, key=res_counts.get)]
+
+    rows_html = filas_html(reg, filtrados, config)
 
     html_content = f"""<!DOCTYPE html>
 <html lang="es">
@@ -165,6 +371,7 @@ def generar_html_pro(filtrados, config, stats, filters_info):
         <div class="kpi-grid">
             <div class="kpi-card main"><div class="kpi-label">Total Archivos</div><div class="kpi-value">{len(filtrados)}</div></div>
             <div class="kpi-card"><div class="kpi-label">Tamaño Total</div><div class="kpi-value">{total_size_fmt}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Uso Real (Hardlinks 1x)</div><div class="kpi-value">{total_real_fmt}</div></div>
             <div class="kpi-card"><div class="kpi-label">Resolución Dominante</div><div class="kpi-value">{top_res}</div></div>
         </div>
         <table id="libraryTable" class="display">
@@ -185,15 +392,266 @@ def generar_html_pro(filtrados, config, stats, filters_info):
     with open(filename_html, "w", encoding="utf-8") as f: f.write(html_content)
     return filename_html
 
+def generar_html_resumen(resumen, config, filters_info, ruta_csv=None):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    filename_html = SCRIPT_DIR / f"report_04_resumen_{nombre_informe(config)}.html"
+    total = resumen.total
+    top_res = max(resumen.por["Resolución"].items(), key=lambda kv: kv[1].n)[0]
+    cabecera_pct = "".join(f"<th>p{p} ≈</th>" for p in PERCENTILES)
+
+    secciones = ""
+    for idx, dim in enumerate(Resumen.DIMENSIONES):
+        filas = ""
+        for clave, ag in sorted(resumen.por[dim].items(), key=lambda kv: kv[1].bytes, reverse=True):
+            pcts = "".join(f'<td data-order="{v}" class="text-right font-mono">{formatear_tamano(v)}</td>'
+                           for v in (ag.percentil(p) for p in PERCENTILES))
+            filas += f"""
+            <tr>
+                <td class="file-title">{html.escape(clave)}</td>
+                <td class="text-right">{ag.n}</td>
+                <td data-order="{ag.bytes}" class="text-right font-mono">{formatear_tamano(ag.bytes)}</td>
+                <td data-order="{ag.real or 0}" class="text-right font-mono">{'n/d' if ag.real is None else formatear_tamano(ag.real)}</td>
+                {pcts}
+                <td data-order="{ag.maximo}" class="text-right font-mono">{formatear_tamano(ag.maximo)}</td>
+            </tr>"""
+        secciones += f"""
+        <h2>Por {dim.lower()}</h2>
+        <table id="agg{idx}" class="display agregado">
+            <thead><tr><th>{dim}</th><th>Archivos</th><th>Tamaño</th><th>Uso Real</th>{cabecera_pct}<th>Máx</th></tr></thead>
+            <tbody>{filas}</tbody>
+        </table>"""
+
+    # El top se pinta con las mismas filas que el informe completo
+    top = Registros()
+    for registro in resumen.mayores(): top.anadir(*registro)
+    aviso_csv = f" | Tabla completa: {ruta_csv.name}" if ruta_csv else ""
+
+    html_content = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Resumen {config['nombre']}</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap" rel="stylesheet">
+    <link rel="stylesheet" type="text/css" href="https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css">
+    <style>
+        :root {{ --bg: #0f1115; --card: #181b21; --accent: #6366f1; --text: #e2e8f0; --border: #334155; }}
+        body {{ background-color: var(--bg); color: var(--text); font-family: 'Inter', sans-serif; margin: 0; padding: 20px; }}
+        .container {{ max-width: 1400px; margin: 0 auto; }}
+        .header {{ display: flex; justify-content: space-between; align-items: center; margin-bottom: 30px; border-bottom: 1px solid var(--border); padding-bottom: 20px; }}
+        h1 {{ margin: 0; font-weight: 600; color: #fff; letter-spacing: -1px; }}
+        h2 {{ color: #fff; font-weight: 600; margin-top: 40px; }}
+        .meta {{ color: #94a3b8; font-size: 0.9rem; }}
+        .kpi-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }}
+        .kpi-card {{ background: var(--card); padding: 20px; border-radius: 12px; border: 1px solid var(--border); }}
+        .kpi-label {{ color: #94a3b8; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 1px; font-weight: bold; }}
+        .kpi-value {{ font-size: 2rem; font-weight: 700; color: #fff; margin-top: 5px; }}
+        .kpi-card.main {{ border-left: 4px solid var(--accent); }}
+        table.dataTable {{ width: 100% !important; border-collapse: collapse; }}
+        table.dataTable thead th {{ background-color: #1e293b !important; color: #fff !important; padding: 12px !important; border-bottom: 2px solid var(--accent) !important; }}
+        table.dataTable tbody td {{ background-color: var(--card) !important; color: var(--text) !important; border-bottom: 1px solid var(--border) !important; padding: 10px !important; vertical-align: middle; }}
+        .badge {{ padding: 4px 8px; border-radius: 4px; font-size: 0.75rem; font-weight: 800; display: inline-block; min-width: 60px; text-align: center; }}
+        .res-4k {{ background: rgba(255, 215, 0, 0.15); color: #ffd700; border: 1px solid rgba(255, 215, 0, 0.3); }}
+        .res-1080p {{ background: rgba(0, 255, 255, 0.15); color: #00ffff; border: 1px solid rgba(0, 255, 255, 0.3); }}
+        .res-sd {{ background: rgba(255, 99, 71, 0.15); color: #ff6347; border: 1px solid rgba(255, 99, 71, 0.3); }}
+        .file-title {{ font-weight: 600; color: #fff; margin-bottom: 2px; }}
+        .path-cell {{ font-family: 'Courier New', monospace; color: #64748b; font-size: 0.8rem; }}
+        .text-right {{ text-align: right; }} .font-mono {{ font-family: monospace; }}
+        .dataTables_wrapper .dataTables_length, .dataTables_wrapper .dataTables_filter, .dataTables_wrapper .dataTables_info, .dataTables_wrapper .dataTables_paginate {{ color: #94a3b8 !important; margin-bottom: 10px; }}
+        .dataTables_wrapper .dataTables_filter input, .dataTables_wrapper .dataTables_length select {{ background: #0f1115; border: 1px solid var(--border); color: #fff; padding: 5px; border-radius: 4px; }}
+        .paginate_button.current {{ background: var(--accent) !important; border: none !important; color: white !important; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div><h1>📊 Resumen de {config['nombre']}</h1><div class="meta">Filtros: {filters_info} | Percentiles (≈) aproximados por histograma logarítmico{aviso_csv}</div></div>
+            <div class="meta">{ts}</div>
+        </div>
+        <div class="kpi-grid">
+            <div class="kpi-card main"><div class="kpi-label">Total Archivos</div><div class="kpi-value">{total.n}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Tamaño Total</div><div class="kpi-value">{formatear_tamano(total.bytes)}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Uso Real (Hardlinks 1x)</div><div class="kpi-value">{'n/d' if total.real is None else formatear_tamano(total.real)}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Resolución Dominante</div><div class="kpi-value">{top_res}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Mediana ≈</div><div class="kpi-value">{formatear_tamano(total.percentil(50))}</div></div>
+        </div>
+        {secciones}
+        <h2>Top {len(top)} por tamaño</h2>
+        <table id="topTable" class="display">
+            <thead><tr><th width="10%">Res</th><th width="10%">Codec</th><th width="15%">Tamaño</th><th>Nombre / Ruta</th></tr></thead>
+            <tbody>{filas_html(top, range(len(top)), config)}</tbody>
+        </table>
+    </div>
+    <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
+    <script>
+        $(document).ready(function() {{
+            const idioma = {{ "search": "🔍 Buscar:", "lengthMenu": "Mostrar _MENU_ registros", "info": "Mostrando _START_ a _END_ de _TOTAL_", "paginate": {{ "first": "«", "last": "»", "next": "Sig", "previous": "Ant" }}, "zeroRecords": "No se encontraron resultados" }};
+            $('table.agregado').DataTable({{ "paging": false, "info": false, "order": [[ 2, "desc" ]], "language": idioma }});
+            $('#topTable').DataTable({{ "pageLength": 25, "order": [[ 2, "desc" ]], "language": idioma }});
+        }});
+    </script>
+</body>
+</html>"""
+
+    with open(filename_html, "w", encoding="utf-8") as f: f.write(html_content)
+    return filename_html
+
+# ==========================================
+# FUENTES DE DATOS
+# ==========================================
+def _subcarpetas(ruta):
+    try: return sorted(e.path for e in os.scandir(ruta) if e.is_dir() and e.name != CARPETA_EXCLUIDA)
+    except OSError: return []
+
+def unidades_disco(base_path):
+    """(ruta, recursivo) para el checkpoint: cada carpeta base/categoría/título se recorre entera;
+    los ficheros sueltos de base y de cada categoría forman su propia unidad sin recursión."""
+    yield base_path, False
+    for cat in _subcarpetas(base_path):
+        yield cat, False
+        for titulo in _subcarpetas(cat):
+            yield titulo, True
+
+def ficheros_unidad(ruta, recursivo):
+    if not recursivo:
+        try: yield ruta, [e.name for e in os.scandir(ruta) if not e.is_dir()]
+        except OSError: pass
+        return
+    for root, dirs, files in os.walk(ruta):
+        if CARPETA_EXCLUIDA in dirs: dirs.remove(CARPETA_EXCLUIDA)
+        yield root, files
+
+def recorrer_disco(base_path, cp=None):
+    """Recorre el array y deduce resolución/códec del nombre de fichero."""
+    uso = UsoDisco()
+    if cp: uso.iniciar_diario()
+    for unidad, recursivo in unidades_disco(base_path):
+        clave = f"{unidad}|{'r' if recursivo else 's'}"
+        if cp:
+            cp.punto_seguro()
+            if cp.hecho(clave):
+                # Los inodos ya contados siguen contando para no repetir hardlinks
+                d = cp.datos(clave)
+                uso.restaurar(inodos=d["inodos"])
+                for reg in d["ficheros"]: yield tuple(reg)
+                continue
+
+        registros = []
+        for root, files in ficheros_unidad(unidad, recursivo):
+            for f in files:
+                ext = os.path.splitext(f)[1].lower()
+                if ext not in VIDEO_EXT: continue
+
+                f_path = os.path.join(root, f)
+                try: st = os.stat(f_path)
+                except OSError: st = None
+                size = st.st_size if st else 0
+                real = uso.sumar(st) if st else 0
+                registros.append((f_path, f, extraer_resolucion(f), extraer_codec(f), size, real))
+        if cp: cp.marcar(clave, {"ficheros": registros, "inodos": uso.sacar_diario()})
+        yield from registros
+
+def recorrer_plex(base_path):
+    """Usa los datos reales que Plex ya extrajo. No toca los discos."""
+    for f_path, meta in plex_metadata.iterar_metadatos(base_path):
+        if CARPETA_EXCLUIDA in plex_metadata.partes_relativas(os.path.dirname(f_path), base_path): continue
+        f = os.path.basename(f_path)
+        if os.path.splitext(f)[1].lower() not in VIDEO_EXT: continue
+        res = plex_metadata.etiqueta_resolucion(meta.width, meta.height) or "SD/Desc"
+        yield f_path, f, res, codec_desde_plex(meta.codec), meta.size, None
+
+# ==========================================
+# INFORME
+# ==========================================
+def generar_informe(registros, config, f_res="", f_cod="", ord_opt="1", al_terminar=None, exportar_csv=False):
+    """
+    Consume registros (ruta, nombre, res, cod, size, real) de cualquier fuente, o un
+    Registros ya lleno, filtra, ordena y escribe el HTML. Devuelve su ruta, o None si
+    no hay coincidencias. 'al_terminar' se llama cuando el recorrido se agotó (p.ej.
+    para borrar el checkpoint).
+    """
+    if isinstance(registros, Registros):
+        reg = registros
+    else:
+        reg = Registros()
+        for registro in registros:
+            reg.anadir(*registro)
+            if len(reg) % 500 == 0: print(f"   ... {len(reg)} archivos", flush=True)
+    if al_terminar: al_terminar()
+
+    f_res = f_res.lower().strip()
+    f_cod = f_cod.lower().strip()
+    filtrados = reg.filtrar(f_res, f_cod)
+
+    if not filtrados:
+        print(f"{Color.FAIL}❌ Sin coincidencias.{Color.ENDC}")
+        return None
+
+    filtrados = reg.ordenar(filtrados, ord_opt)
+    if exportar_csv:
+        export = ExportCSV(config)
+        for i in filtrados:
+            real = reg.real[i]
+            export.fila(reg.ruta(i), reg.nombre[i], reg.etiqueta_res(i), reg.etiqueta_cod(i), reg.size[i],
+                        None if real == Registros.SIN_DATO else real)
+        export.cerrar()
+        print(f"📄 CSV: {export.ruta}", flush=True)
+
+    print_header(f"INFORME: {config['nombre'].upper()}")
+    print(f"   • Archivos: {len(filtrados)}")
+    
+    filters_str = f"Res='{f_res or 'ALL'}', Codec='{f_cod or 'ALL'}'"
+    return generar_html_pro(reg, filtrados, config, reg.stats(), filters_str)
+
+def generar_resumen(registros, config, f_res="", f_cod="", top=TOP_DEFECTO, al_terminar=None, exportar_csv=False):
+    """
+    Como generar_informe, pero sin guardar los registros: cada uno pasa por el top-N
+    y los agregados (y por el CSV si se pide) y se descarta. Memoria constante.
+    """
+    f_res = f_res.lower().strip()
+    f_cod = f_cod.lower().strip()
+    resumen = Resumen(config["ruta"], top)
+    export = ExportCSV(config) if exportar_csv else None
+    leidos = 0
+    try:
+        for registro in registros:
+            leidos += 1
+            if leidos % 500 == 0: print(f"   ... {leidos} archivos", flush=True)
+            res, cod = registro[2], registro[3]
+            if (f_res and f_res not in res.lower()) or (f_cod and f_cod not in cod.lower()): continue
+            resumen.anadir(*registro)
+            if export: export.fila(*registro)
+    finally:
+        if export: export.cerrar()
+    if al_terminar: al_terminar()
+
+    if not resumen.total.n:
+        print(f"{Color.FAIL}❌ Sin coincidencias.{Color.ENDC}")
+        return None
+
+    print_header(f"RESUMEN: {config['nombre'].upper()}")
+    print(f"   • Archivos: {resumen.total.n} (top {len(resumen.heap)} en el informe)")
+    if export: print(f"📄 CSV: {export.ruta}", flush=True)
+
+    filters_str = f"Res='{f_res or 'ALL'}', Codec='{f_cod or 'ALL'}'"
+    return generar_html_resumen(resumen, config, filters_str, export.ruta if export else None)
+
 # ==========================================
 # MAIN
 # ==========================================
 def main():
+    # Aquí y no al importar: 16 carga este módulo y no debe heredar el manejador
+    signal.signal(signal.SIGINT, signal_handler)
     parser = argparse.ArgumentParser()
     parser.add_argument("--lib", choices=["1", "2"], help="ID de librería")
     parser.add_argument("--res", default="", help="Filtro de resolución")
     parser.add_argument("--codec", default="", help="Filtro de codec")
     parser.add_argument("--sort", default="1", choices=["1", "2", "3", "4"], help="Método de ordenación")
+    parser.add_argument("--fuente", default="disco", choices=["disco", "plex"], help="Origen de resolución/códec")
+    parser.add_argument("--modo", default="completo", choices=["completo", "resumen"],
+                        help="resumen: top-N por tamaño y agregados con memoria constante, sin checkpoint (ignora --sort)")
+    parser.add_argument("--top", type=int, default=TOP_DEFECTO, help="Ficheros más grandes del modo resumen")
+    parser.add_argument("--csv", default="no", choices=["no", "yes"], help="Exportar también la tabla completa a CSV")
     args = parser.parse_args()
 
     print_header("ANALIZADOR DE BIBLIOTECA")
@@ -216,66 +674,29 @@ def main():
     config = PATHS[sel]
     base_path = config["ruta"]
     
-    if not os.path.exists(base_path):
+    if args.fuente == "disco" and not os.path.exists(base_path):
         print(f"{Color.FAIL}❌ Ruta no encontrada: {base_path}{Color.ENDC}")
         return
 
-    print(f"{Color.CYAN}📂 Analizando: {base_path}{Color.ENDC}", flush=True)
-
-    total_files = 0
-    for root, dirs, files in os.walk(base_path):
-        if CARPETA_EXCLUIDA in dirs: dirs.remove(CARPETA_EXCLUIDA)
-        total_files += len([f for f in files if os.path.splitext(f)[1].lower() in VIDEO_EXT])
-
-    datos = []
-    stats = defaultdict(int)
-    processed = 0
-    
-    for root, dirs, files in os.walk(base_path):
-        if CARPETA_EXCLUIDA in dirs: dirs.remove(CARPETA_EXCLUIDA)
-        for f in files:
-            ext = os.path.splitext(f)[1].lower()
-            if ext not in VIDEO_EXT: continue
-
-            res = extraer_resolucion(f)
-            cod = extraer_codec(f)
-            f_path = os.path.join(root, f)
-            try: size = os.path.getsize(f_path)
-            except: size = 0
-
-            datos.append({
-                "ruta": f_path, "nombre": f, "res": res, 
-                "cod": cod, "size": size, "size_fmt": formatear_tamano(size)
-            })
-            stats[(res, cod)] += 1
-            processed += 1
-            if processed % 500 == 0: print(f"   ... {processed} archivos", flush=True)
-
-    f_res = args.res.lower().strip()
-    f_cod = args.codec.lower().strip()
-    
-    filtrados = [
-        d for d in datos 
-        if (not f_res or f_res in d["res"].lower()) and 
-           (not f_cod or f_cod in d["cod"].lower())
-    ]
+    print(f"{Color.CYAN}📂 Analizando: {base_path} (fuente: {args.fuente}){Color.ENDC}", flush=True)
 
-    if not filtrados:
-        print(f"{Color.FAIL}❌ Sin coincidencias.{Color.ENDC}")
+    # Solo el recorrido del array es lo bastante largo como para necesitar checkpoint. En modo
+    # resumen no se usa: guardaría cada registro y la memoria dejaría de ser constante
+    cp = None
+    if args.fuente == "disco" and args.modo == "completo":
+        cp = checkpoints.Checkpoint("04_biblioteca", {"ruta": base_path})
+    recorrido = recorrer_plex(base_path) if args.fuente == "plex" else recorrer_disco(base_path, cp)
+    try:
+        al_terminar = cp.terminar if cp else None
+        if args.modo == "resumen":
+            html_path = generar_resumen(recorrido, config, args.res, args.codec, args.top, al_terminar, args.csv == "yes")
+        else:
+            html_path = generar_informe(recorrido, config, args.res, args.codec, args.sort, al_terminar, args.csv == "yes")
+    except (OSError, sqlite3.Error) as e:
+        print(f"{Color.FAIL}❌ Error leyendo datos ({args.fuente}): {e}{Color.ENDC}")
         return
+    if not html_path: return
 
-    ord_opt = args.sort
-    if ord_opt == "2": filtrados.sort(key=lambda x: x["size"])
-    elif ord_opt == "3": filtrados.sort(key=lambda x: x["nombre"])
-    elif ord_opt == "4": filtrados.sort(key=lambda x: ORDEN_RESOL.get(x["res"], 99))
-    else: filtrados.sort(key=lambda x: x["size"], reverse=True)
-
-    print_header(f"INFORME: {config['nombre'].upper()}")
-    print(f"   • Archivos: {len(filtrados)}")
-    
-    filters_str = f"Res='{f_res or 'ALL'}', Codec='{f_cod or 'ALL'}'"
-    html_path = generar_html_pro(filtrados, config, stats, filters_str)
-    
     print(f"\n{Color.GREEN}✅ Informe generado:{Color.ENDC}")
     print(f"📄 {html_path}", flush=True)
 
@@ -5,10 +5,15 @@ import os
 import re
 import sys
 import html
+import sqlite3
 import argparse
 from pathlib import Path
 from datetime import datetime
 
+import checkpoints
+import plex_metadata
+import motor_movimientos
+
 # ==========================================
 # CONFIGURACIÓN
 # ==========================================
@@ -24,7 +29,7 @@ BAJA_CALIDAD = ["576p", "540p", "480p", "360p", "SD", "Desconocido"]
 SCRIPT_DIR = Path("/mnt/user/appdata/media-manager/datos")
 SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
 REPORT_FILENAME = SCRIPT_DIR / "report_05_quality.html"
-SH_FILENAME = SCRIPT_DIR / "script_05_move_quality.sh"
+PLAN_FILENAME = SCRIPT_DIR / "plan_05_move_quality.json"
 
 # ==========================================
 # CLASES Y UTILIDADES
@@ -129,52 +134,31 @@ def generar_html(series_afectadas):
     return REPORT_FILENAME
 
 # ==========================================
-# GENERADOR SCRIPT .SH
+# GENERADOR PLAN DE MOVIMIENTO
 # ==========================================
-def generar_script_sh(series_afectadas):
+def generar_plan(series_afectadas):
+    """Plan JSON para 12_ejecutar_plan.py (rename en el propio disco en vez de mv por /mnt/user)."""
     dest_root = os.path.join(PATH_SERIES_ROOT, CARPETA_UPLOADS, SUB_CARPETA_BAJA_CALIDAD)
-    
-    with open(SH_FILENAME, "w", encoding="utf-8") as f:
-        f.write("#!/bin/bash\n")
-        f.write(f"# Script generado el {datetime.now()}\n")
-        f.write(f"# Destino Base: {dest_root}\n\n")
-        
-        for ruta_serie, datos in series_afectadas.items():
-            categoria = datos['categoria']
-            dest_category_folder = os.path.join(dest_root, categoria)
-            
-            # Escapado básico para bash
-            src_safe = ruta_serie.replace('"', '\\"')
-            dest_cat_safe = dest_category_folder.replace('"', '\\"')
-            
-            f.write(f'mkdir -p "{dest_cat_safe}"\n')
-            f.write(f'mv "{src_safe}" "{dest_cat_safe}/"\n')
-            
-    os.chmod(SH_FILENAME, 0o755)
-    return SH_FILENAME
+    items = []
+    for ruta_serie, datos in series_afectadas.items():
+        nombre = os.path.basename(ruta_serie)
+        items.append({
+            "origen": ruta_serie,
+            "destino": os.path.join(dest_root, datos['categoria'], nombre),
+            "etiqueta": f"{datos['categoria']}/{nombre}",
+        })
+    return motor_movimientos.guardar_plan(str(PLAN_FILENAME), items, "05")
 
 # ==========================================
-# MAIN
+# FUENTES DE DATOS
 # ==========================================
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--porcentaje", type=int, default=80, help="Porcentaje mínimo de caps malos")
-    args = parser.parse_args()
-
-    print_header(f"SCANNER SERIES (Umbral: {args.porcentaje}%)")
-    
-    if not os.path.exists(PATH_SERIES_ROOT):
-        print(f"{Color.FAIL}❌ Ruta no encontrada: {PATH_SERIES_ROOT}{Color.ENDC}")
-        return
-
+def contar_caps_disco(cp=None):
+    """(categoria, serie, ruta, caps, caps_malos) recorriendo el array y leyendo nombres de fichero."""
     try:
         categorias = [d for d in os.listdir(PATH_SERIES_ROOT) 
                       if os.path.isdir(os.path.join(PATH_SERIES_ROOT, d)) and d != CARPETA_UPLOADS]
     except OSError: return
 
-    series_stats = {}
-    total_scan = 0
-    
     for cat in categorias:
         path_cat = os.path.join(PATH_SERIES_ROOT, cat)
         print(f"🔎 Analizando: {cat}", flush=True)
@@ -183,6 +167,14 @@ def main():
         
         for serie in series_dirs:
             path_serie = os.path.join(path_cat, serie)
+            # Cada serie es una unidad del checkpoint (se guardan los conteos, no el veredicto,
+            # así que reanudar con otro --porcentaje también vale)
+            if cp:
+                cp.punto_seguro()
+                if cp.hecho(path_serie):
+                    caps_total, caps_malos = cp.datos(path_serie)
+                    yield cat, serie, path_serie, caps_total, caps_malos
+                    continue
             caps_total = 0; caps_malos = 0
             
             for root, dirs, files in os.walk(path_serie):
@@ -191,15 +183,63 @@ def main():
                         caps_total += 1
                         if es_baja_calidad(detectar_resolucion(f)): caps_malos += 1
             
-            if caps_total > 0:
-                pct_malo = (caps_malos / caps_total) * 100
-                if pct_malo >= args.porcentaje:
-                    series_stats[path_serie] = {
-                        "categoria": cat, "total_caps": caps_total, "malos": caps_malos, "umbral": args.porcentaje 
-                    }
-                    print(f"   ❌ Detectada: {serie} ({int(pct_malo)}%)")
-            
-            total_scan += 1
+            if cp: cp.marcar(path_serie, [caps_total, caps_malos])
+            yield cat, serie, path_serie, caps_total, caps_malos
+
+def contar_caps_plex():
+    """Igual que contar_caps_disco, pero con la resolución real que guarda Plex. No toca los discos."""
+    print("🔎 Leyendo resoluciones desde la DB de Plex...", flush=True)
+    conteo = {}
+    for ruta, meta in plex_metadata.iterar_metadatos(PATH_SERIES_ROOT):
+        partes = plex_metadata.partes_relativas(ruta, PATH_SERIES_ROOT)
+        if len(partes) < 3 or partes[0] == CARPETA_UPLOADS: continue
+        if os.path.splitext(partes[-1])[1].lower() not in VIDEO_EXT: continue
+
+        clave = (partes[0], partes[1])
+        if clave not in conteo: conteo[clave] = [0, 0]
+        conteo[clave][0] += 1
+        res = plex_metadata.etiqueta_resolucion(meta.width, meta.height) or "Desconocido"
+        if es_baja_calidad(res): conteo[clave][1] += 1
+
+    for (cat, serie), (caps_total, caps_malos) in conteo.items():
+        yield cat, serie, os.path.join(PATH_SERIES_ROOT, cat, serie), caps_total, caps_malos
+
+def filtrar_series(recorrido, porcentaje):
+    """Se queda con las series cuyo % de caps malos llega al umbral (ruta -> datos para el HTML y el plan)."""
+    series_stats = {}
+    for cat, serie, path_serie, caps_total, caps_malos in recorrido:
+        if caps_total > 0:
+            pct_malo = (caps_malos / caps_total) * 100
+            if pct_malo >= porcentaje:
+                series_stats[path_serie] = {
+                    "categoria": cat, "total_caps": caps_total, "malos": caps_malos, "umbral": porcentaje 
+                }
+                print(f"   ❌ Detectada: {serie} ({int(pct_malo)}%)")
+    return series_stats
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--porcentaje", type=int, default=80, help="Porcentaje mínimo de caps malos")
+    parser.add_argument("--fuente", default="disco", choices=["disco", "plex"], help="Origen de la resolución")
+    args = parser.parse_args()
+
+    print_header(f"SCANNER SERIES (Umbral: {args.porcentaje}%)")
+    
+    if args.fuente == "disco" and not os.path.exists(PATH_SERIES_ROOT):
+        print(f"{Color.FAIL}❌ Ruta no encontrada: {PATH_SERIES_ROOT}{Color.ENDC}")
+        return
+
+    cp = checkpoints.Checkpoint("05_calidad", {"ruta": PATH_SERIES_ROOT}) if args.fuente == "disco" else None
+    recorrido = contar_caps_plex() if args.fuente == "plex" else contar_caps_disco(cp)
+    try:
+        series_stats = filtrar_series(recorrido, args.porcentaje)
+    except (OSError, sqlite3.Error) as e:
+        print(f"{Color.FAIL}❌ Error leyendo datos ({args.fuente}): {e}{Color.ENDC}")
+        return
+    if cp: cp.terminar()
 
     count = len(series_stats)
     print_header(f"RESULTADOS: {count} SERIES CANDIDATAS")
@@ -209,12 +249,12 @@ def main():
         return
 
     html_path = generar_html(series_stats)
-    sh_path = generar_script_sh(series_stats)
+    plan_path = generar_plan(series_stats)
 
     print(f"\n{Color.GREEN}✅ Archivos generados:{Color.ENDC}")
     print(f"📄 HTML: {html_path}")
-    print(f"📜 SH:   {sh_path}")
-    print(f"\n{Color.WARNING}⚠️  Revisa el .sh antes de ejecutarlo.{Color.ENDC}")
+    print(f"📜 Plan: {plan_path}")
+    print(f"\n{Color.WARNING}⚠️  Revisa el plan y ejecútalo con '12. Ejecutar Plan de Movimiento'.{Color.ENDC}")
 
 if __name__ == "__main__":
     main()
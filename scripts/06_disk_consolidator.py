@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import os
-import shutil
 import re
 import time
+import argparse
 from pathlib import Path
 
+import limitador_io
+from motor_movimientos import copiar_y_borrar
+
 # ==========================================
 # CONFIGURACIÓN
 # ==========================================
@@ -102,13 +105,8 @@ def mover_contenido(origen_root, destino_root):
                 log(f"⚠️ Conflicto: {file} ya existe en destino. Saltando.", "WARN")
             else:
                 try:
-                    # Mover archivo
-                    shutil.move(str(src_file), str(dest_file))
-                    
-                    # Permisos archivo
-                    os.chown(dest_file, UID, GID)
-                    os.chmod(dest_file, 0o664)
-                    
+                    # Copia limitada por disco vía .partial (aplica permisos 99:100 / 664)
+                    copiar_y_borrar(str(src_file), str(dest_file), file)
                     log(f"📦 Movido: {src_file} -> {dest_disk_name}", "INFO")
                 except Exception as e:
                     log(f"Error moviendo {file}: {e}", "ERR")
@@ -124,8 +122,18 @@ def mover_contenido(origen_root, destino_root):
 # MAIN
 # ==========================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limite-mbs", type=int, default=None, help="MB/s máximos por disco (0 = sin límite)")
+    parser.add_argument("--limite-iops", type=int, default=None, help="Operaciones/s máximas por disco (0 = sin límite)")
+    parser.add_argument("--adaptativo", default=None, choices=["yes", "no"], help="Frenar mientras Plex tenga sesiones activas")
+    args = parser.parse_args()
+
     print("🚀 INICIANDO CONSOLIDADOR DE ARRAY UNRAID")
     print("Objetivo: Mover todo al último disco físico disponible.\n")
+
+    limites = limitador_io.configurar(args.limite_mbs, args.limite_iops,
+                                      None if args.adaptativo is None else args.adaptativo == "yes")
+    log(f"🚦 Límite de E/S: {limites.descripcion()}", "INFO")
     
     origenes, destino_disk = obtener_discos()
     
@@ -3,10 +3,14 @@
 
 import os
 import re
+import argparse
 from datetime import datetime
 from collections import defaultdict
 from pathlib import Path
 
+import checkpoints
+import plex_metadata
+
 # ==========================================
 # CONFIGURACIÓN
 # ==========================================
@@ -30,6 +34,8 @@ INFORME_HTML = SCRIPT_DIR / "report_07_series_caps.html"
 class Color:
     HEADER = '\033[95m'; BLUE = '\033[94m'; GREEN = '\033[92m'; WARNING = '\033[93m'; FAIL = '\033[91m'; ENDC = '\033[0m'; BOLD = '\033[1m'
 
+CALIDADES = ('2160p', '1080p', '720p', '576p', '480p')
+
 def detectar_calidad(nombre_archivo):
     nombre = nombre_archivo.lower()
     if '2160p' in nombre or '4k' in nombre: return '2160p'
@@ -39,44 +45,84 @@ def detectar_calidad(nombre_archivo):
     if '480p' in nombre: return '480p'
     return 'SD/Otros'
 
-def procesar_series():
-    print(f"\n{Color.HEADER}=== ANALIZANDO RESOLUCIONES (SERIES) ==={Color.ENDC}", flush=True)
+def contar_calidades_disco(ruta_base, cp=None):
+    """serie -> {calidad: caps, 'total': caps} leyendo nombres de fichero en el array."""
+    datos_series = defaultdict(lambda: defaultdict(int))
     
-    resultados_por_categoria = []
+    try:
+        series_lista = [d for d in os.listdir(ruta_base) if os.path.isdir(os.path.join(ruta_base, d))]
+    except OSError: return None
+
+    total_cat = len(series_lista)
+    procesados = 0
     
-    # KPI Globales
-    total_series = 0
-    total_episodios = 0
-    series_mezcladas = 0
+    for serie in series_lista:
+        procesados += 1
+        if procesados % 100 == 0:
+            print(f"   ... {procesados}/{total_cat} series analizadas", flush=True)
+            
+        ruta_serie = os.path.join(ruta_base, serie)
+        if cp:
+            cp.punto_seguro()
+            if cp.hecho(ruta_serie):
+                d = cp.datos(ruta_serie)
+                if d: datos_series[serie].update(d)
+                continue
+        
+        for root, _, files in os.walk(ruta_serie):
+            for f in files:
+                if os.path.splitext(f)[1].lower() in EXT_VIDEO:
+                    calidad = detectar_calidad(f)
+                    datos_series[serie][calidad] += 1
+                    datos_series[serie]["total"] += 1
+        # .get: una serie sin vídeos no debe aparecer como fila con Total 0
+        if cp: cp.marcar(ruta_serie, dict(datos_series.get(serie, {})))
+    return datos_series
+
+def contar_calidades_plex(ruta_base):
+    """Igual que contar_calidades_disco, pero con la resolución real guardada en Plex."""
+    datos_series = defaultdict(lambda: defaultdict(int))
+    for ruta, meta in plex_metadata.iterar_metadatos(ruta_base):
+        partes = plex_metadata.partes_relativas(ruta, ruta_base)
+        if len(partes) < 2 or os.path.splitext(partes[-1])[1].lower() not in EXT_VIDEO: continue
+        calidad = plex_metadata.etiqueta_resolucion(meta.width, meta.height)
+        if calidad not in CALIDADES: calidad = 'SD/Otros'
+        datos_series[partes[0]][calidad] += 1
+        datos_series[partes[0]]["total"] += 1
+    return datos_series
+
+def procesar_series(fuente="disco"):
+    print(f"\n{Color.HEADER}=== ANALIZANDO RESOLUCIONES (SERIES) ==={Color.ENDC}", flush=True)
+    
+    conteos = []
+    cp = checkpoints.Checkpoint("07_series_caps", {"rutas": RUTAS_SERIES}) if fuente == "disco" else None
 
     for nombre_cat, ruta_base in RUTAS_SERIES.items():
-        if not os.path.exists(ruta_base): continue
+        if fuente == "disco" and not os.path.exists(ruta_base): continue
         
         print(f"📂 Analizando categoría: {nombre_cat}...", flush=True)
         
-        datos_series = defaultdict(lambda: defaultdict(int))
-        
-        try:
-            series_lista = [d for d in os.listdir(ruta_base) if os.path.isdir(os.path.join(ruta_base, d))]
-        except OSError: continue
+        if fuente == "plex":
+            datos_series = contar_calidades_plex(ruta_base)
+        else:
+            datos_series = contar_calidades_disco(ruta_base, cp)
+        if datos_series is None: continue
+        conteos.append((nombre_cat, datos_series))
 
-        total_cat = len(series_lista)
-        procesados = 0
-        
-        for serie in series_lista:
-            procesados += 1
-            if procesados % 100 == 0:
-                print(f"   ... {procesados}/{total_cat} series analizadas", flush=True)
-                
-            ruta_serie = os.path.join(ruta_base, serie)
-            
-            for root, _, files in os.walk(ruta_serie):
-                for f in files:
-                    if os.path.splitext(f)[1].lower() in EXT_VIDEO:
-                        calidad = detectar_calidad(f)
-                        datos_series[serie][calidad] += 1
-                        datos_series[serie]["total"] += 1
+    if cp: cp.terminar()
+    print(f"\n{Color.GREEN}✅ Análisis completado.{Color.ENDC}", flush=True)
+    generar_html_pro(*resumir_categorias(conteos))
+
+def resumir_categorias(conteos):
+    """[(categoria, serie -> {calidad: caps})] -> (filas por categoría, series, episodios, series con mezcla)."""
+    resultados_por_categoria = []
+    
+    # KPI Globales
+    total_series = 0
+    total_episodios = 0
+    series_mezcladas = 0
 
+    for nombre_cat, datos_series in conteos:
         items_html = []
         for serie, counts in datos_series.items():
             total = counts["total"]
@@ -102,9 +148,7 @@ def procesar_series():
             "categoria": nombre_cat,
             "items": items_html
         })
-
-    print(f"\n{Color.GREEN}✅ Análisis completado.{Color.ENDC}", flush=True)
-    generar_html_pro(resultados_por_categoria, total_series, total_episodios, series_mezcladas)
+    return resultados_por_categoria, total_series, total_episodios, series_mezcladas
 
 def generar_html_pro(datos, t_series, t_eps, t_mezcla):
     ts = datetime.now().strftime('%Y-%m-%d %H:%M')
@@ -265,4 +309,7 @@ def generar_html_pro(datos, t_series, t_eps, t_mezcla):
     print(f"\n📄 Informe HTML generado: {INFORME_HTML}", flush=True)
 
 if __name__ == "__main__":
-    procesar_series()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fuente", default="disco", choices=["disco", "plex"], help="Origen de la resolución")
+    args = parser.parse_args()
+    procesar_series(args.fuente)
@@ -4,6 +4,9 @@ import sys
 from collections import Counter, defaultdict
 import datetime
 
+import checkpoints
+from uso_disco import UsoDisco
+
 # --- CONFIGURACIÓN ---
 BASE_PATH = "/mnt/user/series/Uploads/BajaCalidad"
 LOGS_DIR = "/mnt/user/appdata/media-manager/datos"
@@ -92,7 +95,53 @@ def extract_season_number(season_name):
     nums = re.findall(r'\d+', season_name)
     return int(nums[0]) if nums else 9999
 
-def analyze_category(category_name, category_path):
+def detectar_resolucion(vfile):
+    match = RES_REGEX.search(vfile)
+    return match.group(1).lower() if match else "N/A"
+
+def nombre_temporada(rel_path):
+    """Temporada a la que pertenece una carpeta (ruta relativa a la serie)."""
+    return "Raíz" if rel_path == "." else rel_path.split(os.sep)[0]
+
+def fila_serie(series, season_info, all_resolutions, uso):
+    """Fila del informe para una serie, o None si no tiene vídeos."""
+    if not season_info: return None
+
+    # Extraer Año
+    year_match = YEAR_REGEX.search(series)
+    series_year = year_match.group(1) if year_match else "-"
+
+    maj_res_global = get_majority_resolution(all_resolutions)
+    size_str, size_bytes = get_readable_size(uso.aparente)
+    real_str, real_bytes = get_readable_size(uso.real)
+    
+    # Procesar detalles por temporada (Orden Numérico y Resolución individual)
+    # Convertimos a lista y ordenamos usando la función extract_season_number
+    sorted_seasons = sorted(season_info.items(), key=lambda x: extract_season_number(x[0]))
+    
+    details_parts = []
+    for s_name, s_data in sorted_seasons:
+        s_maj_res = get_majority_resolution(s_data['res_list'])
+        s_count = s_data['count']
+        # Formato: Season 01 [720p]: 12
+        details_parts.append(f"{s_name} <span class='res-sub-badge'>{s_maj_res}</span>: <b>{s_count}</b>")
+    
+    details_str = " <span style='color:#666'>|</span> ".join(details_parts)
+    
+    return {
+        "name": series,
+        "year": series_year,
+        "res": maj_res_global,
+        "size_str": size_str,
+        "size_bytes": size_bytes,
+        "real_str": real_str,
+        "real_bytes": real_bytes,
+        "seasons": len(season_info),
+        "episodes": sum(s['count'] for s in season_info.values()),
+        "details": details_str
+    }
+
+def analyze_category(category_name, category_path, uso_cat=None, cp=None):
     data = []
     if not os.path.exists(category_path):
         print(f"  [!] La ruta {category_path} no existe.")
@@ -110,15 +159,22 @@ def analyze_category(category_name, category_path):
 
     print(f"  > Escaneando {total_series} series en {category_name}...")
 
+    if cp and uso_cat is not None: uso_cat.iniciar_diario()
+
     for i, series in enumerate(series_dirs, 1):
-        print(f"    [{i}/{total_series}] Analizando: {series}")
         series_path = os.path.join(category_path, series)
+        # Cada serie es una unidad del checkpoint: su fila y lo que aportó al uso de la categoría
+        if cp:
+            cp.punto_seguro()
+            if cp.hecho(series_path):
+                d = cp.datos(series_path)
+                if d["row"]: data.append(d["row"])
+                if uso_cat is not None: uso_cat.restaurar(d["uso_cat"], d["inodos"])
+                continue
+        print(f"    [{i}/{total_series}] Analizando: {series}")
         
-        # Extraer Año
-        year_match = YEAR_REGEX.search(series)
-        series_year = year_match.group(1) if year_match else "-"
-
-        total_size = 0
+        antes = uso_cat.contadores() if uso_cat is not None else None
+        uso = UsoDisco()
         # Estructura: season_info[nombre_temp] = {'count': 0, 'res_list': []}
         season_info = defaultdict(lambda: {'count': 0, 'res_list': []})
         all_resolutions = []
@@ -127,70 +183,47 @@ def analyze_category(category_name, category_path):
             video_files = [f for f in files if f.lower().endswith(VIDEO_EXTENSIONS)]
             if not video_files: continue
 
-            rel_path = os.path.relpath(root, series_path)
-            season_name = "Raíz" if rel_path == "." else rel_path.split(os.sep)[0]
+            season_name = nombre_temporada(os.path.relpath(root, series_path))
 
             for vfile in video_files:
                 fpath = os.path.join(root, vfile)
-                try:
-                    total_size += os.path.getsize(fpath)
-                except: pass
+                try: st = os.stat(fpath)
+                except OSError: st = None
+                if st:
+                    # Hardlinks: el uso real cuenta cada inodo una vez (por serie y por categoría)
+                    uso.sumar(st)
+                    if uso_cat is not None: uso_cat.sumar(st)
                 
-                # Detectar resolución
-                match = RES_REGEX.search(vfile)
-                res = match.group(1).lower() if match else "N/A"
+                res = detectar_resolucion(vfile)
                 
                 # Guardar datos globales y por temporada
                 all_resolutions.append(res)
                 season_info[season_name]['count'] += 1
                 season_info[season_name]['res_list'].append(res)
 
-        if season_info:
-            maj_res_global = get_majority_resolution(all_resolutions)
-            size_str, size_bytes = get_readable_size(total_size)
-            
-            # Procesar detalles por temporada (Orden Numérico y Resolución individual)
-            # Convertimos a lista y ordenamos usando la función extract_season_number
-            sorted_seasons = sorted(season_info.items(), key=lambda x: extract_season_number(x[0]))
-            
-            details_parts = []
-            for s_name, s_data in sorted_seasons:
-                s_maj_res = get_majority_resolution(s_data['res_list'])
-                s_count = s_data['count']
-                # Formato: Season 01 [720p]: 12
-                details_parts.append(f"{s_name} <span class='res-sub-badge'>{s_maj_res}</span>: <b>{s_count}</b>")
-            
-            details_str = " <span style='color:#666'>|</span> ".join(details_parts)
-            
-            data.append({
-                "name": series,
-                "year": series_year,
-                "res": maj_res_global,
-                "size_str": size_str,
-                "size_bytes": size_bytes,
-                "seasons": len(season_info),
-                "episodes": sum(s['count'] for s in season_info.values()),
-                "details": details_str
+        row = fila_serie(series, season_info, all_resolutions, uso)
+        if row: data.append(row)
+
+        if cp:
+            cp.marcar(series_path, {
+                "row": row,
+                "uso_cat": uso_cat.aporte_desde(antes) if uso_cat is not None else None,
+                "inodos": uso_cat.sacar_diario() if uso_cat is not None else [],
             })
     
     print(f"    [OK] Fin {category_name}. {len(data)} series procesadas.")
     return data
 
-def generate_html():
+def escribir_html(categorias):
+    """categorias: [(nombre, filas, UsoDisco de la categoría)] en el orden del informe."""
     if not os.path.exists(LOGS_DIR):
         try: os.makedirs(LOGS_DIR)
         except: pass
 
-    print(f"{'='*60}\n REPORTE AVANZADO: BAJA CALIDAD\n{'='*60}")
-    
     html_content = f"<!DOCTYPE html><html><head><title>Reporte Baja Calidad</title><meta charset=\"utf-8\">{CSS_STYLE}</head><body>"
     html_content += f"<div class=\"container\"><h1>📊 Reporte de Contenido: Baja Calidad</h1><div class=\"summary-box\">Generado: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}</div>"
 
-    for idx, category in enumerate(TARGET_CATEGORIES):
-        print(f"\n>>> Categoría: {category.upper()}")
-        cat_path = os.path.join(BASE_PATH, category)
-        rows = analyze_category(category, cat_path)
-        
+    for idx, (category, rows, uso_cat) in enumerate(categorias):
         table_id = f"table_{idx}"
         html_content += f"<h2>📂 {category}</h2>"
         
@@ -198,6 +231,8 @@ def generate_html():
             html_content += "<p>Sin contenido.</p>"
             continue
 
+        html_content += f"<div class=\"summary-box\">Tamaño aparente: <b>{get_readable_size(uso_cat.aparente)[0]}</b> | Uso real (hardlinks una vez): <b>{get_readable_size(uso_cat.real)[0]}</b></div>"
+
         html_content += f'<table id="{table_id}" class="display"><thead><tr>'
         # Nueva columna Año añadida
         headers = ["Serie", "Año", "Res. Global", "Tamaño", "Temp.", "Caps", "Detalle (Res : Caps)"]
@@ -210,7 +245,7 @@ def generate_html():
                 <td data-order="{row['name']}"><b>{row['name']}</b></td>
                 <td class="year-cell">{row['year']}</td>
                 <td><span class="res-badge">{row['res']}</span></td>
-                <td class="size-cell" data-order="{row['size_bytes']}">{row['size_str']}</td>
+                <td class="size-cell" data-order="{row['size_bytes']}">{row['size_str']}{'' if row['real_bytes'] == row['size_bytes'] else f"<br><small>real {row['real_str']}</small>"}</td>
                 <td data-order="{row['seasons']}">{row['seasons']}</td>
                 <td data-order="{row['episodes']}">{row['episodes']}</td>
                 <td class="details-cell">{row['details']}</td>
@@ -221,6 +256,22 @@ def generate_html():
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         f.write(html_content)
+
+def generate_html():
+    print(f"{'='*60}\n REPORTE AVANZADO: BAJA CALIDAD\n{'='*60}")
+    # "uso": los checkpoints antiguos guardaban contadores absolutos y no sirven
+    cp = checkpoints.Checkpoint("08_baja_calidad", {"ruta": BASE_PATH, "categorias": TARGET_CATEGORIES, "uso": "aporte"})
+
+    categorias = []
+    for category in TARGET_CATEGORIES:
+        print(f"\n>>> Categoría: {category.upper()}")
+        cat_path = os.path.join(BASE_PATH, category)
+        uso_cat = UsoDisco()
+        rows = analyze_category(category, cat_path, uso_cat, cp)
+        categorias.append((category, rows, uso_cat))
+
+    escribir_html(categorias)
+    cp.terminar()
     
     print(f"\n{'='*60}\n OK: Reporte guardado en:\n {OUTPUT_FILE}\n{'='*60}")
 
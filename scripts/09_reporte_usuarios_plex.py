@@ -1,10 +1,16 @@
 import os
-import sqlite3
 import xml.etree.ElementTree as ET
 from datetime import datetime
 import sys
+import json
+import time
+import threading
+import urllib.error
 import urllib.request
 
+import plex_db
+from plex_historial import HistorialVistas
+
 # === CONFIGURACIÓN ===
 # Ajusta estas rutas si es necesario para tu servidor Unraid
 PLEX_PREFS = "/mnt/user/appdata/plex/Library/Application Support/Plex Media Server/Preferences.xml"
@@ -14,6 +20,17 @@ DB_PATH = "/mnt/user/appdata/plex/Library/Application Support/Plex Media Server/
 LOGS_DIR = "/mnt/user/appdata/media-manager/datos"
 OUTPUT_FILE = os.path.join(LOGS_DIR, "report_09_usuarios_plex.html")
 
+# Directorio de usuarios de Plex.tv (cacheado). La URL se puede apuntar a un servidor local
+# de pruebas: plex_tv_simulado.py (con --comprobar prueba esta caché de punta a punta).
+USERS_URL = os.environ.get("PLEX_TV_USERS_URL", "https://plex.tv/api/users")
+CACHE_DIR = os.path.join(LOGS_DIR, "cache")
+USERS_CACHE_FILE = os.path.join(CACHE_DIR, "plex_users.json")
+USERS_CACHE_TTL = 6 * 3600  # segundos
+
+# Historial incremental de visionados (ver plex_historial)
+HISTORY_DB = os.path.join(CACHE_DIR, "historial_plex.db")
+ACTIVITY_MONTHS = 6
+
 # Colores Consola (para debug local)
 RESET = "\033[0m"
 RED = "\033[91m"
@@ -46,6 +63,8 @@ CSS_STYLE = """
     .email-cell { color: #9ca3af; font-family: 'Consolas', monospace; font-size: 0.9em; }
     .count-cell { font-weight: bold; color: #e0e0e0; text-align: center; }
     .date-cell { color: #60a5fa; }
+    .trend { display: flex; align-items: flex-end; gap: 3px; height: 24px; }
+    .trend .bar { width: 8px; background-color: #4da6ff; border-radius: 2px 2px 0 0; opacity: 0.8; }
     
     .summary-box { background: #333337; padding: 15px; border-radius: 5px; margin-bottom: 20px; border-left: 5px solid #4da6ff; display: flex; justify-content: space-between; align-items: center; }
     .stats-mini { display: flex; gap: 20px; }
@@ -107,67 +126,149 @@ def get_token():
     except: pass
     return None
 
-def get_api(token):
+def parse_users(stream):
+    """Parsea el XML de plex.tv/api/users en streaming (sin cargar el documento entero)."""
     users = {}
-    url = "https://plex.tv/api/users"
-    
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if elem.tag != 'User': continue
+        try: 
+            users[int(elem.get('id'))] = {'name': elem.get('username'), 'email': elem.get('email')}
+        except: pass
+        elem.clear()
+    return users
+
+def load_users_cache():
+    try:
+        with open(USERS_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        # JSON guarda las claves como texto
+        cache['users'] = {int(k): v for k, v in cache.get('users', {}).items()}
+        return cache
+    except (OSError, ValueError):
+        return None
+
+def save_users_cache(cache):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = USERS_CACHE_FILE + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp, USERS_CACHE_FILE)
+
+def fetch_users(token, cache=None):
+    """
+    Descarga el directorio de usuarios revalidando la caché (ETag / Last-Modified).
+    Devuelve (cache_actualizada, cambiado). Lanza excepción si no hay respuesta válida.
+    """
+    # Usamos urllib en lugar de curl/subprocess para evitar dependencias
+    req = urllib.request.Request(USERS_URL)
+    req.add_header("X-Plex-Token", token)
+    if cache:
+        if cache.get('etag'): req.add_header("If-None-Match", cache['etag'])
+        if cache.get('last_modified'): req.add_header("If-Modified-Since", cache['last_modified'])
+
     try:
-        # Usamos urllib en lugar de curl/subprocess para evitar dependencias
-        req = urllib.request.Request(url)
-        req.add_header("X-Plex-Token", token)
-        
         with urllib.request.urlopen(req, timeout=15) as response:
-            xml_content = response.read()
-            
-        root = ET.fromstring(xml_content)
-        for u in root.findall('User'):
-            try: 
-                users[int(u.get('id'))] = {'name': u.get('username'), 'email': u.get('email')}
-            except: pass
-            
-    except Exception as e: 
-        print(f"Nota: No se pudo contactar API Plex o Token inválido ({e})")
+            users = parse_users(response)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cache:
+            cache['fetched'] = time.time()
+            save_users_cache(cache)
+            return cache, False
+        raise
+
+    new_cache = {'fetched': time.time(), 'etag': etag, 'last_modified': last_modified, 'users': users}
+    changed = not cache or cache.get('users') != users
+    save_users_cache(new_cache)
+    return new_cache, changed
+
+def get_api(token):
+    """
+    Devuelve (usuarios, necesita_refresco).
+    Con caché vigente no hay red; con caché caducada se devuelve igualmente
+    para pintar el informe al instante y se pide refresco en segundo plano.
+    """
+    users = {}
+    refresh = False
+    cache = load_users_cache()
+
+    if cache and time.time() - cache.get('fetched', 0) < USERS_CACHE_TTL:
+        users = dict(cache['users'])
+    elif cache:
+        print("  > Usando directorio en caché (se refrescará en segundo plano)...")
+        users = dict(cache['users'])
+        refresh = True
+    else:
+        try:
+            cache, _ = fetch_users(token)
+            users = dict(cache['users'])
+        except Exception as e: 
+            print(f"Nota: No se pudo contactar API Plex o Token inválido ({e})")
         
     # Admin siempre existe
     if 1 not in users: 
         users[1] = {'name': 'ADMIN (Server Owner)', 'email': 'Dueño'}
-    return users
+    return users, refresh
+
+def refresh_users(token, result):
+    """Hilo de refresco: deja en result['users'] el directorio nuevo solo si ha cambiado."""
+    try:
+        cache, changed = fetch_users(token, load_users_cache())
+        if changed: result['users'] = dict(cache['users'])
+    except Exception as e:
+        print(f"Nota: No se pudo refrescar el directorio de Plex.tv ({e}). Se mantiene la caché.")
 
 def get_local():
     if not os.path.exists(DB_PATH):
         print(f"ERROR: No se encuentra la base de datos en {DB_PATH}")
-        return {}, {}
+        return {}, {}, {}
 
-    tmp = "/tmp/stats_plex.db"
-    # Copiamos la DB a tmp para no bloquearla si Plex la está usando
-    os.system(f'cp "{DB_PATH}" "{tmp}" && chmod 777 "{tmp}"')
-    
-    stats, offline = {}, {}
+    stats, offline, activity = {}, {}, {}
     try:
-        conn = sqlite3.connect(tmp)
-        cur = conn.cursor()
-        
-        # 1. Obtener estadísticas de uso
-        cur.execute("SELECT account_id, count(*), max(last_viewed_at) FROM metadata_item_settings WHERE view_count > 0 GROUP BY account_id;")
-        for r in cur.fetchall():
-            ts = r[2] if r[2] else 0
-            d_str = datetime.fromtimestamp(ts).strftime('%d/%m/%Y %H:%M') if ts > 0 else "Nunca"
-            stats[r[0]] = {'count': r[1], 'last_ts': ts, 'last_str': d_str}
-
-        # 2. Obtener nombres de cuentas locales
-        try:
-            cur.execute("SELECT id, name FROM accounts;")
-            for r in cur.fetchall(): 
-                offline[r[0]] = r[1]
-        except: pass
-        
-        conn.close()
+        with HistorialVistas(HISTORY_DB) as hist:
+            # Lectura sin copiar la DB (ver plex_db: URI de solo lectura o instantánea cacheada)
+            with plex_db.conexion(DB_PATH) as conn:
+                cur = conn.cursor()
+                
+                # 1. Traer solo los visionados nuevos desde la última ejecución
+                nuevos = hist.actualizar(conn)
+                print(f"  > {nuevos} visionados nuevos incorporados al historial local.")
+
+                # 2. Obtener nombres de cuentas locales
+                try:
+                    cur.execute("SELECT id, name FROM accounts;")
+                    for r in cur.fetchall(): 
+                        offline[r[0]] = r[1]
+                except: pass
+
+            # 3. Estadísticas de uso desde el historial local
+            for uid, (count, ts) in hist.resumen_por_usuario().items():
+                d_str = datetime.fromtimestamp(ts).strftime('%d/%m/%Y %H:%M') if ts > 0 else "Nunca"
+                stats[uid] = {'count': count, 'last_ts': ts, 'last_str': d_str}
+            activity = hist.actividad_mensual(ACTIVITY_MONTHS)
     except Exception as e:
         print(f"Error leyendo DB SQLite: {e}")
-    finally:
-        if os.path.exists(tmp): os.remove(tmp)
     
-    return stats, offline
+    return stats, offline, activity
+
+def last_months(n):
+    """Claves 'YYYY-MM' de los últimos n meses, del más antiguo al actual."""
+    y, m = datetime.now().year, datetime.now().month
+    keys = []
+    for _ in range(n):
+        keys.append(f"{y:04d}-{m:02d}")
+        m -= 1
+        if m == 0: y, m = y - 1, 12
+    return keys[::-1]
+
+def trend_html(values):
+    """Mini gráfico de barras (una por mes) con el nº de visionados."""
+    top = max(values) or 1
+    bars = "".join(
+        f'<span class="bar" title="{v}" style="height:{max(2, int(24 * v / top))}px"></span>' for v in values
+    )
+    return f'<div class="trend">{bars}</div>'
 
 def generate_html_report(data):
     if not os.path.exists(LOGS_DIR):
@@ -178,6 +279,8 @@ def generate_html_report(data):
     total_users = len(data)
     active_users = sum(1 for r in data if r['raw_status'] == 'Activo')
     removed_users = sum(1 for r in data if r['raw_status'] == 'Baja')
+    months = last_months(ACTIVITY_MONTHS)
+    months_label = f"{months[0]} → {months[-1]}"
 
     html_content = f"""
     <!DOCTYPE html>
@@ -210,6 +313,7 @@ def generate_html_report(data):
                         <th>Email / Contacto</th>
                         <th style="text-align:center;">Items Vistos</th>
                         <th>Última Actividad</th>
+                        <th>Actividad ({months_label})</th>
                     </tr>
                 </thead>
                 <tbody>
@@ -228,6 +332,7 @@ def generate_html_report(data):
                         <td class="email-cell">{row['email']}</td>
                         <td class="count-cell" data-order="{row['count']}">{row['count']}</td>
                         <td class="date-cell" data-order="{row['ts']}">{row['last_str']}</td>
+                        <td class="trend-cell" data-order="{sum(row['trend'])}">{trend_html(row['trend'])}</td>
                     </tr>
         """
     
@@ -246,24 +351,7 @@ def generate_html_report(data):
     print(f"    [OK] Reporte generado exitosamente.")
     print(f"    Archivo: {OUTPUT_FILE}")
 
-def main():
-    print(f"{'='*60}")
-    print(f" GENERADOR DE REPORTE DE USUARIOS PLEX")
-    print(f"{'='*60}")
-
-    print("  > Obteniendo Token de Plex...")
-    token = get_token()
-    
-    api_users = {}
-    if token:
-        print("  > Consultando API de Plex.tv...")
-        api_users = get_api(token)
-    else:
-        print("  [!] No se encontró Token en Preferences.xml. Solo se usarán datos locales.")
-
-    print("  > Leyendo base de datos local (SQLite)...")
-    stats, offline_names = get_local()
-    
+def build_report(api_users, stats, offline_names, activity):
     report_data = []
     all_ids = set(api_users.keys()) | set(stats.keys())
     
@@ -294,17 +382,55 @@ def main():
         
         if not raw_name: raw_name = f"Usuario {uid}"
 
+        per_month = activity.get(uid, {})
         report_data.append({
             'raw_status': status,
             'raw_name': raw_name,
             'email': email,
             'count': s['count'],
             'last_str': s['last_str'],
-            'ts': s['last_ts']
+            'ts': s['last_ts'],
+            'trend': [per_month.get(k, 0) for k in last_months(ACTIVITY_MONTHS)]
         })
 
     report_data.sort(key=lambda x: x['ts'], reverse=True)
-    generate_html_report(report_data)
+    return report_data
+
+def main():
+    print(f"{'='*60}")
+    print(f" GENERADOR DE REPORTE DE USUARIOS PLEX")
+    print(f"{'='*60}")
+
+    print("  > Obteniendo Token de Plex...")
+    token = get_token()
+    
+    api_users = {}
+    refresh = False
+    if token:
+        print("  > Consultando directorio de usuarios de Plex.tv...")
+        api_users, refresh = get_api(token)
+    else:
+        print("  [!] No se encontró Token en Preferences.xml. Solo se usarán datos locales.")
+
+    refreshed = {}
+    refresher = None
+    if refresh:
+        refresher = threading.Thread(target=refresh_users, args=(token, refreshed))
+        refresher.start()
+
+    print("  > Leyendo base de datos local (SQLite)...")
+    stats, offline_names, activity = get_local()
+    
+    generate_html_report(build_report(api_users, stats, offline_names, activity))
+
+    if refresher:
+        refresher.join(timeout=30)
+        if 'users' in refreshed:
+            print("  > Directorio de Plex.tv actualizado, regenerando reporte...")
+            api_users = refreshed['users']
+            if 1 not in api_users: 
+                api_users[1] = {'name': 'ADMIN (Server Owner)', 'email': 'Dueño'}
+            generate_html_report(build_report(api_users, stats, offline_names, activity))
     print(f"{'='*60}\n")
 
 if __name__ == "__main__":
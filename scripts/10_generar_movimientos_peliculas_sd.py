@@ -1,9 +1,10 @@
 #!/usr/bin/python3
 import os
 import sys
-import shutil
 import sqlite3
-from datetime import datetime
+
+import plex_db
+import motor_movimientos
 
 # ==============================================================================
 # CONFIGURACI脫N GENERAL Y RUTAS
@@ -17,13 +18,12 @@ if not os.path.exists(BASE_LOGS_DIR):
 # --- RUTA DE DESTINO FINAL ---
 DESTINO_ROOT = "/mnt/user/peliculas/BajaCalidad"
 
-# --- CAMBIO AQUI: Nombre del script .sh ---
-SCRIPT_SALIDA_SH = os.path.join(BASE_LOGS_DIR, "script_10_peliculas_move_sd.sh")
+# --- Plan de movimiento (lo ejecuta 12_ejecutar_plan.py) ---
+PLAN_SALIDA = os.path.join(BASE_LOGS_DIR, "plan_10_peliculas_move_sd.json")
 REPORTE_HTML = os.path.join(BASE_LOGS_DIR, "report_10_peliculas_sd.html")
 
 # Rutas de la Base de Datos (Mapeada en el contenedor)
 PLEX_DB_PATH = "/mnt/user/appdata/plex/Library/Application Support/Plex Media Server/Plug-in Support/Databases/com.plexapp.plugins.library.db"
-TEMP_DB_PATH = "/tmp/plex_scan_sd_temp.db"
 
 # Prefijos para correcci贸n de rutas
 DOCKER_PREFIX = "/data" 
@@ -109,15 +109,7 @@ def obtener_datos_plex():
         print(f"{RED}ERROR CR脥TICO: No encuentro la DB en: {PLEX_DB_PATH}{RESET}")
         sys.exit(1)
 
-    print(f"{BLUE}--> Copiando base de datos a entorno temporal...{RESET}")
-    try:
-        if os.path.exists(TEMP_DB_PATH): os.remove(TEMP_DB_PATH)
-        shutil.copy2(PLEX_DB_PATH, TEMP_DB_PATH)
-    except Exception as e:
-        print(f"{RED}Error copiando DB: {e}{RESET}")
-        sys.exit(1)
-
-    print(f"{BLUE}--> Ejecutando consulta SQL nativa...{RESET}")
+    print(f"{BLUE}--> Ejecutando consulta SQL nativa (DB de solo lectura)...{RESET}")
     query = (
         "SELECT mi.title, mi.year, mp.file, m.width, m.height, mp.size, m.video_codec "
         "FROM metadata_items mi "
@@ -129,22 +121,18 @@ def obtener_datos_plex():
     )
     
     resultados = []
-    conn = None
     try:
-        conn = sqlite3.connect(TEMP_DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        resultados = cursor.fetchall()
+        with plex_db.conexion(PLEX_DB_PATH) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            resultados = cursor.fetchall()
     except sqlite3.Error as e:
         print(f"{RED}Error SQL: {e}{RESET}")
-    finally:
-        if conn: conn.close()
-        if os.path.exists(TEMP_DB_PATH): os.remove(TEMP_DB_PATH)
         
     return resultados
 
 def generate_html_report(data_list):
-    script_basename = os.path.basename(SCRIPT_SALIDA_SH)
+    script_basename = os.path.basename(PLAN_SALIDA)
     html_content = f"""
     <!DOCTYPE html>
     <html lang="es">
@@ -157,7 +145,7 @@ def generate_html_report(data_list):
         <div class="container">
             <h1>馃搲 Reporte: Pel铆culas Baja Resoluci贸n (SD)</h1>
             <div class="alert">
-                <strong>Acci贸n Generada:</strong> Se ha creado el script de>{script_basename}</code> 
+                <strong>Acci贸n Generada:</strong> Se ha creado el plan de>{script_basename}</code> 
                 con <strong>{len(data_list)}</strong> movimientos programados hacia la carpeta:
                 <br>de>{DESTINO_ROOT}</code>
             </div>
@@ -196,9 +184,8 @@ def main():
     rows = obtener_datos_plex()
     if not rows: return
 
-    comandos_mv = []
+    items_plan = {}
     data_list = []
-    categorias_detectadas = set()
 
     print(f"{BLUE}--> Procesando {len(rows)} archivos...{RESET}")
 
@@ -225,28 +212,27 @@ def main():
         })
 
         ruta_destino_cat = os.path.join(DESTINO_ROOT, categoria)
-        categorias_detectadas.add(ruta_destino_cat)
-        
-        src = f'"{dir_origen}"'
-        dst = f'"{ruta_destino_cat}"'
-        comandos_mv.append(f"# {title} ({width}x{height})\nmv -n -v {src} {dst}/")
+
+        # Una carpeta por pelicula: varias partes del mismo titulo son un solo movimiento
+        if dir_origen not in items_plan:
+            items_plan[dir_origen] = {
+                "origen": dir_origen,
+                "destino": os.path.join(ruta_destino_cat, os.path.basename(dir_origen)),
+                "etiqueta": f"{title} ({width}x{height})",
+                "tamano": 0,
+            }
+        items_plan[dir_origen]["tamano"] += size_bytes or 0
 
     try:
-        with open(SCRIPT_SALIDA_SH, 'w') as f:
-            f.write("#!/bin/bash\n")
-            f.write(f"# Script generado el {datetime.now()}\n")
-            f.write(f"# Destino base: {DESTINO_ROOT}\n\n")
-            for cat in sorted(categorias_detectadas): f.write(f'mkdir -p "{cat}"\n')
-            f.write("\n" + '\n'.join(comandos_mv) + "\n")
-        os.chmod(SCRIPT_SALIDA_SH, 0o755)
-        print(f"{GREEN}[SH] Script Bash guardado en: {SCRIPT_SALIDA_SH}{RESET}")
-    except IOError as e: print(f"{RED}Error escribiendo SH: {e}{RESET}")
+        motor_movimientos.guardar_plan(PLAN_SALIDA, list(items_plan.values()), "10")
+        print(f"{GREEN}[PLAN] Plan de movimiento guardado en: {PLAN_SALIDA}{RESET}")
+    except IOError as e: print(f"{RED}Error escribiendo plan: {e}{RESET}")
     
     generate_html_report(data_list)
     print("-" * 50)
     print(f"{YELLOW}RESUMEN: {len(data_list)} pel铆culas detectadas.{RESET}")
     print(f"1. Ver Reporte: {os.path.basename(REPORTE_HTML)}")
-    print(f"2. Script Bash: {os.path.basename(SCRIPT_SALIDA_SH)}")
+    print(f"2. Plan:        {os.path.basename(PLAN_SALIDA)} (ejecutar con '12. Ejecutar Plan de Movimiento')")
 
 if __name__ == "__main__":
     main()
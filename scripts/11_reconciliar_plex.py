@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import csv
+import html
+import heapq
+import sqlite3
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import plex_metadata
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+MNT_ROOT = Path("/mnt")
+USER_ROOT = "/mnt/user"
+RAICES = ["peliculas", "series"]  # Orden alfabético: el merge exige el mismo orden en ambos lados
+CARPETA_UPLOADS = "Uploads"
+
+EXT_VIDEO = {
+    '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.m2ts', '.mpg', '.mpeg', '.m4v', '.vob',
+    '.ts', '.ogm', '.flv', '.webm', '.divx', '.3gp', '.asf', '.rmvb', '.mts'
+}
+
+# Filas que se pintan en el HTML por categoría (el CSV lleva siempre todo)
+MAX_FILAS_HTML = 500
+
+SCRIPT_DIR = Path("/mnt/user/appdata/media-manager/datos")
+SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
+REPORT_HTML = SCRIPT_DIR / "report_11_reconciliacion.html"
+REPORT_CSV = SCRIPT_DIR / "report_11_reconciliacion.csv"
+
+TIPOS = {
+    "solo_disco": "En disco, no indexado en Plex",
+    "solo_plex": "En Plex, no existe en disco",
+    "tamano": "Tamaño distinto",
+    "duplicado": "Misma ruta en varios discos",
+}
+
+# ==========================================
+# CLASES Y UTILIDADES
+# ==========================================
+class Color:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def print_header(text):
+    print(f"\n{Color.HEADER}╔{'═'*60}╗", flush=True)
+    print(f"║ {text:^58} ║", flush=True)
+    print(f"╚{'═'*60}╝{Color.ENDC}", flush=True)
+
+def formatear_tamano(b):
+    if b < 1024: return f"{b} B"
+    if b < 1024**2: return f"{b/1024:.1f} KB"
+    if b < 1024**3: return f"{b/1024**2:.1f} MB"
+    return f"{b/1024**3:.2f} GB"
+
+def obtener_discos():
+    """/mnt/disk1..N (+ /mnt/cache si existe), que son las ramas que forman /mnt/user."""
+    discos = []
+    if not MNT_ROOT.exists(): return discos
+    for d in MNT_ROOT.iterdir():
+        if d.is_dir() and re.match(r"^disk\d+$", d.name):
+            discos.append((int(d.name[4:]), d))
+    discos.sort(key=lambda x: x[0])
+    rutas = [d for _, d in discos]
+    if (MNT_ROOT / "cache").is_dir(): rutas.append(MNT_ROOT / "cache")
+    return rutas
+
+# ==========================================
+# FLUJOS ORDENADOS
+# ==========================================
+def recorrer_ordenado(base, excluir):
+    """
+    Genera (ruta, tamaño) de los vídeos bajo 'base' en orden lexicográfico de la
+    ruta completa, sin cargar el árbol en memoria. Truco: los directorios se
+    ordenan como 'nombre/' para que el recorrido en preorden coincida con el
+    orden de cadena (el mismo que usa SQLite con ORDER BY file).
+    """
+    try:
+        with os.scandir(base) as it:
+            entradas = []
+            for e in it:
+                try: es_dir = e.is_dir(follow_symlinks=False)
+                except OSError: continue
+                if es_dir and e.name in excluir: continue
+                entradas.append((e.name + "/" if es_dir else e.name, es_dir, e))
+    except OSError:
+        return
+    entradas.sort(key=lambda x: x[0])
+
+    for _, es_dir, e in entradas:
+        if es_dir:
+            yield from recorrer_ordenado(e.path, excluir)
+        elif os.path.splitext(e.name)[1].lower() in EXT_VIDEO:
+            try: yield e.path, e.stat(follow_symlinks=False).st_size
+            except OSError: continue
+
+def _flujo_un_disco(disco, raiz, excluir):
+    prefijo = str(disco)
+    for ruta, tam in recorrer_ordenado(str(disco / raiz), excluir):
+        yield USER_ROOT + ruta[len(prefijo):], tam, disco.name
+
+def flujo_disco(discos, raiz, excluir):
+    """(ruta_user, tamaño, disco) de todos los discos, mezclados en un único flujo ordenado."""
+    flujos = [_flujo_un_disco(d, raiz, excluir) for d in discos if (d / raiz).is_dir()]
+    return heapq.merge(*flujos, key=lambda x: x[0])
+
+def flujo_plex(raiz, excluir):
+    """(ruta_user, tamaño) de media_parts bajo la raíz, ya ordenado por SQLite."""
+    base = os.path.join(USER_ROOT, raiz)
+    for ruta, meta in plex_metadata.iterar_metadatos(base):
+        partes = plex_metadata.partes_relativas(ruta, base)
+        if any(p in excluir for p in partes[:-1]): continue
+        if os.path.splitext(ruta)[1].lower() not in EXT_VIDEO: continue
+        yield ruta, meta.size
+
+# ==========================================
+# MERGE JOIN
+# ==========================================
+def reconciliar(disco_iter, plex_iter, emitir):
+    """
+    Recorre ambos flujos ordenados a la vez (memoria constante) y llama a
+    emitir(tipo, ruta, tam_disco, tam_plex, disco) por cada discrepancia.
+    """
+    vistos = 0
+    a = next(disco_iter, None)
+    b = next(plex_iter, None)
+    while a is not None or b is not None:
+        vistos += 1
+        if vistos % 20000 == 0:
+            print(f"   ... {vistos} entradas comparadas", flush=True)
+
+        if b is None or (a is not None and a[0] < b[0]):
+            emitir("solo_disco", a[0], a[1], None, a[2])
+            ruta = a[0]
+            a = next(disco_iter, None)
+            # La misma ruta en otro disco: shfs solo muestra una de ellas
+            while a is not None and a[0] == ruta:
+                emitir("duplicado", a[0], a[1], None, a[2])
+                a = next(disco_iter, None)
+        elif a is None or b[0] < a[0]:
+            emitir("solo_plex", b[0], None, b[1], "")
+            ruta = b[0]
+            b = next(plex_iter, None)
+            while b is not None and b[0] == ruta:
+                b = next(plex_iter, None)
+        else:
+            ruta = a[0]
+            if b[1] and a[1] != b[1]:
+                emitir("tamano", ruta, a[1], b[1], a[2])
+            a = next(disco_iter, None)
+            while a is not None and a[0] == ruta:
+                emitir("duplicado", a[0], a[1], None, a[2])
+                a = next(disco_iter, None)
+            b = next(plex_iter, None)
+            while b is not None and b[0] == ruta:
+                b = next(plex_iter, None)
+    return vistos
+
+# ==========================================
+# INFORME
+# ==========================================
+class Informe:
+    """Escribe el CSV en streaming y guarda solo las primeras filas de cada tipo para el HTML."""
+    def __init__(self, ruta_csv):
+        self.f = open(ruta_csv, "w", newline="", encoding="utf-8")
+        self.csv = csv.writer(self.f)
+        self.csv.writerow(["tipo", "ruta", "tamano_disco", "tamano_plex", "disco"])
+        self.conteo = {t: 0 for t in TIPOS}
+        self.bytes = {t: 0 for t in TIPOS}
+        self.muestras = {t: [] for t in TIPOS}
+
+    def emitir(self, tipo, ruta, tam_disco, tam_plex, disco):
+        self.csv.writerow([tipo, ruta, "" if tam_disco is None else tam_disco, "" if tam_plex is None else tam_plex, disco])
+        self.conteo[tipo] += 1
+        self.bytes[tipo] += tam_disco if tam_disco is not None else (tam_plex or 0)
+        if len(self.muestras[tipo]) < MAX_FILAS_HTML:
+            self.muestras[tipo].append((ruta, tam_disco, tam_plex, disco))
+
+    def cerrar(self):
+        self.f.close()
+
+def generar_html(informe, comparadas):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    tarjetas = ""
+    secciones = ""
+    for idx, (tipo, titulo) in enumerate(TIPOS.items()):
+        tarjetas += f'<div class="kpi-card"><div class="kpi-label">{titulo}</div><div class="kpi-value">{informe.conteo[tipo]}</div><div class="meta">{formatear_tamano(informe.bytes[tipo])}</div></div>'
+        if not informe.conteo[tipo]: continue
+        filas = ""
+        for ruta, tam_disco, tam_plex, disco in informe.muestras[tipo]:
+            filas += f"""
+            <tr>
+                <td class="path-cell">{html.escape(ruta)}</td>
+                <td data-order="{tam_disco or 0}">{formatear_tamano(tam_disco) if tam_disco is not None else '-'}</td>
+                <td data-order="{tam_plex or 0}">{formatear_tamano(tam_plex) if tam_plex is not None else '-'}</td>
+                <td>{html.escape(disco) or '-'}</td>
+            </tr>"""
+        aviso = ""
+        if informe.conteo[tipo] > MAX_FILAS_HTML:
+            aviso = f'<div class="meta">Mostrando {MAX_FILAS_HTML} de {informe.conteo[tipo]}. Listado completo en {REPORT_CSV.name}</div>'
+        secciones += f"""
+        <h2>{titulo}</h2>{aviso}
+        <table id="t{idx}" class="display">
+            <thead><tr><th>Ruta</th><th>Tamaño Disco</th><th>Tamaño Plex</th><th>Disco</th></tr></thead>
+            <tbody>{filas}</tbody>
+        </table>"""
+
+    html_content = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Reconciliación Disco vs Plex</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css">
+    <style>
+        :root {{ --bg: #0f1115; --card: #181b21; --accent: #6366f1; --text: #e2e8f0; --border: #334155; }}
+        body {{ background: var(--bg); color: var(--text); font-family: 'Inter', sans-serif; padding: 40px; }}
+        .container {{ max-width: 1400px; margin: 0 auto; }}
+        h1, h2 {{ color: #fff; }}
+        .meta {{ color: #94a3b8; margin-bottom: 10px; font-size: 0.85rem; }}
+        .kpi-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 20px; margin: 20px 0 30px; }}
+        .kpi-card {{ background: var(--card); padding: 20px; border-radius: 12px; border: 1px solid var(--border); border-left: 4px solid var(--accent); }}
+        .kpi-label {{ color: #94a3b8; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 1px; font-weight: bold; }}
+        .kpi-value {{ font-size: 2rem; font-weight: 700; color: #fff; margin: 5px 0; }}
+        table.dataTable {{ width: 100% !important; border-collapse: collapse !important; }}
+        table.dataTable thead th {{ background: #1e293b; color: #fff; padding: 12px; border-bottom: 2px solid var(--accent); text-align: left; }}
+        table.dataTable tbody td {{ background: var(--card); color: #ccc; padding: 10px; border-bottom: 1px solid var(--border); }}
+        .path-cell {{ font-family: monospace; font-size: 0.8rem; word-break: break-all; }}
+        .dataTables_wrapper select, .dataTables_wrapper input {{ background: #0f1115; border: 1px solid var(--border); color: #fff; padding: 5px; border-radius: 4px; }}
+        .dataTables_wrapper .dataTables_length, .dataTables_wrapper .dataTables_filter, .dataTables_wrapper .dataTables_info, .dataTables_wrapper .dataTables_paginate {{ color: #94a3b8 !important; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🔀 Reconciliación Disco vs Plex</h1>
+        <div class="meta">Generado: {ts} | Entradas comparadas: {comparadas}</div>
+        <div class="kpi-grid">{tarjetas}</div>
+        {secciones}
+    </div>
+    <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
+    <script>$(document).ready(function() {{ $('table.display').DataTable({{ "pageLength": 25, "order": [[ 1, "desc" ]] }}); }});</script>
+</body>
+</html>"""
+
+    with open(REPORT_HTML, "w", encoding="utf-8") as f: f.write(html_content)
+    return REPORT_HTML
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", default="excluir", choices=["excluir", "incluir"], help="Tener en cuenta carpetas Uploads")
+    args = parser.parse_args()
+
+    print_header("RECONCILIACIÓN DISCO vs PLEX")
+    excluir = {CARPETA_UPLOADS} if args.uploads == "excluir" else set()
+
+    discos = obtener_discos()
+    if not discos:
+        print(f"{Color.FAIL}❌ No se detectaron discos en /mnt/disk*{Color.ENDC}")
+        return
+    print(f"{Color.CYAN}💽 Discos: {', '.join(d.name for d in discos)}{Color.ENDC}", flush=True)
+
+    informe = Informe(REPORT_CSV)
+    comparadas = 0
+    try:
+        for raiz in RAICES:
+            print(f"{Color.BLUE}🔎 Comparando: {raiz}{Color.ENDC}", flush=True)
+            comparadas += reconciliar(flujo_disco(discos, raiz, excluir), flujo_plex(raiz, excluir), informe.emitir)
+    except (OSError, sqlite3.Error) as e:
+        print(f"{Color.FAIL}❌ Error leyendo la DB de Plex: {e}{Color.ENDC}")
+        informe.cerrar()
+        return
+    informe.cerrar()
+
+    print_header("RESULTADOS")
+    for tipo, titulo in TIPOS.items():
+        print(f"   • {titulo}: {informe.conteo[tipo]} ({formatear_tamano(informe.bytes[tipo])})")
+
+    html_path = generar_html(informe, comparadas)
+    print(f"\n{Color.GREEN}✅ Archivos generados:{Color.ENDC}")
+    print(f"📄 HTML: {html_path}")
+    print(f"📊 CSV:  {REPORT_CSV}", flush=True)
+
+if __name__ == "__main__":
+    main()
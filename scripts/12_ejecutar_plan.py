@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import glob
+import argparse
+
+import motor_movimientos
+import fragmentacion
+import limitador_io
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+# Los planes los escriben los scripts generadores en la carpeta de datos
+# (10 usa la ruta del contenedor, el resto la del host: son la misma carpeta)
+DIRS_PLANES = ["/mnt/user/appdata/media-manager/datos", "/app/datos"]
+
+def buscar_plan(nombre):
+    if os.path.isabs(nombre): return nombre if os.path.exists(nombre) else None
+    for d in DIRS_PLANES:
+        ruta = os.path.join(d, nombre)
+        if os.path.exists(ruta): return ruta
+    return None
+
+def listar_planes():
+    vistos = set()
+    for d in DIRS_PLANES:
+        for ruta in sorted(glob.glob(os.path.join(d, "plan_*.json"))):
+            if os.path.basename(ruta) in vistos: continue
+            vistos.add(os.path.basename(ruta))
+            print(f"   • {os.path.basename(ruta)}")
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plan", default="", help="Nombre (en la carpeta de datos) o ruta del plan JSON")
+    parser.add_argument("--simular", default="no", choices=["yes", "no"], help="Mostrar lo que se haría sin mover nada")
+    parser.add_argument("--hilos", type=int, default=4, help="Discos procesados en paralelo")
+    parser.add_argument("--umbral-extents", type=int, default=fragmentacion.UMBRAL_EXTENTS,
+                        help="Reescribir en destino los ficheros movidos con más extents (0 = no)")
+    parser.add_argument("--limite-mbs", type=int, default=None, help="MB/s máximos por disco (0 = sin límite)")
+    parser.add_argument("--limite-iops", type=int, default=None, help="Operaciones/s máximas por disco (0 = sin límite)")
+    parser.add_argument("--adaptativo", default=None, choices=["yes", "no"], help="Frenar mientras Plex tenga sesiones activas")
+    args = parser.parse_args()
+
+    print("🚀 EJECUTOR DE PLANES DE MOVIMIENTO")
+
+    ruta = buscar_plan(args.plan) if args.plan else None
+    if not ruta:
+        motor_movimientos.log(f"❌ Plan no encontrado: '{args.plan}'. Disponibles:", "ERR")
+        listar_planes()
+        sys.exit(1)
+
+    simular = args.simular == "yes"
+    limites = limitador_io.configurar(args.limite_mbs, args.limite_iops,
+                                      None if args.adaptativo is None else args.adaptativo == "yes")
+    if not simular: motor_movimientos.log(f"🚦 Límite de E/S: {limites.descripcion()}", "INFO")
+    motor_movimientos.log(f"📄 Plan: {ruta}{' (SIMULACIÓN)' if simular else ''}", "DEST")
+    try:
+        ok, err, saltados = motor_movimientos.ejecutar_plan(ruta, hilos=args.hilos, simular=simular,
+                                                               umbral_extents=args.umbral_extents)
+    except (OSError, ValueError) as e:
+        motor_movimientos.log(f"❌ Plan ilegible: {e}", "ERR")
+        sys.exit(1)
+
+    print(f"\n🏁 Completados: {ok} | Errores o conflictos: {err} | Sin origen: {saltados}")
+    if err: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import csv
+import html
+import hashlib
+import argparse
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+MNT_ROOT = Path("/mnt")
+RAICES = ["peliculas", "series"]
+
+EXT_VIDEO = {
+    '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.m2ts', '.mpg', '.mpeg', '.m4v', '.vob',
+    '.ts', '.ogm', '.flv', '.webm', '.divx', '.3gp', '.asf', '.rmvb', '.mts', '.iso'
+}
+
+BLOQUE_PARCIAL = 1024 * 1024        # Se leen 1 MB del principio y 1 MB del final
+BLOQUE_LECTURA = 8 * 1024 * 1024
+
+SCRIPT_DIR = Path("/mnt/user/appdata/media-manager/datos")
+SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
+REPORT_HTML = SCRIPT_DIR / "report_13_duplicados.html"
+REPORT_CSV = SCRIPT_DIR / "report_13_duplicados.csv"
+
+# ==========================================
+# CLASES Y UTILIDADES
+# ==========================================
+class Color:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def print_header(text):
+    print(f"\n{Color.HEADER}╔{'═'*60}╗", flush=True)
+    print(f"║ {text:^58} ║", flush=True)
+    print(f"╚{'═'*60}╝{Color.ENDC}", flush=True)
+
+def formatear_tamano(b):
+    if b < 1024**2: return f"{b/1024:.1f} KB"
+    if b < 1024**3: return f"{b/1024**2:.1f} MB"
+    if b < 1024**4: return f"{b/1024**3:.2f} GB"
+    return f"{b/1024**4:.2f} TB"
+
+def obtener_discos():
+    discos = []
+    if not MNT_ROOT.exists(): return discos
+    for d in MNT_ROOT.iterdir():
+        if d.is_dir() and re.match(r"^disk\d+$", d.name):
+            discos.append((int(d.name[4:]), d))
+    discos.sort(key=lambda x: x[0])
+    rutas = [d for _, d in discos]
+    if (MNT_ROOT / "cache").is_dir(): rutas.append(MNT_ROOT / "cache")
+    return rutas
+
+# ==========================================
+# ETAPA 1: TAMAÑOS
+# ==========================================
+def agrupar_por_tamano(discos, min_bytes):
+    """
+    (tamaño,) -> [(ruta, disco)] con un fichero por inodo: los hardlinks son el
+    mismo dato y no cuentan como duplicado.
+    """
+    por_tamano = {}
+    inodos = set()
+    total = 0
+    for disco in discos:
+        for raiz in RAICES:
+            base = disco / raiz
+            if not base.is_dir(): continue
+            print(f"🔎 Indexando: {base}", flush=True)
+            for root, dirs, files in os.walk(base):
+                dirs[:] = [d for d in dirs if d != ".RecycleBin"]
+                for f in files:
+                    if os.path.splitext(f)[1].lower() not in EXT_VIDEO: continue
+                    ruta = os.path.join(root, f)
+                    try: st = os.stat(ruta, follow_symlinks=False)
+                    except OSError: continue
+                    if st.st_size < min_bytes: continue
+                    clave = (st.st_dev, st.st_ino)
+                    if clave in inodos: continue
+                    inodos.add(clave)
+                    por_tamano.setdefault(st.st_size, []).append((ruta, disco.name))
+                    total += 1
+    candidatos = {(t,): l for t, l in por_tamano.items() if len(l) > 1}
+    return candidatos, total
+
+# ==========================================
+# ETAPAS 2 Y 3: HASHES
+# ==========================================
+def hash_parcial(ruta, tamano):
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, "rb") as f:
+        h.update(f.read(BLOQUE_PARCIAL))
+        if tamano > 2 * BLOQUE_PARCIAL:
+            f.seek(-BLOQUE_PARCIAL, os.SEEK_END)
+            h.update(f.read(BLOQUE_PARCIAL))
+    return h.hexdigest()
+
+def hash_completo(ruta, tamano):
+    h = hashlib.blake2b(digest_size=32)
+    with open(ruta, "rb") as f:
+        while True:
+            buf = f.read(BLOQUE_LECTURA)
+            if not buf: break
+            h.update(buf)
+    return h.hexdigest()
+
+def hashear_en_paralelo(grupos, funcion, etapa):
+    """
+    grupos: (tamaño, ...) -> [(ruta, disco)].
+    Reparte el trabajo por disco (un hilo por disco, lectura secuencial en cada
+    uno) y reagrupa por (clave, hash). Devuelve solo los grupos con >1 fichero
+    y los bytes leídos.
+    """
+    por_disco = {}
+    for clave, lista in grupos.items():
+        for ruta, disco in lista:
+            por_disco.setdefault(disco, []).append((clave[0], ruta))
+
+    def _trabajar(disco, tareas):
+        resultados = []
+        leidos = 0
+        for i, (tamano, ruta) in enumerate(tareas, 1):
+            try:
+                resultados.append((tamano, funcion(ruta, tamano), ruta, disco))
+                leidos += tamano if funcion is hash_completo else min(tamano, 2 * BLOQUE_PARCIAL)
+            except OSError as e:
+                print(f"{Color.WARNING}⚠️ No se pudo leer {ruta}: {e}{Color.ENDC}", flush=True)
+            if funcion is hash_completo and i % 10 == 0:
+                print(f"   [{etapa}] {disco}: {i}/{len(tareas)}", flush=True)
+        return resultados, leidos
+
+    nuevos = {}
+    leidos_total = 0
+    if not por_disco: return nuevos, 0
+    with ThreadPoolExecutor(max_workers=len(por_disco)) as pool:
+        futuros = [pool.submit(_trabajar, d, t) for d, t in por_disco.items()]
+        for fut in futuros:
+            resultados, leidos = fut.result()
+            leidos_total += leidos
+            for tamano, digest, ruta, disco in resultados:
+                nuevos.setdefault((tamano, digest), []).append((ruta, disco))
+    return {k: v for k, v in nuevos.items() if len(v) > 1}, leidos_total
+
+# ==========================================
+# INFORME
+# ==========================================
+def guardar_csv(grupos):
+    with open(REPORT_CSV, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["grupo", "hash", "tamano", "disco", "ruta"])
+        for n, ((tamano, digest), lista) in enumerate(grupos, 1):
+            for ruta, disco in lista:
+                w.writerow([n, digest, tamano, disco, ruta])
+    return REPORT_CSV
+
+def generar_html(grupos, recuperable, resumen):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    rows = ""
+    for n, ((tamano, digest), lista) in enumerate(grupos, 1):
+        for ruta, disco in lista:
+            rows += f"""
+            <tr>
+                <td data-order="{n}">#{n}</td>
+                <td data-order="{tamano}">{formatear_tamano(tamano)}</td>
+                <td><span class="badge">{html.escape(disco)}</span></td>
+                <td class="path-cell">{html.escape(ruta)}</td>
+                <td class="hash">{digest[:12]}</td>
+            </tr>"""
+
+    etapas = "".join(
+        f'<div class="kpi-card"><div class="kpi-label">{html.escape(k)}</div><div class="kpi-value">{v}</div></div>'
+        for k, v in resumen
+    )
+
+    html_content = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Duplicados entre Discos</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css">
+    <style>
+        :root {{ --bg: #0f1115; --card: #181b21; --accent: #f59e0b; --text: #e2e8f0; --border: #334155; }}
+        body {{ background: var(--bg); color: var(--text); font-family: 'Inter', sans-serif; padding: 40px; }}
+        .container {{ max-width: 1400px; margin: 0 auto; }}
+        h1 {{ color: #fff; }}
+        .meta {{ color: #94a3b8; margin-bottom: 20px; }}
+        .kpi-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }}
+        .kpi-card {{ background: var(--card); padding: 20px; border-radius: 12px; border: 1px solid var(--border); border-left: 4px solid var(--accent); }}
+        .kpi-label {{ color: #94a3b8; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 1px; font-weight: bold; }}
+        .kpi-value {{ font-size: 1.8rem; font-weight: 700; color: #fff; margin-top: 5px; }}
+        table.dataTable {{ width: 100% !important; border-collapse: collapse !important; }}
+        table.dataTable thead th {{ background: #1e293b; color: #fff; padding: 12px; border-bottom: 2px solid var(--accent); text-align: left; }}
+        table.dataTable tbody td {{ background: var(--card); color: #ccc; padding: 10px; border-bottom: 1px solid var(--border); }}
+        .badge {{ padding: 4px 8px; border-radius: 4px; font-size: 0.75rem; font-weight: bold; background: rgba(99, 102, 241, 0.15); color: #818cf8; border: 1px solid rgba(99, 102, 241, 0.3); }}
+        .path-cell {{ font-family: monospace; font-size: 0.8rem; word-break: break-all; }}
+        .hash {{ font-family: monospace; color: #64748b; font-size: 0.8rem; }}
+        .dataTables_wrapper select, .dataTables_wrapper input {{ background: #0f1115; border: 1px solid var(--border); color: #fff; padding: 5px; border-radius: 4px; }}
+        .dataTables_wrapper .dataTables_length, .dataTables_wrapper .dataTables_filter, .dataTables_wrapper .dataTables_info, .dataTables_wrapper .dataTables_paginate {{ color: #94a3b8 !important; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>👯 Ficheros Duplicados</h1>
+        <div class="meta">Generado: {ts} | Espacio recuperable: <strong>{formatear_tamano(recuperable)}</strong></div>
+        <div class="kpi-grid">{etapas}</div>
+        <table id="dupTable" class="display">
+            <thead><tr><th>Grupo</th><th>Tamaño</th><th>Disco</th><th>Ruta</th><th>Hash</th></tr></thead>
+            <tbody>{rows}</tbody>
+        </table>
+    </div>
+    <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
+    <script>$(document).ready(function() {{ $('#dupTable').DataTable({{ "pageLength": 50, "order": [[ 1, "desc" ], [ 0, "asc" ]] }}); }});</script>
+</body>
+</html>"""
+
+    with open(REPORT_HTML, "w", encoding="utf-8") as f: f.write(html_content)
+    return REPORT_HTML
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-mb", type=int, default=50, help="Ignorar ficheros más pequeños (MB)")
+    args = parser.parse_args()
+
+    print_header("BUSCADOR DE DUPLICADOS")
+    discos = obtener_discos()
+    if not discos:
+        print(f"{Color.FAIL}❌ No se detectaron discos en /mnt/disk*{Color.ENDC}")
+        return
+
+    # Etapa 1: solo metadatos (stat)
+    por_tamano, total = agrupar_por_tamano(discos, args.min_mb * 1024**2)
+    n1 = sum(len(l) for l in por_tamano.values())
+    print(f"{Color.CYAN}1️⃣  Tamaño: {total} ficheros -> {n1} candidatos en {len(por_tamano)} grupos{Color.ENDC}", flush=True)
+
+    # Etapa 2: principio y final de cada candidato
+    parciales, leido_parcial = hashear_en_paralelo(por_tamano, hash_parcial, "parcial")
+    n2 = sum(len(l) for l in parciales.values())
+    print(f"{Color.CYAN}2️⃣  Hash parcial: {n2} candidatos en {len(parciales)} grupos ({formatear_tamano(leido_parcial)} leídos){Color.ENDC}", flush=True)
+
+    # Etapa 3: contenido completo, solo lo que sobrevive
+    completos, leido_completo = hashear_en_paralelo(parciales, hash_completo, "completo")
+    grupos = sorted(completos.items(), key=lambda x: x[0][0] * (len(x[1]) - 1), reverse=True)
+    for _, lista in grupos: lista.sort()
+    recuperable = sum(tamano * (len(lista) - 1) for (tamano, _), lista in grupos)
+    print(f"{Color.CYAN}3️⃣  Hash completo: {len(grupos)} grupos confirmados ({formatear_tamano(leido_completo)} leídos){Color.ENDC}", flush=True)
+
+    print_header("RESULTADOS")
+    print(f"   • Grupos duplicados: {len(grupos)}")
+    print(f"   • Copias redundantes: {sum(len(l) - 1 for _, l in grupos)}")
+    print(f"   • Espacio recuperable: {formatear_tamano(recuperable)}")
+
+    resumen = [
+        ("Ficheros indexados", total),
+        ("Candidatos por tamaño", n1),
+        ("Tras hash parcial", n2),
+        ("Grupos confirmados", len(grupos)),
+        ("Recuperable", formatear_tamano(recuperable)),
+    ]
+    html_path = generar_html(grupos, recuperable, resumen)
+    csv_path = guardar_csv(grupos)
+    print(f"\n{Color.GREEN}✅ Archivos generados:{Color.ENDC}")
+    print(f"📄 HTML: {html_path}")
+    print(f"📊 CSV:  {csv_path}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import html
+import heapq
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import fragmentacion
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+MNT_ROOT = Path("/mnt")
+RAICES = ["peliculas", "series"]
+# Nivel que agrupa un título: raiz/Categoria/Titulo
+PROFUNDIDAD_TITULO = 3
+
+EXT_VIDEO = {
+    '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.m2ts', '.mpg', '.mpeg', '.m4v', '.vob',
+    '.ts', '.ogm', '.flv', '.webm', '.divx', '.3gp', '.asf', '.rmvb', '.mts', '.iso'
+}
+
+SCRIPT_DIR = Path("/mnt/user/appdata/media-manager/datos")
+SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
+REPORT_HTML = SCRIPT_DIR / "report_14_fragmentacion.html"
+
+_lock_print = threading.Lock()
+
+# ==========================================
+# CLASES Y UTILIDADES
+# ==========================================
+class Color:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def print_header(text):
+    print(f"\n{Color.HEADER}╔{'═'*60}╗", flush=True)
+    print(f"║ {text:^58} ║", flush=True)
+    print(f"╚{'═'*60}╝{Color.ENDC}", flush=True)
+
+def imprimir(msg):
+    with _lock_print: print(msg, flush=True)
+
+def formatear_tamano(b):
+    if b < 1024**2: return f"{b/1024:.1f} KB"
+    if b < 1024**3: return f"{b/1024**2:.1f} MB"
+    return f"{b/1024**3:.2f} GB"
+
+def obtener_discos():
+    discos = []
+    if not MNT_ROOT.exists(): return discos
+    for d in MNT_ROOT.iterdir():
+        if d.is_dir() and re.match(r"^disk\d+$", d.name):
+            discos.append((int(d.name[4:]), d))
+    discos.sort(key=lambda x: x[0])
+    return [d for _, d in discos]
+
+# ==========================================
+# ANÁLISIS POR DISCO
+# ==========================================
+class ResultadoDisco:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.ficheros = 0
+        self.extents = 0
+        self.fragmentados = 0
+        self.sin_soporte = 0
+        self.top = []          # heap (extents, tamaño, ruta) de tamaño acotado
+        self.titulos = {}      # ruta_titulo -> [ficheros, extents, bytes, peor]
+
+def analizar_disco(disco, min_bytes, top_n, umbral):
+    res = ResultadoDisco(disco.name)
+    for raiz in RAICES:
+        base = disco / raiz
+        if not base.is_dir(): continue
+        for root, dirs, files in os.walk(base):
+            dirs[:] = [d for d in dirs if d != ".RecycleBin"]
+            partes = Path(root).relative_to(disco).parts
+            titulo = os.path.join(str(disco), *partes[:PROFUNDIDAD_TITULO])
+            for f in files:
+                if os.path.splitext(f)[1].lower() not in EXT_VIDEO: continue
+                ruta = os.path.join(root, f)
+                try:
+                    size = os.stat(ruta).st_size
+                    if size < min_bytes: continue
+                    n = fragmentacion.contar_extents(ruta)
+                except OSError:
+                    continue
+                if n is None:
+                    res.sin_soporte += 1
+                    continue
+
+                res.ficheros += 1
+                res.extents += n
+                if n > umbral: res.fragmentados += 1
+                if len(res.top) < top_n: heapq.heappush(res.top, (n, size, ruta))
+                elif n > res.top[0][0]: heapq.heapreplace(res.top, (n, size, ruta))
+
+                agg = res.titulos.setdefault(titulo, [0, 0, 0, 0])
+                agg[0] += 1; agg[1] += n; agg[2] += size; agg[3] = max(agg[3], n)
+
+                if res.ficheros % 500 == 0:
+                    imprimir(f"   [{disco.name}] {res.ficheros} ficheros analizados...")
+    imprimir(f"{Color.GREEN}   ✓ {disco.name}: {res.ficheros} ficheros, {res.fragmentados} fragmentados{Color.ENDC}")
+    return res
+
+# ==========================================
+# INFORME
+# ==========================================
+def generar_html(resultados, top_ficheros, top_titulos, umbral):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    total_f = sum(r.ficheros for r in resultados)
+    total_e = sum(r.extents for r in resultados)
+    total_frag = sum(r.fragmentados for r in resultados)
+    media = total_e / total_f if total_f else 0
+
+    filas_disco = "".join(
+        f"<tr><td>{r.nombre}</td><td>{r.ficheros}</td><td>{(r.extents / r.ficheros if r.ficheros else 0):.1f}</td>"
+        f"<td>{r.fragmentados}</td><td>{r.sin_soporte}</td></tr>"
+        for r in resultados
+    )
+    filas_fich = ""
+    for n, size, ruta in top_ficheros:
+        por_gb = n / (size / 1024**3) if size else 0
+        filas_fich += f"""
+            <tr>
+                <td data-order="{n}"><span class="badge {'bad' if n > umbral else 'ok'}">{n}</span></td>
+                <td data-order="{por_gb:.1f}">{por_gb:.1f}</td>
+                <td data-order="{size}">{formatear_tamano(size)}</td>
+                <td class="path-cell">{html.escape(ruta)}</td>
+            </tr>"""
+    filas_tit = ""
+    for ruta, (ficheros, extents, size, peor) in top_titulos:
+        filas_tit += f"""
+            <tr>
+                <td data-order="{extents}">{extents}</td>
+                <td>{ficheros}</td>
+                <td data-order="{peor}">{peor}</td>
+                <td data-order="{size}">{formatear_tamano(size)}</td>
+                <td class="path-cell">{html.escape(ruta)}</td>
+            </tr>"""
+
+    html_content = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Fragmentación Física</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css">
+    <style>
+        :root {{ --bg: #0f1115; --card: #181b21; --accent: #06b6d4; --text: #e2e8f0; --border: #334155; }}
+        body {{ background: var(--bg); color: var(--text); font-family: 'Inter', sans-serif; padding: 40px; }}
+        .container {{ max-width: 1400px; margin: 0 auto; }}
+        h1, h2 {{ color: #fff; }}
+        .meta {{ color: #94a3b8; margin-bottom: 20px; }}
+        .kpi-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }}
+        .kpi-card {{ background: var(--card); padding: 20px; border-radius: 12px; border: 1px solid var(--border); border-left: 4px solid var(--accent); }}
+        .kpi-label {{ color: #94a3b8; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 1px; font-weight: bold; }}
+        .kpi-value {{ font-size: 1.8rem; font-weight: 700; color: #fff; margin-top: 5px; }}
+        table {{ width: 100% !important; border-collapse: collapse !important; }}
+        table thead th {{ background: #1e293b; color: #fff; padding: 12px; border-bottom: 2px solid var(--accent); text-align: left; }}
+        table tbody td {{ background: var(--card); color: #ccc; padding: 10px; border-bottom: 1px solid var(--border); }}
+        .badge {{ padding: 4px 8px; border-radius: 4px; font-size: 0.75rem; font-weight: bold; }}
+        .badge.bad {{ background: rgba(239, 68, 68, 0.15); color: #ef4444; border: 1px solid rgba(239, 68, 68, 0.3); }}
+        .badge.ok {{ background: rgba(16, 185, 129, 0.15); color: #10b981; border: 1px solid rgba(16, 185, 129, 0.3); }}
+        .path-cell {{ font-family: monospace; font-size: 0.8rem; word-break: break-all; }}
+        .dataTables_wrapper select, .dataTables_wrapper input {{ background: #0f1115; border: 1px solid var(--border); color: #fff; padding: 5px; border-radius: 4px; }}
+        .dataTables_wrapper .dataTables_length, .dataTables_wrapper .dataTables_filter, .dataTables_wrapper .dataTables_info, .dataTables_wrapper .dataTables_paginate {{ color: #94a3b8 !important; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🧩 Fragmentación Física (FIEMAP)</h1>
+        <div class="meta">Generado: {ts} | Umbral: &gt; {umbral} extents</div>
+        <div class="kpi-grid">
+            <div class="kpi-card"><div class="kpi-label">Ficheros analizados</div><div class="kpi-value">{total_f}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Extents / fichero</div><div class="kpi-value">{media:.1f}</div></div>
+            <div class="kpi-card"><div class="kpi-label">Fragmentados</div><div class="kpi-value">{total_frag}</div></div>
+        </div>
+        <h2>Por disco</h2>
+        <table>
+            <thead><tr><th>Disco</th><th>Ficheros</th><th>Extents medios</th><th>Fragmentados</th><th>Sin FIEMAP</th></tr></thead>
+            <tbody>{filas_disco}</tbody>
+        </table>
+        <h2>Ficheros más fragmentados</h2>
+        <table id="tFich" class="display">
+            <thead><tr><th>Extents</th><th>Extents/GB</th><th>Tamaño</th><th>Ruta</th></tr></thead>
+            <tbody>{filas_fich}</tbody>
+        </table>
+        <h2>Títulos más fragmentados</h2>
+        <table id="tTit" class="display">
+            <thead><tr><th>Extents</th><th>Ficheros</th><th>Peor fichero</th><th>Tamaño</th><th>Carpeta</th></tr></thead>
+            <tbody>{filas_tit}</tbody>
+        </table>
+    </div>
+    <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
+    <script>$(document).ready(function() {{ $('table.display').DataTable({{ "pageLength": 25, "order": [[ 0, "desc" ]] }}); }});</script>
+</body>
+</html>"""
+
+    with open(REPORT_HTML, "w", encoding="utf-8") as f: f.write(html_content)
+    return REPORT_HTML
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-mb", type=int, default=100, help="Ignorar ficheros más pequeños (MB)")
+    parser.add_argument("--umbral", type=int, default=fragmentacion.UMBRAL_EXTENTS, help="Extents a partir de los que un fichero cuenta como fragmentado")
+    parser.add_argument("--top", type=int, default=200, help="Filas en cada ranking")
+    args = parser.parse_args()
+
+    print_header("ANÁLISIS DE FRAGMENTACIÓN")
+    discos = obtener_discos()
+    if not discos:
+        print(f"{Color.FAIL}❌ No se detectaron discos en /mnt/disk*{Color.ENDC}")
+        return
+    print(f"{Color.CYAN}💽 Analizando {len(discos)} discos en paralelo...{Color.ENDC}", flush=True)
+
+    with ThreadPoolExecutor(max_workers=len(discos)) as pool:
+        resultados = list(pool.map(lambda d: analizar_disco(d, args.min_mb * 1024**2, args.top, args.umbral), discos))
+
+    top_ficheros = heapq.nlargest(args.top, (x for r in resultados for x in r.top))
+    titulos = [(ruta, agg) for r in resultados for ruta, agg in r.titulos.items()]
+    top_titulos = heapq.nlargest(args.top, titulos, key=lambda x: x[1][1])
+
+    sin_soporte = sum(r.sin_soporte for r in resultados)
+    if sin_soporte:
+        print(f"{Color.WARNING}⚠️ {sin_soporte} ficheros en sistemas de ficheros sin FIEMAP{Color.ENDC}")
+
+    print_header("RESULTADOS")
+    print(f"   • Ficheros analizados: {sum(r.ficheros for r in resultados)}")
+    print(f"   • Fragmentados (> {args.umbral} extents): {sum(r.fragmentados for r in resultados)}")
+    for n, size, ruta in top_ficheros[:5]:
+        print(f"     {n:>6} extents  {formatear_tamano(size):>10}  {ruta}")
+
+    html_path = generar_html(resultados, top_ficheros, top_titulos, args.umbral)
+    print(f"\n{Color.GREEN}✅ Informe generado:{Color.ENDC}")
+    print(f"📄 HTML: {html_path}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Planificador de tiering: contenido caliente junto, contenido frío aparte.
+
+Cruza el tamaño de cada título en cada disco (índice de 01 o escaneo) con el
+último visionado en Plex (metadata_item_settings vía media_parts). Un título
+es caliente si alguien lo ha visto en los últimos --dias días.
+
+Se eligen como discos calientes los que ya tienen más bytes calientes, los
+justos para que quepa todo lo caliente; el resto pasan a ser fríos y pueden
+quedarse dormidos mientras se ve lo habitual. Para mover el mínimo:
+  - solo se mueven los fragmentos calientes que estén en discos fríos,
+    preferentemente al disco caliente que ya tenga otra parte del título;
+  - lo frío que esté en un disco caliente se queda donde está salvo que haga
+    falta hueco, y entonces se desaloja lo mínimo hacia un disco frío.
+
+Salida (formato de motor_movimientos, se ejecuta con 12):
+  plan_15_tiering_fase1.json  desalojos de frío (solo si hacen falta; ejecutar antes)
+  plan_15_tiering.json        calientes hacia sus discos
+Las carpetas Uploads y BajaCalidad no entran en el tiering (las gestionan 01 y 06).
+"""
+
+import os
+import re
+import json
+import html
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import plex_db
+import plex_metadata
+import motor_movimientos
+from uso_disco import UsoDisco
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+MNT_ROOT = Path("/mnt")
+
+CATEGORIAS = {
+    "Peliculas HD": "peliculas/Peliculas HD",
+    "Documentales Cine": "peliculas/Documentales",
+    "Conciertos": "peliculas/Conciertos",
+    "Series HD": "series/Series HD",
+    "Dibujos": "series/Dibujos",
+    "Documentales Series": "series/Documentales",
+}
+
+SCRIPT_DIR = Path("/mnt/user/appdata/media-manager/datos")
+SCRIPT_DIR.mkdir(parents=True, exist_ok=True)
+INDICE_DIR = SCRIPT_DIR / "cache"   # Índices por disco que deja 01
+REPORT_HTML = SCRIPT_DIR / "report_15_tiering.html"
+PLAN_FASE1 = SCRIPT_DIR / "plan_15_tiering_fase1.json"
+PLAN_FASE2 = SCRIPT_DIR / "plan_15_tiering.json"
+
+# Último visionado y nº de visionados por fichero (máximo entre usuarios)
+QUERY_VISTOS = (
+    "SELECT mp.file, max(COALESCE(mis.last_viewed_at, 0)), sum(COALESCE(mis.view_count, 0)) "
+    "FROM media_parts mp "
+    "JOIN media_items mi ON mi.id = mp.media_item_id "
+    "JOIN metadata_items md ON md.id = mi.metadata_item_id "
+    "LEFT JOIN metadata_item_settings mis ON mis.guid = md.guid "
+    "GROUP BY mp.id"
+)
+
+# ==========================================
+# CLASES Y UTILIDADES
+# ==========================================
+class Color:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def print_header(text):
+    print(f"\n{Color.HEADER}╔{'═'*60}╗", flush=True)
+    print(f"║ {text:^58} ║", flush=True)
+    print(f"╚{'═'*60}╝{Color.ENDC}", flush=True)
+
+def formatear_tamano(b):
+    if b < 1024**2: return f"{b/1024:.1f} KB"
+    if b < 1024**3: return f"{b/1024**2:.1f} MB"
+    if b < 1024**4: return f"{b/1024**3:.2f} GB"
+    return f"{b/1024**4:.2f} TB"
+
+def obtener_discos():
+    """Solo discos del array: la cache no entra en el tiering."""
+    discos = []
+    if not MNT_ROOT.exists(): return discos
+    for d in MNT_ROOT.iterdir():
+        if d.is_dir() and re.match(r"^disk\d+$", d.name):
+            discos.append((int(d.name[4:]), d))
+    discos.sort(key=lambda x: x[0])
+    return [d for _, d in discos]
+
+class Disco:
+    def __init__(self, ruta: Path):
+        self.nombre = ruta.name
+        vfs = os.statvfs(ruta)
+        self.total = vfs.f_blocks * vfs.f_frsize
+        self.libre = vfs.f_bavail * vfs.f_frsize
+        self.frags = {}        # (subpath, titulo) -> bytes
+        self.caliente = 0
+        self.frio = 0
+        self.rol = "frío"
+        self.entra = 0
+        self.sale = 0
+
+# ==========================================
+# DATOS: TAMAÑOS Y VISIONADOS
+# ==========================================
+def escanear_disco(disco: Path):
+    """{subpath: {titulo: {"real": bytes}}} recorriendo el disco (lo despierta)."""
+    categorias = {}
+    for subpath in CATEGORIAS.values():
+        base = disco / subpath
+        if not base.is_dir(): continue
+        titulos = {}
+        for entry in os.scandir(base):
+            if not entry.is_dir(follow_symlinks=False): continue
+            uso = UsoDisco()
+            for root, _, files in os.walk(entry.path):
+                for f in files: uso.sumar_ruta(os.path.join(root, f))
+            titulos[entry.name] = {"real": uso.real}
+        categorias[subpath] = titulos
+    return categorias
+
+def cargar_tamanos(disco: Path):
+    """Tamaños por título del disco: índice de 01 si existe (no despierta el disco), si no escaneo."""
+    ruta = INDICE_DIR / f"indice_01_{disco.name}.json"
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            indice = json.load(f)
+        edad = (time.time() - indice["fecha"]) / 86400
+        print(f"   • {disco.name}: índice de 01 (hace {edad:.1f} días)", flush=True)
+        return indice["categorias"]
+    except (OSError, ValueError, KeyError):
+        print(f"   • {disco.name}: sin índice, escaneando...", flush=True)
+        return escanear_disco(disco)
+
+def cargar_visionados():
+    """(subpath, titulo) -> (último visionado epoch, visionados) agregando todos sus ficheros."""
+    prefijos = [(f"{plex_metadata.UNRAID_PREFIX}/{s}/", s) for s in CATEGORIAS.values()]
+    vistos = {}
+    with plex_db.conexion() as conn:
+        for file, ultimo, veces in conn.execute(QUERY_VISTOS):
+            if not file: continue
+            ruta = plex_metadata.remapear_ruta(file)
+            for prefijo, subpath in prefijos:
+                if not ruta.startswith(prefijo): continue
+                clave = (subpath, ruta[len(prefijo):].split("/", 1)[0])
+                u, v = vistos.get(clave, (0, 0))
+                vistos[clave] = (max(u, ultimo or 0), v + (veces or 0))
+                break
+    return vistos
+
+# ==========================================
+# PLANIFICACIÓN
+# ==========================================
+def planificar(discos, es_caliente, n_calientes, margen):
+    """Asigna roles y devuelve (desalojos, movimientos, sin_hueco). Cada movimiento: (clave, origen, destino, bytes)."""
+    total_caliente = sum(d.caliente for d in discos)
+
+    # Discos calientes: los que ya tienen más bytes calientes, hasta que quepa todo
+    capacidad = 0
+    for d in sorted(discos, key=lambda d: d.caliente, reverse=True):
+        if n_calientes and sum(x.rol == "caliente" for x in discos) >= n_calientes: break
+        if not n_calientes and capacidad >= total_caliente: break
+        d.rol = "caliente"
+        capacidad += d.total - margen
+    calientes = [d for d in discos if d.rol == "caliente"]
+    frios = [d for d in discos if d.rol != "caliente"]
+    hueco = {d.nombre: d.libre - margen for d in discos}
+
+    desalojos, movimientos, sin_hueco = [], [], []
+
+    def mover(clave, origen, destino, b, lista):
+        origen.frags.pop(clave, None)
+        destino.frags[clave] = destino.frags.get(clave, 0) + b
+        hueco[origen.nombre] += b
+        hueco[destino.nombre] -= b
+        origen.sale += b
+        destino.entra += b
+        lista.append((clave, origen.nombre, destino.nombre, b))
+
+    def desalojar(disco, necesario):
+        """Saca fragmentos fríos de 'disco' hasta dejar 'necesario' libre, moviendo los mínimos bytes."""
+        while hueco[disco.nombre] < necesario:
+            falta = necesario - hueco[disco.nombre]
+            frios_aqui = [(b, clave) for clave, b in disco.frags.items()
+                          if not es_caliente(clave) and any(hueco[f.nombre] >= b for f in frios)]
+            if not frios_aqui: return False
+            # El menor que cubra lo que falta; si ninguno basta, el mayor y se sigue
+            suficientes = [x for x in frios_aqui if x[0] >= falta]
+            b, clave = min(suficientes) if suficientes else max(frios_aqui)
+            # Mejor un disco frío que ya tenga parte del título; si no, el de más hueco
+            candidatos = [f for f in frios if hueco[f.nombre] >= b]
+            destino = max(candidatos, key=lambda f: (clave in f.frags, hueco[f.nombre]))
+            mover(clave, disco, destino, b, desalojos)
+        return True
+
+    pendientes = [(clave, d, b) for d in frios for clave, b in d.frags.items() if es_caliente(clave)]
+    for clave, origen, b in sorted(pendientes, key=lambda x: x[2], reverse=True):
+        con_titulo = [c for c in calientes if clave in c.frags and hueco[c.nombre] >= b]
+        con_hueco = [c for c in calientes if hueco[c.nombre] >= b]
+        if con_titulo:
+            destino = max(con_titulo, key=lambda c: c.frags[clave])
+        elif con_hueco:
+            destino = max(con_hueco, key=lambda c: hueco[c.nombre])
+        else:
+            # Hay que hacer sitio: el disco caliente donde menos frío haya que desalojar
+            destino = None
+            for c in sorted(calientes, key=lambda c: b - hueco[c.nombre]):
+                if desalojar(c, b):
+                    destino = c
+                    break
+            if destino is None:
+                sin_hueco.append((clave, origen.nombre, b))
+                continue
+        mover(clave, origen, destino, b, movimientos)
+
+    return desalojos, movimientos, sin_hueco
+
+def items_plan(lista, vistos, motivo):
+    items = []
+    for (subpath, titulo), origen, destino, b in lista:
+        items.append({
+            "origen": f"{MNT_ROOT}/{origen}/{subpath}/{titulo}",
+            "destino": f"{plex_metadata.UNRAID_PREFIX}/{subpath}/{titulo}",
+            "disco_destino": destino,
+            "etiqueta": f"{titulo} ({motivo} {origen}->{destino})",
+            "tamano": b,
+            "ultimo_visionado": vistos.get((subpath, titulo), (0, 0))[0],
+        })
+    return items
+
+# ==========================================
+# INFORME HTML
+# ==========================================
+def generar_html(discos, desalojos, movimientos, sin_hueco, vistos, resumen, dias):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    nombres_cat = {v: k for k, v in CATEGORIAS.items()}
+
+    filas_discos = ""
+    for d in discos:
+        usado = d.total - d.libre
+        color = "#ef4444" if d.rol == "caliente" else "#38bdf8"
+        filas_discos += f"""
+            <tr>
+                <td><span class="badge">{d.nombre}</span></td>
+                <td><strong style="color:{color}">{d.rol.upper()}</strong></td>
+                <td data-order="{d.total}">{formatear_tamano(d.total)}</td>
+                <td data-order="{usado}">{formatear_tamano(usado)}</td>
+                <td data-order="{d.caliente}">{formatear_tamano(d.caliente)}</td>
+                <td data-order="{d.frio}">{formatear_tamano(d.frio)}</td>
+                <td data-order="{d.entra}">{formatear_tamano(d.entra)}</td>
+                <td data-order="{d.sale}">{formatear_tamano(d.sale)}</td>
+            </tr>"""
+
+    filas_mov = ""
+    for fase, lista in (("1 · Desalojo frío", desalojos), ("2 · Caliente", movimientos)):
+        for (subpath, titulo), origen, destino, b in lista:
+            ultimo = vistos.get((subpath, titulo), (0, 0))[0]
+            fecha = datetime.fromtimestamp(ultimo).strftime("%Y-%m-%d") if ultimo else "Nunca"
+            filas_mov += f"""
+            <tr>
+                <td>{fase}</td>
+                <td>{html.escape(titulo)}</td>
+                <td>{html.escape(nombres_cat.get(subpath, subpath))}</td>
+                <td><span class="badge">{origen}</span> → <span class="badge">{destino}</span></td>
+                <td data-order="{b}">{formatear_tamano(b)}</td>
+                <td data-order="{ultimo}">{fecha}</td>
+            </tr>"""
+    for (subpath, titulo), origen, b in sin_hueco:
+        filas_mov += f"""
+            <tr>
+                <td style="color:#ef4444">Sin hueco</td>
+                <td>{html.escape(titulo)}</td>
+                <td>{html.escape(nombres_cat.get(subpath, subpath))}</td>
+                <td><span class="badge">{origen}</span></td>
+                <td data-order="{b}">{formatear_tamano(b)}</td>
+                <td>-</td>
+            </tr>"""
+
+    kpis = "".join(
+        f'<div class="kpi-card"><div class="kpi-label">{html.escape(k)}</div><div class="kpi-value">{v}</div></div>'
+        for k, v in resumen
+    )
+
+    html_content = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <title>Tiering Caliente / Frío</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css">
+    <style>
+        :root {{ --bg: #0f1115; --card: #181b21; --accent: #38bdf8; --text: #e2e8f0; --border: #334155; }}
+        body {{ background: var(--bg); color: var(--text); font-family: 'Inter', sans-serif; padding: 40px; }}
+        .container {{ max-width: 1400px; margin: 0 auto; }}
+        h1 {{ color: #fff; }}
+        h2 {{ color: #fff; margin-top: 40px; border-bottom: 1px solid var(--border); padding-bottom: 8px; }}
+        .meta {{ color: #94a3b8; margin-bottom: 20px; }}
+        .kpi-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }}
+        .kpi-card {{ background: var(--card); padding: 20px; border-radius: 12px; border: 1px solid var(--border); border-left: 4px solid var(--accent); }}
+        .kpi-label {{ color: #94a3b8; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 1px; font-weight: bold; }}
+        .kpi-value {{ font-size: 1.8rem; font-weight: 700; color: #fff; margin-top: 5px; }}
+        table.dataTable {{ width: 100% !important; border-collapse: collapse !important; }}
+        table.dataTable thead th {{ background: #1e293b; color: #fff; padding: 12px; border-bottom: 2px solid var(--accent); text-align: left; }}
+        table.dataTable tbody td {{ background: var(--card); color: #ccc; padding: 10px; border-bottom: 1px solid var(--border); }}
+        .badge {{ padding: 4px 8px; border-radius: 4px; font-size: 0.75rem; font-weight: bold; background: rgba(99, 102, 241, 0.15); color: #818cf8; border: 1px solid rgba(99, 102, 241, 0.3); }}
+        .dataTables_wrapper select, .dataTables_wrapper input {{ background: #0f1115; border: 1px solid var(--border); color: #fff; padding: 5px; border-radius: 4px; }}
+        .dataTables_wrapper .dataTables_length, .dataTables_wrapper .dataTables_filter, .dataTables_wrapper .dataTables_info, .dataTables_wrapper .dataTables_paginate {{ color: #94a3b8 !important; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🔥❄️ Tiering de Contenido</h1>
+        <div class="meta">Generado: {ts} | Caliente = visto en los últimos {dias} días</div>
+        <div class="kpi-grid">{kpis}</div>
+        <h2>Discos</h2>
+        <table id="discosTable" class="display">
+            <thead><tr><th>Disco</th><th>Rol</th><th>Tamaño</th><th>Usado</th><th>Caliente</th><th>Frío</th><th>Entra</th><th>Sale</th></tr></thead>
+            <tbody>{filas_discos}</tbody>
+        </table>
+        <h2>Movimientos</h2>
+        <table id="movTable" class="display">
+            <thead><tr><th>Fase</th><th>Título</th><th>Categoría</th><th>Movimiento</th><th>Tamaño</th><th>Último visionado</th></tr></thead>
+            <tbody>{filas_mov}</tbody>
+        </table>
+    </div>
+    <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
+    <script>$(document).ready(function() {{
+        $('#discosTable').DataTable({{ "paging": false, "searching": false, "info": false }});
+        $('#movTable').DataTable({{ "pageLength": 50, "order": [[ 0, "asc" ], [ 4, "desc" ]] }});
+    }});</script>
+</body>
+</html>"""
+
+    with open(REPORT_HTML, "w", encoding="utf-8") as f: f.write(html_content)
+    return REPORT_HTML
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dias", type=int, default=90, help="Visto en los últimos N días = caliente")
+    parser.add_argument("--discos-calientes", type=int, default=0, help="Nº de discos calientes (0 = los mínimos necesarios)")
+    parser.add_argument("--margen-gb", type=int, default=50, help="Espacio libre a respetar en cada disco (GB)")
+    args = parser.parse_args()
+
+    print_header("PLANIFICADOR DE TIERING")
+    rutas = obtener_discos()
+    if not rutas:
+        print(f"{Color.FAIL}❌ No se detectaron discos en /mnt/disk*{Color.ENDC}")
+        return
+
+    print(f"{Color.CYAN}1️⃣  Tamaños por título y disco{Color.ENDC}", flush=True)
+    discos = []
+    for ruta in rutas:
+        d = Disco(ruta)
+        for subpath, titulos in cargar_tamanos(ruta).items():
+            for titulo, r in titulos.items():
+                if r.get("real"): d.frags[(subpath, titulo)] = r["real"]
+        discos.append(d)
+
+    print(f"{Color.CYAN}2️⃣  Últimos visionados (Plex){Color.ENDC}", flush=True)
+    try:
+        vistos = cargar_visionados()
+    except Exception as e:
+        print(f"{Color.FAIL}❌ No se pudo leer la DB de Plex: {e}{Color.ENDC}")
+        return
+    limite = time.time() - args.dias * 86400
+    es_caliente = lambda clave: vistos.get(clave, (0, 0))[0] >= limite
+
+    for d in discos:
+        for clave, b in d.frags.items():
+            if es_caliente(clave): d.caliente += b
+            else: d.frio += b
+    total_caliente = sum(d.caliente for d in discos)
+    total_frio = sum(d.frio for d in discos)
+    print(f"   • Caliente: {formatear_tamano(total_caliente)} | Frío: {formatear_tamano(total_frio)}", flush=True)
+
+    print(f"{Color.CYAN}3️⃣  Planificando{Color.ENDC}", flush=True)
+    desalojos, movimientos, sin_hueco = planificar(discos, es_caliente, args.discos_calientes, args.margen_gb * 1024**3)
+    calientes = [d.nombre for d in discos if d.rol == "caliente"]
+    movido = sum(m[3] for m in desalojos + movimientos)
+
+    if desalojos:
+        motor_movimientos.guardar_plan(str(PLAN_FASE1), items_plan(desalojos, vistos, "frío"), "15")
+    elif PLAN_FASE1.exists():
+        PLAN_FASE1.unlink()
+    motor_movimientos.guardar_plan(str(PLAN_FASE2), items_plan(movimientos, vistos, "caliente"), "15")
+
+    print_header("RESULTADOS")
+    print(f"   • Discos calientes: {', '.join(calientes) or '-'}")
+    print(f"   • Discos fríos: {len(discos) - len(calientes)}")
+    print(f"   • Desalojos: {len(desalojos)} | Movimientos calientes: {len(movimientos)} | Total: {formatear_tamano(movido)}")
+    if sin_hueco:
+        print(f"{Color.WARNING}   ⚠️ {len(sin_hueco)} fragmentos calientes sin hueco en discos calientes{Color.ENDC}")
+
+    resumen = [
+        ("Discos calientes", f"{len(calientes)} / {len(discos)}"),
+        ("Contenido caliente", formatear_tamano(total_caliente)),
+        ("Contenido frío", formatear_tamano(total_frio)),
+        ("A mover", formatear_tamano(movido)),
+        ("Sin hueco", len(sin_hueco)),
+    ]
+    html_path = generar_html(discos, desalojos, movimientos, sin_hueco, vistos, resumen, args.dias)
+    print(f"\n{Color.GREEN}✅ Archivos generados:{Color.ENDC}")
+    print(f"📄 HTML: {html_path}")
+    if desalojos: print(f"📦 Fase 1 (ejecutar primero con 12): {PLAN_FASE1}")
+    print(f"📦 Plan: {PLAN_FASE2}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reporte completo: los informes de 03, 04, 05, 07 y 08 con un solo recorrido.
+
+Cada uno de esos scripts recorre por su cuenta /mnt/user/series y
+/mnt/user/peliculas, así que el lote mensual lee los mismos directorios
+cinco veces. Aquí cada raíz se recorre una vez (cada fichero un solo stat)
+y cada carpeta se entrega a los agregadores, uno por informe. Un agregador
+acumula lo mismo que su script y al final escribe el informe con las
+funciones del propio script (se cargan con importlib: el nombre empieza por
+número), así que el HTML sale idéntico al de ejecutarlos por separado.
+
+Cada agregador declara las carpetas que le interesan (relativas a /mnt/user)
+y las que excluye; el recorrido no entra en lo que no interesa a ninguno.
+Siempre lee del array (equivale a --fuente disco) y sin checkpoint.
+"""
+
+import os
+import sys
+import stat
+import argparse
+import importlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from pathlib import Path
+
+from uso_disco import UsoDisco
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+BASE_PATH = "/mnt/user"
+INFORMES = ("03", "04", "05", "07", "08")
+
+# ==========================================
+# CLASES DE UTILIDAD
+# ==========================================
+class Color:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def print_header(text):
+    print(f"\n{Color.HEADER}╔{'═'*60}╗", flush=True)
+    print(f"║ {text:^58} ║", flush=True)
+    print(f"╚{'═'*60}╝{Color.ENDC}", flush=True)
+
+def cargar_script(nombre):
+    """Los scripts numerados no se pueden importar con 'import'; sus main() no se ejecutan."""
+    return importlib.import_module(nombre)
+
+def partes_de(ruta):
+    """Componentes de una ruta relativos a /mnt/user ('series', 'Series HD', ...)."""
+    rel = os.path.relpath(str(ruta), BASE_PATH)
+    return () if rel == "." else tuple(rel.split(os.sep))
+
+class Fichero:
+    """Un fichero del recorrido. El stat se hace la primera vez que algún agregador lo pide."""
+    __slots__ = ("ruta", "nombre", "ext", "_lst", "_st")
+
+    def __init__(self, root, nombre):
+        self.ruta = os.path.join(root, nombre)
+        self.nombre = nombre
+        self.ext = os.path.splitext(nombre)[1].lower()
+        self._lst = self._st = False  # False: sin leer; None: error
+
+    def lstat(self):
+        if self._lst is False:
+            try: self._lst = os.lstat(self.ruta)
+            except OSError: self._lst = None
+        return self._lst
+
+    def stat(self):
+        """Como os.stat (sigue symlinks); en un fichero normal reutiliza el lstat."""
+        if self._st is False:
+            lst = self.lstat()
+            if lst is not None and not stat.S_ISLNK(lst.st_mode):
+                self._st = lst
+            else:
+                try: self._st = os.stat(self.ruta)
+                except OSError: self._st = None
+        return self._st
+
+# ==========================================
+# AGREGADORES
+# ==========================================
+class Agregador(ABC):
+    """Base: 'prefijos' son las carpetas de interés como tuplas de partes_de()."""
+    nombre = ""
+
+    def __init__(self):
+        self.prefijos = []
+
+    def excluida(self, partes):
+        return False
+
+    def interesa(self, partes):
+        return any(partes[:len(p)] == p for p in self.prefijos) and not self.excluida(partes)
+
+    def por_debajo(self, partes):
+        """Alguna carpeta de interés cuelga de 'partes' (hay que bajar aunque no interese)."""
+        return any(len(p) > len(partes) and p[:len(partes)] == partes for p in self.prefijos)
+
+    @abstractmethod
+    def carpeta(self, partes, dirs, ficheros):
+        """Procesa una carpeta que interesa: 'ficheros' son Fichero con stat perezoso."""
+
+    @abstractmethod
+    def escribir(self):
+        """Genera el informe del script con lo acumulado."""
+
+class Catalogo(Agregador):
+    """03: una fila por título con tamaño (hardlinks una vez), nº de vídeos, NFO, carátula y temporadas."""
+    nombre = "03 Catálogo"
+
+    def __init__(self):
+        super().__init__()
+        self.m = cargar_script("03_catalog_maker")
+        self.categorias = []  # (es_serie, categoria, prefijo)
+        for es_serie, rutas in ((True, self.m.RUTAS_SERIES), (False, self.m.RUTAS_PELICULAS)):
+            for cat, ruta in rutas.items():
+                self.categorias.append((es_serie, cat, partes_de(ruta)))
+        self.prefijos = [p for _, _, p in self.categorias]
+        self.titulos = {}  # (es_serie, categoria, partes del título) -> acumuladores
+
+    def carpeta(self, partes, dirs, ficheros):
+        for es_serie, cat, pref in self.categorias:
+            if len(partes) <= len(pref) or partes[:len(pref)] != pref: continue
+            clave = (es_serie, cat, partes[:len(pref) + 1])
+            t = self.titulos.get(clave)
+            if t is None:
+                t = self.titulos[clave] = {"uso": UsoDisco(), "videos": 0, "nfo": False, "img": False, "subdirs": None}
+            if es_serie and len(partes) == len(pref) + 1: t["subdirs"] = list(dirs)
+            for f in ficheros:
+                # stat (sigue symlinks) como 03, para que el catálogo salga idéntico
+                st = f.stat()
+                if st is not None: t["uso"].sumar(st)
+                tipo = self.m.clasificar_fichero(f.nombre)
+                if tipo == "video": t["videos"] += 1
+                elif tipo == "nfo": t["nfo"] = True
+                elif tipo == "img": t["img"] = True
+
+    def escribir(self):
+        for es_serie, titulo, destino in ((True, "Catálogo de Series", self.m.FILE_SERIES),
+                                          (False, "Catálogo de Películas", self.m.FILE_MOVIES)):
+            items = []
+            for serie, cat, pref in self.categorias:
+                if serie != es_serie: continue
+                claves = sorted(k for k in self.titulos if k[0] == es_serie and k[1] == cat)
+                for clave in claves:
+                    t = self.titulos[clave]
+                    items.append(self.m.armar_item(cat, Path(BASE_PATH, *clave[2]), t["uso"], t["videos"],
+                                                   t["nfo"], t["img"], t["subdirs"]))
+            self.m.generar_html_individual(items, titulo, destino)
+
+class Biblioteca(Agregador):
+    """04: todos los vídeos de cada librería con resolución y códec deducidos del nombre."""
+    nombre = "04 Biblioteca"
+
+    def __init__(self, res="", codec="", orden="1"):
+        super().__init__()
+        self.m = cargar_script("04_analyze_library")
+        self.filtros = (res, codec, orden)
+        self.libs = []  # (config, prefijo, UsoDisco, Registros en columnas)
+        for config in self.m.PATHS.values():
+            self.libs.append((config, partes_de(config["ruta"]), UsoDisco(), self.m.Registros()))
+        self.prefijos = [p for _, p, _, _ in self.libs]
+
+    def excluida(self, partes):
+        # Como 04: las carpetas Uploads no cuentan a ninguna profundidad
+        return any(partes[:len(p)] == p and self.m.CARPETA_EXCLUIDA in partes[len(p):] for p in self.prefijos)
+
+    def carpeta(self, partes, dirs, ficheros):
+        for config, pref, uso, registros in self.libs:
+            if partes[:len(pref)] != pref: continue
+            for f in ficheros:
+                if f.ext not in self.m.VIDEO_EXT: continue
+                st = f.stat()
+                size = st.st_size if st else 0
+                real = uso.sumar(st) if st else 0
+                registros.anadir(f.ruta, f.nombre, self.m.extraer_resolucion(f.nombre),
+                                 self.m.extraer_codec(f.nombre), size, real)
+
+    def escribir(self):
+        for config, _, _, registros in self.libs:
+            print(f"{Color.CYAN}📂 {config['nombre']}: {len(registros)} vídeos{Color.ENDC}", flush=True)
+            html_path = self.m.generar_informe(registros, config, *self.filtros)
+            if html_path: print(f"📄 {html_path}", flush=True)
+
+class Calidad(Agregador):
+    """05: caps y caps de baja calidad por serie; las que pasan el umbral van al HTML y al plan."""
+    nombre = "05 Calidad"
+
+    def __init__(self, porcentaje=80):
+        super().__init__()
+        self.m = cargar_script("05_scanner_quality")
+        self.porcentaje = porcentaje
+        self.raiz = partes_de(self.m.PATH_SERIES_ROOT)
+        self.prefijos = [self.raiz]
+        self.series = {}  # (categoria, serie) -> [caps, caps_malos]
+
+    def excluida(self, partes):
+        return len(partes) > len(self.raiz) and partes[len(self.raiz)] == self.m.CARPETA_UPLOADS
+
+    def carpeta(self, partes, dirs, ficheros):
+        rel = partes[len(self.raiz):]
+        # Como 05: cuentan las carpetas categoría/serie; lo suelto en la raíz o la categoría no
+        if len(rel) < 2: return
+        conteo = self.series.setdefault((rel[0], rel[1]), [0, 0])
+        for f in ficheros:
+            if f.ext not in self.m.VIDEO_EXT: continue
+            conteo[0] += 1
+            if self.m.es_baja_calidad(self.m.detectar_resolucion(f.nombre)): conteo[1] += 1
+
+    def escribir(self):
+        recorrido = ((cat, serie, os.path.join(self.m.PATH_SERIES_ROOT, cat, serie), total, malos)
+                     for (cat, serie), (total, malos) in sorted(self.series.items()))
+        series_stats = self.m.filtrar_series(recorrido, self.porcentaje)
+        if not series_stats:
+            print(f"{Color.GREEN}¡Limpio! Ninguna serie supera el umbral.{Color.ENDC}")
+            return
+        print(f"📄 {self.m.generar_html(series_stats)}")
+        print(f"📜 Plan: {self.m.generar_plan(series_stats)}")
+
+class CapsSeries(Agregador):
+    """07: caps por calidad y serie en cada categoría de series."""
+    nombre = "07 Capítulos"
+
+    def __init__(self):
+        super().__init__()
+        self.m = cargar_script("07_analyze_series_caps")
+        self.categorias = [(cat, partes_de(ruta)) for cat, ruta in self.m.RUTAS_SERIES.items()]
+        self.prefijos = [p for _, p in self.categorias]
+        self.conteos = {}  # categoria -> serie -> {calidad: caps, 'total': caps}
+
+    def carpeta(self, partes, dirs, ficheros):
+        for cat, pref in self.categorias:
+            if partes[:len(pref)] != pref: continue
+            datos_series = self.conteos.setdefault(cat, defaultdict(lambda: defaultdict(int)))
+            if len(partes) == len(pref): continue
+            serie = partes[len(pref)]
+            for f in ficheros:
+                if f.ext not in self.m.EXT_VIDEO: continue
+                # La serie solo entra al encontrar un vídeo, como en 07 (sin filas con Total 0)
+                counts = datos_series[serie]
+                counts[self.m.detectar_calidad(f.nombre)] += 1
+                counts["total"] += 1
+
+    def escribir(self):
+        conteos = [(cat, self.conteos[cat]) for cat, _ in self.categorias if cat in self.conteos]
+        self.m.generar_html_pro(*self.m.resumir_categorias(conteos))
+
+class BajaCalidad(Agregador):
+    """08: series de Uploads/BajaCalidad con resolución mayoritaria por serie y temporada."""
+    nombre = "08 Baja Calidad"
+
+    def __init__(self):
+        super().__init__()
+        self.m = cargar_script("08_analisis_carpeta_bajacalidad")
+        self.categorias = [(cat, partes_de(os.path.join(self.m.BASE_PATH, cat))) for cat in self.m.TARGET_CATEGORIES]
+        self.prefijos = [p for _, p in self.categorias]
+        self.usos = {cat: UsoDisco() for cat in self.m.TARGET_CATEGORIES}
+        self.series = {}  # (categoria, serie) -> [season_info, resoluciones, UsoDisco]
+
+    def carpeta(self, partes, dirs, ficheros):
+        for cat, pref in self.categorias:
+            if len(partes) <= len(pref) or partes[:len(pref)] != pref: continue
+            serie = partes[len(pref)]
+            clave = (cat, serie)
+            if clave not in self.series:
+                self.series[clave] = [defaultdict(lambda: {'count': 0, 'res_list': []}), [], UsoDisco()]
+            season_info, all_resolutions, uso = self.series[clave]
+            videos = [f for f in ficheros if f.nombre.lower().endswith(self.m.VIDEO_EXTENSIONS)]
+            if not videos: continue
+            season_name = self.m.nombre_temporada(os.sep.join(partes[len(pref) + 1:]) or ".")
+            for f in videos:
+                st = f.stat()
+                if st:
+                    uso.sumar(st)
+                    self.usos[cat].sumar(st)
+                res = self.m.detectar_resolucion(f.nombre)
+                all_resolutions.append(res)
+                season_info[season_name]['count'] += 1
+                season_info[season_name]['res_list'].append(res)
+
+    def escribir(self):
+        categorias = []
+        for cat, _ in self.categorias:
+            filas = [self.m.fila_serie(serie, *self.series[(c, serie)])
+                     for c, serie in sorted(self.series) if c == cat]
+            categorias.append((cat, [f for f in filas if f], self.usos[cat]))
+        self.m.escribir_html(categorias)
+        print(f"📄 {self.m.OUTPUT_FILE}")
+
+AGREGADORES = {
+    "03": lambda args: Catalogo(),
+    "04": lambda args: Biblioteca(),
+    "05": lambda args: Calidad(args.porcentaje),
+    "07": lambda args: CapsSeries(),
+    "08": lambda args: BajaCalidad(),
+}
+
+# ==========================================
+# RECORRIDO
+# ==========================================
+def recorrer(agregadores):
+    """Un os.walk por raíz (carpetas en orden). Devuelve (carpetas, ficheros) vistos."""
+    raices = sorted({p[0] for a in agregadores for p in a.prefijos if p})
+    carpetas = n_ficheros = 0
+    for raiz in raices:
+        print(f"{Color.CYAN}📂 Recorriendo {os.path.join(BASE_PATH, raiz)}...{Color.ENDC}", flush=True)
+        for root, dirs, files in os.walk(os.path.join(BASE_PATH, raiz)):
+            partes = partes_de(root)
+            activos = [a for a in agregadores if a.interesa(partes)]
+            if activos:
+                ficheros = [Fichero(root, f) for f in files]
+                subdirs = list(dirs)
+                for a in activos: a.carpeta(partes, subdirs, ficheros)
+                carpetas += 1
+                n_ficheros += len(ficheros)
+                if carpetas % 1000 == 0: print(f"   ... {carpetas} carpetas, {n_ficheros} ficheros", flush=True)
+            # Poda: solo se baja donde algún agregador tiene algo que mirar
+            dirs[:] = sorted(d for d in dirs
+                             if any(a.interesa(partes + (d,)) or a.por_debajo(partes + (d,)) for a in agregadores))
+    return carpetas, n_ficheros
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Informes 03, 04, 05, 07 y 08 con un solo recorrido")
+    parser.add_argument("--informes", default=",".join(INFORMES), help="Informes a generar (p.ej. 03,05)")
+    parser.add_argument("--porcentaje", type=int, default=80, help="Umbral de caps malos para 05")
+    args = parser.parse_args()
+
+    pedidos = [x.strip() for x in args.informes.split(",") if x.strip()]
+    desconocidos = [x for x in pedidos if x not in AGREGADORES]
+    if desconocidos or not pedidos:
+        print(f"{Color.FAIL}❌ Informes no válidos: {', '.join(desconocidos) or '(ninguno)'}. Opciones: {', '.join(INFORMES)}{Color.ENDC}")
+        sys.exit(1)
+
+    print_header("REPORTE COMPLETO (UN SOLO RECORRIDO)")
+    if not os.path.exists(BASE_PATH):
+        print(f"{Color.FAIL}❌ Ruta no encontrada: {BASE_PATH}{Color.ENDC}")
+        return
+
+    agregadores = [AGREGADORES[x](args) for x in INFORMES if x in pedidos]
+    carpetas, n_ficheros = recorrer(agregadores)
+    print(f"{Color.GREEN}✅ Recorrido terminado: {carpetas} carpetas, {n_ficheros} ficheros.{Color.ENDC}", flush=True)
+
+    for a in agregadores:
+        print_header(f"INFORME {a.nombre.upper()}")
+        try:
+            a.escribir()
+        except OSError as e:
+            print(f"{Color.FAIL}❌ No se pudo escribir el informe {a.nombre}: {e}{Color.ENDC}")
+
+    print(f"\n{Color.GREEN}🏁 Finalizado.{Color.ENDC}", flush=True)
+
+if __name__ == "__main__":
+    main()
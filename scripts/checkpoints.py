@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Checkpoints de los escaneos largos y parada cooperativa.
+
+Un escaneo se divide en unidades (normalmente la carpeta de cada título). Al
+terminar cada unidad se añade una línea JSON con su resultado parcial a
+cache/checkpoint_<nombre>.jsonl, así que guardar cuesta lo que ocupa esa
+unidad y no todo lo acumulado. Si el escaneo se corta, la siguiente ejecución
+con la misma clave (rutas, fuente...) salta las unidades ya hechas y reutiliza
+sus datos. Al acabar bien, el fichero se borra.
+
+En memoria solo se guarda lo imprescindible: de las unidades reanudadas, sus
+datos hasta que el script los recoge con datos() (una vez); de las hechas en
+esta ejecución, solo la clave (sus datos ya están en el fichero y en el script).
+
+Parada: al crear un Checkpoint se instalan manejadores de SIGTERM/SIGINT que
+solo levantan una marca. El script la mira en punto_seguro() (entre unidades),
+vuelca lo pendiente y sale con CODIGO_PARADA. Una segunda señal sale en el acto.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+CACHE_DIR = "/mnt/user/appdata/media-manager/datos/cache"
+INTERVALO_FSYNC = 30               # segundos entre fsync del checkpoint
+MAX_ANTIGUEDAD = 3 * 24 * 3600     # un checkpoint más viejo ya no refleja la biblioteca
+CODIGO_PARADA = 128 + signal.SIGTERM
+
+# ==========================================
+# PARADA COOPERATIVA
+# ==========================================
+_parada = {"pedida": False, "instalada": False}
+
+def _manejador(signum, frame):
+    if _parada["pedida"]:
+        print("\n🛑 Segunda señal: saliendo sin esperar.", flush=True)
+        os._exit(CODIGO_PARADA)
+    _parada["pedida"] = True
+    print("\n⏸️  Parada pedida: se guardará el progreso en el siguiente punto seguro...", flush=True)
+
+def instalar_parada():
+    if _parada["instalada"]: return
+    signal.signal(signal.SIGTERM, _manejador)
+    signal.signal(signal.SIGINT, _manejador)
+    _parada["instalada"] = True
+
+def parada_pedida():
+    return _parada["pedida"]
+
+# ==========================================
+# CHECKPOINT
+# ==========================================
+class Checkpoint:
+    def __init__(self, nombre, clave=None, directorio=CACHE_DIR):
+        """'clave' identifica la ejecución (rutas, opciones que cambian el resultado). Si no
+        coincide con la del fichero, o el fichero es muy viejo, se empieza de cero."""
+        self.ruta = os.path.join(directorio, f"checkpoint_{nombre}.jsonl")
+        self.clave = clave or {}
+        self.hechos = {}          # unidad -> datos de las reanudadas aún sin recoger
+        self._marcadas = set()    # unidades terminadas en esta ejecución (sin datos)
+        self._reanudadas = set()  # unidades que venían del fichero
+        self._f = None
+        self._desactivado = False  # tras un error de escritura: no se toca más el fichero
+        self._ultimo_fsync = time.monotonic()
+        instalar_parada()
+        self._cargar()
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                cabecera = json.loads(f.readline())
+                if cabecera.get("clave") != self.clave or time.time() - cabecera.get("fecha", 0) > MAX_ANTIGUEDAD:
+                    return
+                for linea in f:
+                    try: reg = json.loads(linea)
+                    except ValueError: break  # última línea a medias por un corte
+                    self.hechos[reg["u"]] = reg["d"]
+        except (OSError, ValueError, KeyError):
+            self.hechos = {}
+            return
+        self._reanudadas = set(self.hechos)
+        if self.hechos:
+            print(f"♻️  Reanudando desde checkpoint: {len(self.hechos)} unidades ya procesadas.", flush=True)
+            # Se reescribe limpio (sin una posible línea rota al final) y se sigue añadiendo
+            self._abrir(reescribir=True)
+
+    def _abrir(self, reescribir=False):
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        tmp = self.ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"clave": self.clave, "fecha": time.time()}) + "\n")
+            if reescribir:
+                for u, d in self.hechos.items():
+                    f.write(json.dumps({"u": u, "d": d}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.ruta)
+        self._f = open(self.ruta, "a", encoding="utf-8")
+
+    def hecho(self, unidad):
+        return unidad in self._reanudadas or unidad in self._marcadas
+
+    def datos(self, unidad):
+        """Datos de una unidad reanudada. Se entregan una sola vez y se sueltan de memoria."""
+        return self.hechos.pop(unidad, None)
+
+    def marcar(self, unidad, datos):
+        """Apunta una unidad terminada con su resultado (serializable a JSON)."""
+        self._marcadas.add(unidad)
+        if self._desactivado: return
+        try:
+            if self._f is None: self._abrir()
+            self._f.write(json.dumps({"u": unidad, "d": datos}, ensure_ascii=False) + "\n")
+            self._f.flush()
+            if time.monotonic() - self._ultimo_fsync >= INTERVALO_FSYNC:
+                os.fsync(self._f.fileno())
+                self._ultimo_fsync = time.monotonic()
+        except OSError as e:
+            print(f"   [checkpoint] No se pudo guardar ({e}); se sigue sin checkpoint.", flush=True)
+            # Reabrir con _abrir() dejaría el fichero solo con la cabecera y se perdería lo guardado
+            self._desactivado = True
+            try:
+                if self._f is not None: self._f.close()
+            except OSError: pass
+            self._f = None
+
+    def punto_seguro(self):
+        """Llamar entre unidades. Si se pidió parar, deja el checkpoint en disco y sale."""
+        if not parada_pedida(): return
+        if self._f is not None:
+            try:
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._f.close()
+            except OSError: pass
+        if self._desactivado:
+            print("⏸️  Detenido. El checkpoint dejó de guardarse por un error: la próxima ejecución seguirá desde lo último guardado.", flush=True)
+        else:
+            print(f"⏸️  Detenido. {len(self._reanudadas | self._marcadas)} unidades guardadas; la próxima ejecución seguirá desde aquí.", flush=True)
+        sys.exit(CODIGO_PARADA)
+
+    def terminar(self):
+        """El escaneo acabó: el checkpoint ya no hace falta."""
+        if self._f is not None:
+            try: self._f.close()
+            except OSError: pass
+            self._f = None
+        try: os.remove(self.ruta)
+        except OSError: pass
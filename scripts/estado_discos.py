@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Estado de energía de los discos del array sin despertarlos.
+
+Leer /sys/class/block/<dev>/stat no genera E/S en el disco. Se guarda una
+muestra de los contadores de lecturas/escrituras por disco; si en la
+siguiente consulta no han cambiado y la última actividad es más antigua que
+la ventana de spin-down, el disco se da por dormido.
+
+El dispositivo de cada montaje sale de /proc/mounts (en Unraid /dev/mdNp1 o
+/dev/mapper/mdNp1 con cifrado). Los contadores del md reflejan la E/S del
+sistema de ficheros, que es lo que despierta el disco.
+
+Variables de entorno (también sirven de stub para pruebas):
+  MM_ESTADO_DISCOS   "disk3=dormido,disk5=activo" fuerza el estado
+  MM_SPINDOWN_MIN    minutos sin E/S para considerar un disco dormido (30)
+  MM_PROC_MOUNTS / MM_SYS_BLOCK   rutas alternativas de /proc/mounts y /sys/class/block
+"""
+
+import os
+import json
+import time
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+PROC_MOUNTS = os.environ.get("MM_PROC_MOUNTS", "/proc/mounts")
+SYS_BLOCK = os.environ.get("MM_SYS_BLOCK", "/sys/class/block")
+CACHE_DIR = "/mnt/user/appdata/media-manager/datos/cache"
+MUESTRAS_FILE = os.path.join(CACHE_DIR, "estado_discos.json")
+
+ACTIVO = "activo"
+DORMIDO = "dormido"
+DESCONOCIDO = "desconocido"
+
+def _minutos_entorno(nombre, defecto):
+    try: return float(os.environ.get(nombre, defecto)) * 60
+    except ValueError: return defecto * 60
+
+SPINDOWN = _minutos_entorno("MM_SPINDOWN_MIN", 30)
+
+def _forzados():
+    forzados = {}
+    for par in os.environ.get("MM_ESTADO_DISCOS", "").split(","):
+        if "=" in par:
+            disco, estado = par.split("=", 1)
+            forzados[disco.strip()] = estado.strip()
+    return forzados
+
+# ==========================================
+# DISPOSITIVOS
+# ==========================================
+def dispositivos_montados():
+    """{punto_de_montaje: nombre_en_sys_block} de los /dev/* montados."""
+    res = {}
+    try:
+        with open(PROC_MOUNTS, encoding="utf-8") as f:
+            for linea in f:
+                partes = linea.split()
+                if len(partes) < 2 or not partes[0].startswith("/dev/"): continue
+                # /dev/mapper/md1p1 -> /dev/dm-3
+                res[partes[1].replace("\\040", " ")] = os.path.basename(os.path.realpath(partes[0]))
+    except OSError:
+        pass
+    return res
+
+def leer_contadores(dev):
+    """(lecturas, escrituras) completadas del dispositivo, o None si no hay stat."""
+    try:
+        with open(os.path.join(SYS_BLOCK, dev, "stat"), encoding="utf-8") as f:
+            campos = f.read().split()
+        return int(campos[0]), int(campos[4])
+    except (OSError, IndexError, ValueError):
+        return None
+
+# ==========================================
+# ESTADO
+# ==========================================
+class EstadoDiscos:
+    """Estado por disco a partir de la muestra anterior guardada en MUESTRAS_FILE."""
+    def __init__(self, ruta=MUESTRAS_FILE, spindown=SPINDOWN):
+        self.ruta = ruta
+        self.spindown = spindown
+        self.forzados = _forzados()
+        self.montajes = dispositivos_montados()
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                self.muestras = json.load(f)
+        except (OSError, ValueError):
+            self.muestras = {}
+
+    def _dev(self, disco):
+        return self.montajes.get(str(disco)) or self.montajes.get(os.path.join("/mnt", os.path.basename(str(disco))))
+
+    def estado(self, disco):
+        """ACTIVO, DORMIDO o DESCONOCIDO para /mnt/diskN (Path, ruta o nombre)."""
+        nombre = os.path.basename(str(disco))
+        if nombre in self.forzados: return self.forzados[nombre]
+        dev = self._dev(disco)
+        actual = leer_contadores(dev) if dev else None
+        previa = self.muestras.get(nombre)
+        if actual is None or not previa or previa.get("dev") != dev: return DESCONOCIDO
+        if list(actual) != previa["io"]: return ACTIVO
+        return DORMIDO if time.time() - previa["cambio"] >= self.spindown else ACTIVO
+
+    def registrar(self, disco):
+        """Guarda los contadores actuales (llamar tras acceder al disco: la actividad propia cuenta)."""
+        nombre = os.path.basename(str(disco))
+        dev = self._dev(disco)
+        actual = leer_contadores(dev) if dev else None
+        if actual is None: return
+        previa = self.muestras.get(nombre)
+        cambio = time.time()
+        if previa and previa.get("dev") == dev and previa["io"] == list(actual):
+            cambio = previa["cambio"]
+        self.muestras[nombre] = {"dev": dev, "io": list(actual), "cambio": cambio}
+
+    def guardar(self):
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            tmp = self.ruta + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.muestras, f)
+            os.replace(tmp, self.ruta)
+        except OSError:
+            pass
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fragmentación física de ficheros (XFS/ext4/btrfs) mediante el ioctl FIEMAP.
+
+Con fm_extent_count = 0 el kernel no copia el mapa de extents, solo devuelve
+cuántos hay en fm_mapped_extents: es una llamada barata que no lee datos del
+fichero. Debe usarse sobre /mnt/diskN (shfs en /mnt/user no implementa FIEMAP).
+"""
+
+import os
+import fcntl
+import struct
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+FS_IOC_FIEMAP = 0xC020660B
+# struct fiemap: fm_start, fm_length, fm_flags, fm_mapped_extents, fm_extent_count, fm_reserved
+FIEMAP_CABECERA = struct.Struct("=QQIIII")
+FIEMAP_MAX_OFFSET = 0xFFFFFFFFFFFFFFFF
+
+# A partir de aquí un fichero se considera fragmentado (un vídeo bien escrito en XFS suele tener 1-10)
+UMBRAL_EXTENTS = 100
+
+# ==========================================
+# FIEMAP
+# ==========================================
+def contar_extents(ruta):
+    """Número de extents del fichero, o None si el sistema de ficheros no soporta FIEMAP."""
+    peticion = bytearray(FIEMAP_CABECERA.pack(0, FIEMAP_MAX_OFFSET, 0, 0, 0, 0))
+    try:
+        fd = os.open(ruta, os.O_RDONLY | os.O_NOATIME)
+    except PermissionError:
+        # O_NOATIME exige ser dueño del fichero
+        fd = os.open(ruta, os.O_RDONLY)
+    try:
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, peticion, True)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    return FIEMAP_CABECERA.unpack(peticion)[3]
+
+def esta_fragmentado(ruta, umbral=UMBRAL_EXTENTS):
+    if not umbral: return False
+    try: n = contar_extents(ruta)
+    except OSError: return False
+    return n is not None and n > umbral
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Limitación de E/S de los movimientos para no dejar sin disco a Plex.
+
+Cada disco (st_dev) tiene dos cubos de tokens: bytes/s e IOPS. Las copias
+consumen bytes en el disco de origen y en el de destino por cada bloque, y
+una operación por cada lectura/escritura o rename. Sin límites configurados
+no se duerme nunca.
+
+En modo adaptativo la tasa se reduce (FACTOR_CON_SESIONES) mientras Plex
+tenga reproducciones activas. El número de sesiones se pide a
+/status/sessions (PLEX_SESIONES_URL, se puede apuntar a un servidor local de
+pruebas) y, si no responde, se estima por la DB: filas de
+metadata_item_settings con view_offset actualizado hace menos de
+VENTANA_SESIONES_DB segundos (Plex lo guarda cada pocos segundos al
+reproducir).
+
+Configuración por entorno: MOVER_LIMITE_MBS, MOVER_LIMITE_IOPS,
+MOVER_ADAPTATIVO (1/0). Los scripts pueden sobreescribirla con configurar().
+"""
+
+import os
+import json
+import time
+import threading
+import urllib.request
+import xml.etree.ElementTree as ET
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+PLEX_PREFS = "/mnt/user/appdata/plex/Library/Application Support/Plex Media Server/Preferences.xml"
+SESIONES_URL = os.environ.get("PLEX_SESIONES_URL", "http://localhost:32400/status/sessions")
+
+FACTOR_CON_SESIONES = 0.25   # Fracción de la tasa configurada mientras hay streams
+TASA_SIN_LIMITE_ADAPTATIVO = 40  # MB/s con sesiones activas si no hay límite fijo
+CACHE_SESIONES = 15          # segundos entre consultas
+VENTANA_SESIONES_DB = 120    # segundos
+
+# ==========================================
+# CUBO DE TOKENS
+# ==========================================
+class CuboTokens:
+    """Cubo de tokens con ráfaga de 1 s. Se admite deuda: un bloque mayor que el cubo espera lo que le toque."""
+    def __init__(self, tasa):
+        self.tasa = float(tasa)
+        self.tokens = self.tasa
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consumir(self, n, factor=1.0):
+        tasa = self.tasa * factor
+        with self._lock:
+            ahora = time.monotonic()
+            self.tokens = min(tasa, self.tokens + (ahora - self.ultimo) * tasa)
+            self.ultimo = ahora
+            self.tokens -= n
+            espera = -self.tokens / tasa if self.tokens < 0 else 0
+        if espera: time.sleep(espera)
+        return espera
+
+# ==========================================
+# SESIONES DE PLEX
+# ==========================================
+def _token_plex():
+    try:
+        with open(PLEX_PREFS, "r", encoding="utf-8") as f:
+            c = f.read()
+        if 'PlexOnlineToken="' in c:
+            return c.split('PlexOnlineToken="')[1].split('"')[0]
+    except OSError:
+        pass
+    return None
+
+def sesiones_por_api(url=SESIONES_URL, timeout=3):
+    """Tamaño del MediaContainer de /status/sessions (XML o JSON). None si no responde."""
+    req = urllib.request.Request(url)
+    token = _token_plex()
+    if token: req.add_header("X-Plex-Token", token)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            cuerpo = r.read()
+    except Exception:
+        return None
+    try:
+        if cuerpo.lstrip().startswith(b"{"):
+            return int(json.loads(cuerpo)["MediaContainer"].get("size", 0))
+        return int(ET.fromstring(cuerpo).get("size", 0))
+    except (ValueError, KeyError, TypeError, ET.ParseError):
+        return None
+
+def sesiones_por_db(ventana=VENTANA_SESIONES_DB):
+    """Heurística: progresos de reproducción guardados hace menos de 'ventana' segundos."""
+    import sqlite3
+    import plex_db
+    try:
+        # Solo apertura directa: una instantánea estaría desfasada y costaría rehacerla
+        conn = plex_db.conectar(modo="directo")
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        fila = conn.execute(
+            "SELECT count(*) FROM metadata_item_settings WHERE view_offset > 0 AND updated_at >= ?",
+            (int(time.time()) - ventana,)).fetchone()
+        return fila[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+_lock_sesiones = threading.Lock()
+_sesiones = {"valor": None, "fecha": 0.0}
+
+def sesiones_activas():
+    """Sesiones de Plex (API y si no DB), cacheadas CACHE_SESIONES segundos. None si no se sabe."""
+    with _lock_sesiones:
+        if time.monotonic() - _sesiones["fecha"] < CACHE_SESIONES:
+            return _sesiones["valor"]
+    # La consulta (HTTP hasta 3 s + DB) va fuera del lock para no parar al resto de hilos;
+    # si dos la hacen a la vez, el último simplemente refresca la caché
+    n = sesiones_por_api()
+    if n is None: n = sesiones_por_db()
+    with _lock_sesiones:
+        _sesiones.update(valor=n, fecha=time.monotonic())
+    return n
+
+# ==========================================
+# LIMITADOR POR DISCO
+# ==========================================
+class Limitador:
+    def __init__(self, mb_s=0, iops=0, adaptativo=False):
+        self.configurar(mb_s, iops, adaptativo)
+
+    def configurar(self, mb_s=0, iops=0, adaptativo=False):
+        self.bytes_s = int(mb_s * 1024**2) if mb_s and mb_s > 0 else 0
+        self.iops = int(iops) if iops and iops > 0 else 0
+        self.adaptativo = bool(adaptativo)
+        self._cubos = {}
+        self._lock = threading.Lock()
+        self._frenando = False
+
+    @property
+    def activo(self):
+        return bool(self.bytes_s or self.iops or self.adaptativo)
+
+    def descripcion(self):
+        if not self.activo: return "sin límite"
+        partes = []
+        if self.bytes_s: partes.append(f"{self.bytes_s // 1024**2} MB/s")
+        if self.iops: partes.append(f"{self.iops} IOPS")
+        if self.adaptativo: partes.append("adaptativo (Plex)")
+        return " · ".join(partes) + " por disco"
+
+    def discos(self, *rutas):
+        """st_dev de cada ruta (o de su carpeta si aún no existe). Un mismo disco puede repetirse."""
+        devs = []
+        for r in rutas:
+            r = str(r)
+            try: devs.append(os.stat(r).st_dev)
+            except OSError:
+                try: devs.append(os.stat(os.path.dirname(r) or ".").st_dev)
+                except OSError: pass
+        return devs
+
+    def _cubos_de(self, dev):
+        with self._lock:
+            cubos = self._cubos.get(dev)
+            if cubos is None:
+                tasa = self.bytes_s or (TASA_SIN_LIMITE_ADAPTATIVO * 1024**2 if self.adaptativo else 0)
+                cubos = (CuboTokens(tasa) if tasa else None, CuboTokens(self.iops) if self.iops else None)
+                self._cubos[dev] = cubos
+            return cubos
+
+    def _factor(self):
+        if not self.adaptativo: return 1.0
+        n = sesiones_activas()
+        frenar = bool(n)
+        if frenar != self._frenando:
+            self._frenando = frenar
+            estado = f"{n} sesión(es) de Plex: bajando a {int(FACTOR_CON_SESIONES * 100)}%" if frenar else "Sin sesiones de Plex: velocidad normal"
+            print(f"[{time.strftime('%H:%M:%S')}] \033[93m🐢 {estado}\033[0m", flush=True)
+        return FACTOR_CON_SESIONES if frenar else 1.0
+
+    def datos(self, devs, n):
+        """Cuenta n bytes (y una operación) en cada disco de 'devs'."""
+        if not self.activo: return
+        factor = self._factor()
+        # Sin límite fijo y sin sesiones no hay que frenar
+        if not self.bytes_s and factor == 1.0 and not self.iops: return
+        for dev in devs:
+            cubo_b, cubo_o = self._cubos_de(dev)
+            if cubo_b and (self.bytes_s or factor < 1.0): cubo_b.consumir(n, factor)
+            if cubo_o: cubo_o.consumir(1, factor)
+
+    def operacion(self, *rutas):
+        """Operación de metadatos (rename, unlink...) en el disco de cada ruta."""
+        if not self.iops: return
+        factor = self._factor()
+        for dev in self.discos(*rutas):
+            cubo_o = self._cubos_de(dev)[1]
+            if cubo_o: cubo_o.consumir(1, factor)
+
+def _entero_entorno(nombre):
+    try: return int(os.environ.get(nombre, "0"))
+    except ValueError: return 0
+
+# Compartido por el motor de movimientos y los scripts que lo usan
+LIMITES = Limitador(_entero_entorno("MOVER_LIMITE_MBS"), _entero_entorno("MOVER_LIMITE_IOPS"),
+                    os.environ.get("MOVER_ADAPTATIVO", "0") == "1")
+
+def configurar(mb_s=None, iops=None, adaptativo=None):
+    """Sobreescribe los valores de entorno solo con los argumentos dados."""
+    LIMITES.configurar(
+        LIMITES.bytes_s / 1024**2 if mb_s is None else mb_s,
+        LIMITES.iops if iops is None else iops,
+        LIMITES.adaptativo if adaptativo is None else adaptativo,
+    )
+    return LIMITES
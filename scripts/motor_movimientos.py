@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Motor de ejecución de planes de movimiento.
+
+Los scripts que proponen movimientos (05, 10...) ya no generan un .sh con
+`mv` sobre /mnt/user (que shfs resuelve copiando entre discos), sino un plan
+JSON:
+
+    {"generado_por": "05", "fecha": "...", "items": [
+        {"origen": "/mnt/user/series/Anime/X",
+         "destino": "/mnt/user/series/Uploads/BajaCalidad/Anime/X",
+         "etiqueta": "X", "tamano": 123, "disco_destino": null}, ...]}
+
+Cada item se resuelve a las ramas /mnt/diskN (o /mnt/cache) donde existe de
+verdad y se mueve con un rename en ese mismo disco (O(1)); si el destino ya
+existe se fusiona fichero a fichero. Solo se copia cuando el item fija un
+'disco_destino' distinto del disco de origen o, si se pide, para reescribir
+en el propio disco los ficheros muy fragmentados que ya se están moviendo.
+Los discos se procesan en paralelo (un hilo por disco) y el progreso se
+guarda junto al plan (<plan>.estado.json) para poder reanudar: los items
+hechos se apuntan por origen+destino con la huella del plan, así que un plan
+regenerado en la misma ruta no hereda el progreso del anterior. El estado se
+borra al guardar un plan nuevo y cuando todos sus items han terminado. Cada copia reserva su tamaño en un
+libro compartido por disco y preasigna el destino con posix_fallocate, así la
+falta de espacio se detecta antes de escribir el primer byte. Las copias y
+renames pasan por el limitador de E/S por disco (limitador_io).
+"""
+
+import os
+import re
+import json
+import hashlib
+import errno
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fragmentacion
+from limitador_io import LIMITES
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+MNT_ROOT = "/mnt"
+USER_ROOT = "/mnt/user"
+
+UID = 99   # nobody
+GID = 100  # users
+
+BUFFER_COPIA = 16 * 1024 * 1024
+SUFIJO_ESTADO = ".estado.json"
+
+# ==========================================
+# LOGS
+# ==========================================
+_lock_print = threading.Lock()
+
+def log(msg, tipo="INFO"):
+    colors = {'INFO': '\033[94m', 'OK': '\033[92m', 'WARN': '\033[93m', 'ERR': '\033[91m', 'DEST': '\033[95m', 'END': '\033[0m'}
+    c = colors.get(tipo, colors['INFO'])
+    with _lock_print:
+        print(f"[{time.strftime('%H:%M:%S')}] {c}{msg}{colors['END']}", flush=True)
+
+def formatear_tamano(b):
+    if b < 1024**2: return f"{b/1024:.1f} KB"
+    if b < 1024**3: return f"{b/1024**2:.1f} MB"
+    return f"{b/1024**3:.2f} GB"
+
+# ==========================================
+# PLANES
+# ==========================================
+def guardar_plan(ruta, items, generado_por):
+    """Escribe el plan de forma atómica. 'items' es una lista de dicts con al menos origen y destino."""
+    plan = {
+        "generado_por": generado_por,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "items": items,
+    }
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, ruta)
+    # El progreso de un plan anterior en la misma ruta no vale para este
+    borrar_estado(ruta)
+    return ruta
+
+def cargar_plan(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        plan = json.load(f)
+    for i, item in enumerate(plan.get("items", [])):
+        if not item.get("origen") or not item.get("destino"):
+            raise ValueError(f"Item {i} del plan sin origen/destino")
+    return plan
+
+def _ruta_estado(ruta_plan):
+    return ruta_plan + SUFIJO_ESTADO
+
+def huella_plan(plan):
+    """Identifica un plan concreto (fecha + items): el estado de otro plan no se reutiliza."""
+    contenido = json.dumps([plan.get("fecha"), plan.get("items", [])], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(contenido.encode("utf-8")).hexdigest()
+
+def clave_item(item):
+    return (item["origen"], item["destino"])
+
+def cargar_estado(ruta_plan, plan):
+    """Claves (origen, destino) ya completadas en ejecuciones anteriores de este mismo plan."""
+    try:
+        with open(_ruta_estado(ruta_plan), encoding="utf-8") as f:
+            estado = json.load(f)
+        if estado.get("plan") != huella_plan(plan): return set()
+        return {tuple(h) for h in estado.get("hechos", [])}
+    except (OSError, ValueError, TypeError):
+        return set()
+
+def _guardar_estado(ruta_plan, plan, hechos):
+    tmp = _ruta_estado(ruta_plan) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"plan": huella_plan(plan), "hechos": sorted(hechos)}, f, ensure_ascii=False)
+    os.replace(tmp, _ruta_estado(ruta_plan))
+
+def borrar_estado(ruta_plan):
+    try: os.remove(_ruta_estado(ruta_plan))
+    except OSError: pass
+
+# ==========================================
+# RESOLUCIÓN DE DISCOS
+# ==========================================
+def ramas_array():
+    """Discos que componen /mnt/user: disk1..N y cache (si existe)."""
+    ramas = []
+    try:
+        for d in os.listdir(MNT_ROOT):
+            if re.match(r"^disk\d+$", d) and os.path.isdir(os.path.join(MNT_ROOT, d)):
+                ramas.append(d)
+    except OSError:
+        return []
+    ramas.sort(key=lambda d: int(d[4:]))
+    if os.path.isdir(os.path.join(MNT_ROOT, "cache")): ramas.append("cache")
+    return ramas
+
+def relativa_user(ruta):
+    """'/mnt/user/series/X' o '/mnt/disk3/series/X' -> 'series/X' (None si no cuelga del array)."""
+    partes = ruta.rstrip("/").split("/")
+    if len(partes) < 4 or partes[1] != "mnt": return None
+    if partes[2] == "user" or partes[2] == "cache" or re.match(r"^disk\d+$", partes[2]):
+        return "/".join(partes[3:])
+    return None
+
+def disco_de(ruta):
+    """Nombre de la rama si la ruta es física (/mnt/disk3/... -> disk3), None si es /mnt/user."""
+    partes = ruta.split("/")
+    if len(partes) > 2 and partes[1] == "mnt" and partes[2] != "user": return partes[2]
+    return None
+
+def resolver_item(item, ramas):
+    """
+    Lista de tareas (disco, disco_destino, origen_fisico, destino_fisico) para un item.
+    Un origen en /mnt/user puede estar repartido entre varios discos: se genera una tarea por cada uno.
+    """
+    rel_o = relativa_user(item["origen"])
+    rel_d = relativa_user(item["destino"])
+    if rel_o is None or rel_d is None:
+        # Fuera del array: movimiento tal cual
+        return [(None, None, item["origen"], item["destino"])]
+
+    fijo = disco_de(item["origen"])
+    candidatos = [fijo] if fijo else ramas
+    disco_destino = item.get("disco_destino")
+    tareas = []
+    for disco in candidatos:
+        src = os.path.join(MNT_ROOT, disco, rel_o)
+        if not os.path.lexists(src): continue
+        dst = os.path.join(MNT_ROOT, disco_destino or disco, rel_d)
+        tareas.append((disco, disco_destino or disco, src, dst))
+    return tareas
+
+# ==========================================
+# RESERVAS DE ESPACIO
+# ==========================================
+class ReservasEspacio:
+    """
+    Libro de reservas por sistema de ficheros (st_dev). Cada copia reserva su
+    tamaño antes de empezar, así dos copias simultáneas hacia el mismo disco no
+    cuentan dos veces con el mismo hueco libre. Cuando posix_fallocate ya ha
+    asignado los bloques, statvfs los descuenta y la reserva se libera.
+    """
+    def __init__(self):
+        self._reservado = {}
+        self._lock = threading.Lock()
+
+    def _libre(self, dev, ruta):
+        vfs = os.statvfs(ruta)
+        return vfs.f_bavail * vfs.f_frsize - self._reservado.get(dev, 0)
+
+    def libre(self, ruta):
+        """Espacio libre en el disco de 'ruta' descontando lo reservado (0 si no se puede leer)."""
+        try:
+            dev = os.stat(ruta).st_dev
+            with self._lock: return self._libre(dev, ruta)
+        except OSError:
+            return 0
+
+    def reservar(self, ruta, tamano, margen=0):
+        """Reserva 'tamano' bytes en el disco de 'ruta' si caben dejando 'margen' libre."""
+        dev = os.stat(ruta).st_dev
+        with self._lock:
+            if self._libre(dev, ruta) - tamano < margen: return False
+            self._reservado[dev] = self._reservado.get(dev, 0) + tamano
+        return True
+
+    def liberar(self, ruta, tamano):
+        dev = os.stat(ruta).st_dev
+        with self._lock:
+            restante = self._reservado.get(dev, 0) - tamano
+            if restante > 0: self._reservado[dev] = restante
+            else: self._reservado.pop(dev, None)
+
+# Compartido por todos los hilos (y por 01, que importa este módulo)
+RESERVAS = ReservasEspacio()
+
+def preasignar(fd, tamano):
+    """
+    posix_fallocate del fichero destino: extents contiguos y ENOSPC al instante
+    en vez de a mitad de copia. False si el sistema de ficheros no lo soporta.
+    """
+    if tamano <= 0: return True
+    try:
+        os.posix_fallocate(fd, 0, tamano)
+        return True
+    except OSError as e:
+        if e.errno in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS): return False
+        raise
+
+def copiar_datos(src, tmp, etiqueta=None, total=None):
+    """
+    Copia src a tmp reservando y preasignando el espacio antes del primer byte.
+    Con 'etiqueta' informa del progreso cada 10%. Si falla borra el temporal.
+    """
+    if total is None: total = os.stat(src).st_size
+    carpeta = os.path.dirname(tmp) or "."
+    if not RESERVAS.reservar(carpeta, total):
+        raise OSError(errno.ENOSPC, f"Sin espacio para {formatear_tamano(total)}", carpeta)
+    pendiente = total
+    copiado = 0
+    siguiente = 10
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            if preasignar(fdst.fileno(), total):
+                RESERVAS.liberar(carpeta, total)
+                pendiente = 0
+            discos = LIMITES.discos(src, tmp)
+            while True:
+                buf = fsrc.read(BUFFER_COPIA)
+                if not buf: break
+                fdst.write(buf)
+                copiado += len(buf)
+                LIMITES.datos(discos, len(buf))
+                pct = copiado * 100 // total if total else 100
+                if etiqueta and pct >= siguiente:
+                    log(f"   ⏳ {etiqueta}: {pct}% de {formatear_tamano(total)}", "INFO")
+                    siguiente = pct // 10 * 10 + 10
+            # Si el origen encogió durante la copia no se deja cola preasignada
+            if copiado < total: fdst.truncate(copiado)
+    except OSError:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+    finally:
+        if pendiente: RESERVAS.liberar(carpeta, pendiente)
+    return copiado
+
+# ==========================================
+# OPERACIONES
+# ==========================================
+# Hardlinks: (st_dev, st_ino, tamaño, mtime) de origen -> primera copia hecha en destino.
+# Tras mover el primer nombre el resto queda con st_nlink == 1, por eso se busca
+# siempre; tamaño y mtime evitan confundirlo con un inodo reutilizado.
+# Los renames ya conservan los enlaces; esto es para las copias entre discos.
+_enlaces = {}
+_lock_enlaces = threading.Lock()
+
+def _asegurar_dir(path):
+    """mkdir -p aplicando permisos Unraid a cada carpeta creada."""
+    if os.path.isdir(path): return
+    padre = os.path.dirname(path)
+    if padre and padre != path: _asegurar_dir(padre)
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        return
+    try:
+        os.chown(path, UID, GID)
+        os.chmod(path, 0o2775)
+    except OSError:
+        pass
+
+def _existe_en_otra_rama(dst, disco, ramas):
+    """Un fichero con el mismo nombre en otro disco quedaría oculto en /mnt/user."""
+    rel = relativa_user(dst)
+    if rel is None: return False
+    return any(r != disco and os.path.lexists(os.path.join(MNT_ROOT, r, rel)) for r in ramas)
+
+def copiar_y_borrar(src, dst, etiqueta):
+    """Copia entre discos vía .partial con progreso; borra el origen solo si la copia terminó."""
+    st = os.stat(src)
+    clave = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _lock_enlaces: previo = _enlaces.get(clave)
+    if previo:
+        try:
+            # Otro nombre del mismo inodo ya está en destino: se rehace el enlace sin copiar datos
+            os.link(previo, dst)
+            os.unlink(src)
+            return 0
+        except OSError:
+            pass
+    total = st.st_size
+    tmp = dst + ".partial"
+    copiar_datos(src, tmp, etiqueta, total)
+    shutil.copystat(src, tmp)
+    os.rename(tmp, dst)
+    try:
+        os.chown(dst, UID, GID)
+        os.chmod(dst, 0o664)
+    except OSError:
+        pass
+    os.unlink(src)
+    if st.st_nlink > 1:
+        with _lock_enlaces: _enlaces[clave] = dst
+    return total
+
+def _reescribir_fragmentados(ruta, umbral, stats):
+    """
+    Tras un rename en el mismo disco, reescribe (copia + replace) los ficheros
+    con más de 'umbral' extents: el allocator los vuelve a colocar contiguos.
+    """
+    if not umbral: return
+    if os.path.isdir(ruta):
+        rutas = (os.path.join(r, f) for r, _, fs in os.walk(ruta) for f in fs)
+    else:
+        rutas = [ruta]
+    for p in rutas:
+        try: st = os.stat(p)
+        except OSError: continue
+        # Reescribir un fichero con hardlinks los separaría
+        if st.st_nlink > 1 or not fragmentacion.esta_fragmentado(p, umbral): continue
+        try:
+            log(f"🧩 Reescribiendo fragmentado: {os.path.basename(p)}", "INFO")
+            tmp = p + ".partial"
+            copiar_datos(p, tmp, os.path.basename(p), st.st_size)
+            shutil.copystat(p, tmp)
+            try: os.chown(tmp, st.st_uid, st.st_gid)
+            except OSError: pass
+            os.replace(tmp, p)
+            stats["reescrito"] += st.st_size
+        except OSError as e:
+            log(f"❌ No se pudo reescribir {p}: {e}", "ERR")
+
+def _mover_fichero(src, dst, mismo_disco):
+    if mismo_disco:
+        LIMITES.operacion(src)
+        os.rename(src, dst)
+        return 0
+    return copiar_y_borrar(src, dst, os.path.basename(src))
+
+def _fusionar(src, dst, disco, mismo_disco, ramas, stats, umbral=0):
+    """Fusiona el árbol src dentro de dst (ya existente). Los conflictos se dejan en origen."""
+    for root, dirs, files in os.walk(src, topdown=False):
+        rel = os.path.relpath(root, src)
+        dest_dir = dst if rel == "." else os.path.join(dst, rel)
+        for f in files:
+            s = os.path.join(root, f)
+            d = os.path.join(dest_dir, f)
+            if os.path.lexists(d) or _existe_en_otra_rama(d, disco, ramas):
+                log(f"⚠️ Conflicto: {d} ya existe. Saltando.", "WARN")
+                stats["conflictos"] += 1
+                continue
+            _asegurar_dir(dest_dir)
+            stats["copiado"] += _mover_fichero(s, d, mismo_disco)
+            stats["ficheros"] += 1
+            if mismo_disco: _reescribir_fragmentados(d, umbral, stats)
+        try: os.rmdir(root)
+        except OSError: pass
+
+def ejecutar_tarea(disco, disco_dst, src, dst, item, ramas, simular=False, umbral_extents=0):
+    """Mueve un origen físico a su destino. Devuelve dict de estadísticas."""
+    stats = {"ficheros": 0, "copiado": 0, "conflictos": 0, "reescrito": 0}
+    mismo_disco = disco == disco_dst
+    modo = "rename" if mismo_disco else f"copia -> {disco_dst}"
+    if simular:
+        log(f"🧪 [{disco or '-'}] {modo}: {src} -> {dst}", "INFO")
+        return stats
+
+    _asegurar_dir(os.path.dirname(dst))
+    es_dir = os.path.isdir(src)
+    ocupado = os.path.lexists(dst) or _existe_en_otra_rama(dst, disco, ramas)
+
+    if not ocupado:
+        if mismo_disco:
+            LIMITES.operacion(src)
+            os.rename(src, dst)
+            stats["ficheros"] += 1
+            _reescribir_fragmentados(dst, umbral_extents, stats)
+        elif es_dir:
+            _asegurar_dir(dst)
+            _fusionar(src, dst, disco, False, ramas, stats)
+        else:
+            stats["copiado"] += copiar_y_borrar(src, dst, item.get("etiqueta") or os.path.basename(src))
+            stats["ficheros"] += 1
+    elif es_dir and (os.path.isdir(dst) or not os.path.lexists(dst)):
+        # El destino ya existe (en este u otro disco): fusión fichero a fichero
+        _asegurar_dir(dst)
+        _fusionar(src, dst, disco, mismo_disco, ramas, stats, umbral_extents)
+    else:
+        log(f"⚠️ Conflicto: {dst} ya existe. Saltando.", "WARN")
+        stats["conflictos"] += 1
+    return stats
+
+# ==========================================
+# EJECUCIÓN DEL PLAN
+# ==========================================
+def ejecutar_plan(ruta_plan, hilos=4, simular=False, umbral_extents=0):
+    """
+    Ejecuta (o reanuda) un plan. Devuelve (items_ok, items_error, items_saltados).
+    Un item con conflictos (ficheros que se quedan en origen porque el destino ya
+    existe) cuenta como error y no se apunta como hecho: al reanudar se reintenta.
+    Los saltados (sin origen en el array) sí cuentan como terminados.
+    umbral_extents > 0 reescribe en destino los ficheros con más extents que ese valor.
+    """
+    plan = cargar_plan(ruta_plan)
+    items = plan["items"]
+    hechos = set() if simular else cargar_estado(ruta_plan, plan)
+    ramas = ramas_array()
+
+    if hechos:
+        log(f"♻️ Reanudando: {len(hechos)}/{len(items)} items ya completados", "DEST")
+
+    # Agrupar tareas por disco: cada disco lo atiende un único hilo
+    por_disco = {}
+    pendientes = {}
+    saltados = 0
+    for idx, item in enumerate(items):
+        if clave_item(item) in hechos: continue
+        tareas = resolver_item(item, ramas)
+        if not tareas:
+            # Nada en origen: o ya se movió fuera del motor o la ruta no existe
+            log(f"⏭️ Sin origen en el array: {item['origen']}", "WARN")
+            saltados += 1
+            if not simular: hechos.add(clave_item(item))
+            continue
+        pendientes[idx] = len(tareas)
+        for disco, disco_dst, src, dst in tareas:
+            por_disco.setdefault(disco or "-", []).append((idx, disco, disco_dst, src, dst))
+
+    total = len(pendientes)
+    lock = threading.Lock()
+    progreso = {"ok": 0, "error": 0, "terminados": 0, "bytes": 0, "reescrito": 0, "conflictos": 0}
+    errores = set()
+    con_conflictos = set()
+
+    def _trabajar(disco, tareas):
+        for idx, disco_t, disco_dst, src, dst in tareas:
+            item = items[idx]
+            try:
+                st = ejecutar_tarea(disco_t, disco_dst, src, dst, item, ramas, simular, umbral_extents)
+                fallo = False
+            except OSError as e:
+                log(f"❌ [{disco}] {src}: {e}", "ERR")
+                st = {"copiado": 0, "conflictos": 0, "reescrito": 0}
+                fallo = True
+            with lock:
+                progreso["bytes"] += st["copiado"]
+                progreso["reescrito"] += st["reescrito"]
+                progreso["conflictos"] += st["conflictos"]
+                if fallo: errores.add(idx)
+                if st["conflictos"]: con_conflictos.add(idx)
+                pendientes[idx] -= 1
+                if pendientes[idx]: continue
+                progreso["terminados"] += 1
+                if idx in errores or idx in con_conflictos:
+                    progreso["error"] += 1
+                else:
+                    progreso["ok"] += 1
+                    if not simular:
+                        hechos.add(clave_item(item))
+                        _guardar_estado(ruta_plan, plan, hechos)
+                n = progreso["terminados"]
+            etiqueta = item.get("etiqueta") or os.path.basename(item["origen"])
+            if not simular:
+                if idx in errores: log(f"📦 [{n}/{total}] [{disco}] {etiqueta}", "ERR")
+                elif idx in con_conflictos: log(f"📦 [{n}/{total}] [{disco}] {etiqueta} (con conflictos, queda pendiente)", "WARN")
+                else: log(f"📦 [{n}/{total}] [{disco}] {etiqueta}", "OK")
+
+    if por_disco:
+        log(f"🚚 {total} items en {len(por_disco)} disco(s): {', '.join(sorted(por_disco))}", "DEST")
+        with ThreadPoolExecutor(max_workers=max(1, min(hilos, len(por_disco)))) as pool:
+            for f in [pool.submit(_trabajar, d, t) for d, t in por_disco.items()]:
+                f.result()
+
+    # Plan terminado entero: el estado ya no sirve para nada. Si no, se guarda también
+    # lo saltado por falta de origen (puede no haber pasado ningún item por _trabajar)
+    if not simular:
+        if all(clave_item(item) in hechos for item in items): borrar_estado(ruta_plan)
+        elif saltados: _guardar_estado(ruta_plan, plan, hechos)
+
+    if progreso["conflictos"]:
+        log(f"⚠️ {progreso['conflictos']} ficheros en conflicto siguen en origen "
+            f"({len(con_conflictos)} items pendientes): revisa los destinos y vuelve a lanzar el plan", "WARN")
+
+    if progreso["bytes"]:
+        log(f"📊 Copiado entre discos: {formatear_tamano(progreso['bytes'])}", "INFO")
+    if progreso["reescrito"]:
+        log(f"🧩 Reescrito por fragmentación: {formatear_tamano(progreso['reescrito'])}", "INFO")
+    return progreso["ok"], progreso["error"], saltados
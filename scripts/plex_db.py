@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Acceso de solo lectura a la base de datos de Plex.
+
+Evita copiar la DB completa (varios GB) en cada ejecución:
+  1. Modo 'directo': abre la DB viva con URI `mode=ro`. Plex usa WAL, así que
+     cada consulta ve una instantánea consistente sin bloquear al servidor.
+  2. Modo 'snapshot': mantiene una copia local hecha con la API de backup de
+     SQLite (por pasos). Solo se rehace cuando cambian mtime/tamaño de la DB
+     o de su fichero -wal respecto a la última instantánea.
+  3. Modo 'auto' (defecto): intenta 'directo' y, si falla, usa 'snapshot'.
+
+Se puede forzar el modo con la variable de entorno PLEX_DB_MODO.
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+DB_PATH = "/mnt/user/appdata/plex/Library/Application Support/Plex Media Server/Plug-in Support/Databases/com.plexapp.plugins.library.db"
+
+CACHE_DIR = "/mnt/user/appdata/media-manager/datos/cache"
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "plex_snapshot.db")
+SNAPSHOT_META = SNAPSHOT_PATH + ".json"
+
+MODO = os.environ.get("PLEX_DB_MODO", "auto")  # auto | directo | snapshot
+PAGINAS_POR_PASO = 16384  # ~64 MB por paso con páginas de 4 KB
+PAUSA_ENTRE_PASOS = 0.005
+
+# ==========================================
+# UTILIDADES
+# ==========================================
+def _uri_solo_lectura(db_path):
+    return f"file:{quote(db_path)}?mode=ro"
+
+def huella_db(db_path=DB_PATH):
+    """(mtime_ns, tamaño) de la DB y de su -wal. Si no cambia, la DB tampoco."""
+    huella = {}
+    for sufijo in ("", "-wal"):
+        try:
+            st = os.stat(db_path + sufijo)
+            huella[sufijo or "db"] = [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            huella[sufijo or "db"] = None
+    return huella
+
+def _leer_meta():
+    try:
+        with open(SNAPSHOT_META, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_meta(db_path, huella):
+    with open(SNAPSHOT_META, "w", encoding="utf-8") as f:
+        json.dump({"db": db_path, "huella": huella, "fecha": time.time()}, f)
+
+# ==========================================
+# APERTURA
+# ==========================================
+def abrir_directo(db_path=DB_PATH):
+    """Conexión de solo lectura contra la DB viva de Plex."""
+    conn = sqlite3.connect(_uri_solo_lectura(db_path), uri=True, timeout=30)
+    try:
+        # Forzamos la apertura real (sqlite3 es perezoso hasta la primera consulta)
+        conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+def actualizar_snapshot(db_path=DB_PATH):
+    """
+    Devuelve la ruta de una instantánea local al día.
+    Si la huella (DB + WAL) coincide con la de la última copia, no toca nada.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    huella = huella_db(db_path)
+    meta = _leer_meta()
+    if meta.get("db") == db_path and meta.get("huella") == huella and os.path.exists(SNAPSHOT_PATH):
+        print("   [plex_db] Instantánea sin cambios, reutilizando.", flush=True)
+        return SNAPSHOT_PATH
+
+    tmp = SNAPSHOT_PATH + ".tmp"
+    if os.path.exists(tmp): os.remove(tmp)
+    inicio = time.time()
+    try:
+        src = sqlite3.connect(_uri_solo_lectura(db_path), uri=True, timeout=30)
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst, pages=PAGINAS_POR_PASO, sleep=PAUSA_ENTRE_PASOS)
+        finally:
+            dst.close()
+            src.close()
+    except sqlite3.Error as e:
+        # Último recurso: copia plana (mismo comportamiento que antes, pero cacheada)
+        print(f"   [plex_db] Backup SQLite no disponible ({e}), copiando fichero...", flush=True)
+        if os.path.exists(tmp): os.remove(tmp)
+        shutil.copy2(db_path, tmp)
+        if os.path.exists(db_path + "-wal"):
+            shutil.copy2(db_path + "-wal", tmp + "-wal")
+
+    # Restos de la instantánea anterior que no deben aplicarse a la nueva
+    for sufijo in ("-wal", "-shm"):
+        if os.path.exists(SNAPSHOT_PATH + sufijo): os.remove(SNAPSHOT_PATH + sufijo)
+    os.replace(tmp, SNAPSHOT_PATH)
+    if os.path.exists(tmp + "-wal"):
+        os.replace(tmp + "-wal", SNAPSHOT_PATH + "-wal")
+    _guardar_meta(db_path, huella)
+    print(f"   [plex_db] Instantánea actualizada en {time.time() - inicio:.1f}s.", flush=True)
+    return SNAPSHOT_PATH
+
+def conectar(db_path=DB_PATH, modo=None):
+    """Conexión sqlite3 de solo lectura según el modo configurado."""
+    modo = modo or MODO
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+
+    if modo in ("auto", "directo"):
+        try:
+            return abrir_directo(db_path)
+        except sqlite3.Error as e:
+            if modo == "directo": raise
+            print(f"   [plex_db] Apertura directa no disponible ({e}), usando instantánea.", flush=True)
+
+    snap = actualizar_snapshot(db_path)
+    return sqlite3.connect(_uri_solo_lectura(snap), uri=True)
+
+@contextmanager
+def conexion(db_path=DB_PATH, modo=None):
+    conn = conectar(db_path, modo)
+    try:
+        yield conn
+    finally:
+        conn.close()
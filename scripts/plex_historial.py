@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Historial local de visionados extraído de forma incremental de Plex.
+
+En cada ejecución solo se leen de `metadata_item_settings` las filas con
+`last_viewed_at` posterior a la marca de agua guardada, y se añaden como
+eventos (cuenta, guid, fecha) a una pequeña base SQLite propia. Así los
+totales por usuario y la actividad por meses salen de la base local sin
+volver a agregar toda la tabla de Plex.
+
+Limitaciones conocidas: si un usuario ve el mismo elemento varias veces entre
+dos extracciones solo queda el último visionado, y si se marca algo como
+"no visto" en Plex el contador local no baja.
+"""
+
+import os
+import sqlite3
+import time
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+CACHE_DIR = "/mnt/user/appdata/media-manager/datos/cache"
+HISTORIAL_DB = os.path.join(CACHE_DIR, "historial_plex.db")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS guids (id INTEGER PRIMARY KEY, guid TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS vistos (
+    account_id INTEGER NOT NULL, guid_id INTEGER NOT NULL, last_viewed_at INTEGER NOT NULL,
+    PRIMARY KEY (account_id, guid_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS eventos (
+    account_id INTEGER NOT NULL, viewed_at INTEGER NOT NULL, guid_id INTEGER NOT NULL,
+    PRIMARY KEY (account_id, viewed_at, guid_id)
+) WITHOUT ROWID;
+"""
+
+# ==========================================
+# HISTORIAL
+# ==========================================
+class HistorialVistas:
+    def __init__(self, ruta=HISTORIAL_DB):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self.conn = sqlite3.connect(ruta)
+        self.conn.executescript(ESQUEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- marca de agua ---
+    def marca_agua(self):
+        fila = self.conn.execute("SELECT valor FROM meta WHERE clave = 'last_viewed_at'").fetchone()
+        return fila[0] if fila else None
+
+    def _guardar_marca(self, valor):
+        self.conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('last_viewed_at', ?)", (valor,))
+
+    def _guid_id(self, guid):
+        self.conn.execute("INSERT OR IGNORE INTO guids (guid) VALUES (?)", (guid,))
+        return self.conn.execute("SELECT id FROM guids WHERE guid = ?", (guid,)).fetchone()[0]
+
+    # --- extracción ---
+    def actualizar(self, plex_conn):
+        """Trae de Plex solo el delta desde la última marca. Devuelve nº de filas nuevas."""
+        marca = self.marca_agua()
+        if marca is None:
+            # Primera carga: todo lo visto (incluye filas antiguas sin fecha)
+            cur = plex_conn.execute(
+                "SELECT account_id, guid, COALESCE(last_viewed_at, 0) FROM metadata_item_settings "
+                "WHERE view_count > 0")
+        else:
+            # '>=' para no perder visionados con la misma marca de tiempo; la PK evita duplicados
+            cur = plex_conn.execute(
+                "SELECT account_id, guid, last_viewed_at FROM metadata_item_settings "
+                "WHERE view_count > 0 AND last_viewed_at >= ?", (marca,))
+
+        nuevos = 0
+        nueva_marca = marca or 0
+        with self.conn:
+            for account_id, guid, viewed_at in cur:
+                if account_id is None or not guid: continue
+                gid = self._guid_id(guid)
+                self.conn.execute(
+                    "INSERT INTO vistos (account_id, guid_id, last_viewed_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (account_id, guid_id) DO UPDATE SET last_viewed_at = "
+                    "max(last_viewed_at, excluded.last_viewed_at)", (account_id, gid, viewed_at))
+                if viewed_at:
+                    antes = self.conn.total_changes
+                    self.conn.execute("INSERT OR IGNORE INTO eventos VALUES (?, ?, ?)", (account_id, viewed_at, gid))
+                    nuevos += self.conn.total_changes - antes
+                    nueva_marca = max(nueva_marca, viewed_at)
+            self._guardar_marca(nueva_marca)
+        return nuevos
+
+    # --- consultas ---
+    def resumen_por_usuario(self):
+        """account_id -> (elementos vistos, último visionado)."""
+        cur = self.conn.execute("SELECT account_id, count(*), max(last_viewed_at) FROM vistos GROUP BY account_id")
+        return {r[0]: (r[1], r[2] or 0) for r in cur}
+
+    def actividad_mensual(self, meses=6):
+        """account_id -> {'YYYY-MM': visionados} de los últimos 'meses' meses."""
+        desde = time.time() - meses * 31 * 86400
+        cur = self.conn.execute(
+            "SELECT account_id, strftime('%Y-%m', viewed_at, 'unixepoch', 'localtime'), count(*) "
+            "FROM eventos WHERE viewed_at >= ? GROUP BY 1, 2", (int(desde),))
+        actividad = {}
+        for account_id, mes, n in cur:
+            actividad.setdefault(account_id, {})[mes] = n
+        return actividad
+
+    def ultimo_visionado_por_guid(self):
+        """guid -> último visionado de cualquier usuario."""
+        cur = self.conn.execute(
+            "SELECT g.guid, max(v.last_viewed_at) FROM vistos v JOIN guids g ON g.id = v.guid_id GROUP BY v.guid_id")
+        return dict(cur)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Proveedor de metadatos de vídeo a partir de la DB de Plex.
+
+Carga con una sola consulta (media_parts + media_items) la información que
+Plex ya ha extraído de cada fichero: resolución real, códec, bitrate,
+duración y tamaño. Las rutas se remapean de /data (contenedor de Plex) a
+/mnt/user igual que hace el script 10, de modo que los informes pueden
+trabajar sin recorrer el array.
+
+El pool de scripts (pool_scripts.py) llama a precargar() una vez: los jobs que
+arranca con fork heredan las partes ya cargadas y, mientras la huella de la DB
+no cambie, iterar_metadatos las sirve desde memoria sin consultar.
+"""
+
+import os
+from bisect import bisect_left
+from collections import namedtuple
+
+import plex_db
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+DOCKER_PREFIX = "/data"
+UNRAID_PREFIX = "/mnt/user"
+
+MetaVideo = namedtuple("MetaVideo", ["width", "height", "codec", "bitrate", "duration", "size"])
+
+QUERY_PARTES = (
+    "SELECT mp.file, m.width, m.height, m.video_codec, m.bitrate, "
+    "COALESCE(mp.duration, m.duration), mp.size "
+    "FROM media_parts mp "
+    "JOIN media_items m ON m.id = mp.media_item_id "
+    "WHERE mp.file >= ? AND mp.file < ? "
+    "ORDER BY mp.file"
+)
+
+# ==========================================
+# RUTAS
+# ==========================================
+def remapear_ruta(path_raw):
+    """/data/series/... -> /mnt/user/series/..."""
+    if path_raw.startswith(DOCKER_PREFIX):
+        return path_raw.replace(DOCKER_PREFIX, UNRAID_PREFIX, 1)
+    return path_raw
+
+def ruta_plex(path_unraid):
+    """Inversa de remapear_ruta (para filtrar en SQL por prefijo)."""
+    if path_unraid.startswith(UNRAID_PREFIX):
+        return path_unraid.replace(UNRAID_PREFIX, DOCKER_PREFIX, 1)
+    return path_unraid
+
+def _rango_prefijo(prefijo):
+    # Todas las rutas que cuelgan de 'prefijo/' caen en [prefijo/, prefijo0)
+    # ('0' es el carácter siguiente a '/'), lo que permite usar el índice de file.
+    base = prefijo.rstrip("/")
+    return base + "/", base + "0"
+
+# ==========================================
+# RESOLUCIÓN
+# ==========================================
+def etiqueta_resolucion(width, height):
+    """Etiqueta tipo '1080p' a partir de las dimensiones reales. None si Plex no las conoce."""
+    w = int(width or 0)
+    h = int(height or 0)
+    if not w and not h: return None
+    # Se mira también el ancho para no degradar películas panorámicas (1920x800 sigue siendo 1080p)
+    if w >= 3200 or h >= 1600: return "2160p"
+    if w >= 2200 or h >= 1300: return "1440p"
+    if w >= 1700 or h >= 900: return "1080p"
+    if w >= 1200 or h >= 650: return "720p"
+    if h >= 560: return "576p"
+    if h >= 520: return "540p"
+    if h >= 440: return "480p"
+    if h >= 340: return "360p"
+    return "SD"
+
+# ==========================================
+# CARGA
+# ==========================================
+_precarga = {"db": None, "huella": None, "rutas": [], "metas": []}
+
+def _precarga_valida(db_path):
+    return _precarga["db"] == db_path and _precarga["huella"] == plex_db.huella_db(db_path)
+
+def precargar(db_path=plex_db.DB_PATH):
+    """Carga en memoria todas las partes de la DB si cambió desde la última vez. Devuelve cuántas hay."""
+    if _precarga_valida(db_path): return len(_precarga["rutas"])
+    huella = plex_db.huella_db(db_path)
+    _precarga["db"] = None
+    filas = sorted(_consultar("/", "0", db_path))
+    _precarga.update(db=db_path, huella=huella, rutas=[r for r, _ in filas], metas=[m for _, m in filas])
+    return len(filas)
+
+def _consultar(desde, hasta, db_path):
+    with plex_db.conexion(db_path) as conn:
+        cur = conn.execute(QUERY_PARTES, (desde, hasta))
+        for file, width, height, codec, bitrate, duration, size in cur:
+            if not file: continue
+            yield remapear_ruta(file), MetaVideo(width or 0, height or 0, codec or "", bitrate or 0, duration or 0, size or 0)
+
+def iterar_metadatos(prefijo=UNRAID_PREFIX, db_path=plex_db.DB_PATH):
+    """Genera (ruta_unraid, MetaVideo) ordenado por ruta para todo lo que cuelga de 'prefijo'."""
+    if _precarga_valida(db_path):
+        desde, hasta = _rango_prefijo(prefijo)
+        rutas, metas = _precarga["rutas"], _precarga["metas"]
+        for i in range(bisect_left(rutas, desde), bisect_left(rutas, hasta)):
+            yield rutas[i], metas[i]
+        return
+    desde, hasta = _rango_prefijo(ruta_plex(prefijo))
+    yield from _consultar(desde, hasta, db_path)
+
+def cargar_metadatos(prefijo=UNRAID_PREFIX, db_path=plex_db.DB_PATH):
+    """Diccionario ruta_unraid -> MetaVideo."""
+    return dict(iterar_metadatos(prefijo, db_path))
+
+def partes_relativas(ruta, base):
+    """Componentes de 'ruta' relativos a 'base' (vacío si no cuelga de ella)."""
+    rel = os.path.relpath(ruta, base)
+    if rel.startswith(".."): return []
+    return rel.split(os.sep)
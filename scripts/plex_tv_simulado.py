@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Servidor local que imita https://plex.tv/api/users para probar 09 sin red.
+
+Sirve el XML de usuarios con ETag y Last-Modified y responde 304 a las
+peticiones condicionales que coinciden (If-None-Match / If-Modified-Since),
+igual que plex.tv. Apunta 09 a él con la variable PLEX_TV_USERS_URL.
+
+Uso:
+  python3 plex_tv_simulado.py [--puerto N] [--token T]
+      Sirve hasta Ctrl+C. Luego: PLEX_TV_USERS_URL=http://127.0.0.1:N/api/users
+  python3 plex_tv_simulado.py --comprobar
+      Arranca en un puerto libre y comprueba la caché de 09 contra él (primera
+      descarga, caché vigente, revalidación con 304 y refresco en segundo
+      plano cuando cambian los usuarios). Usa un directorio temporal.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+import threading
+import importlib.util
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA_USUARIOS = "/api/users"
+TOKEN_DEFECTO = "token-de-prueba"
+
+USUARIOS_EJEMPLO = {
+    2: {"name": "ana", "email": "ana@example.com"},
+    3: {"name": "luis", "email": "luis@example.com"},
+}
+
+# ==========================================
+# SERVIDOR
+# ==========================================
+class PlexTVSimulado:
+    """Directorio de usuarios en memoria. 'respuestas' guarda el código de cada petición."""
+    def __init__(self, usuarios=None, token=TOKEN_DEFECTO, puerto=0):
+        self.token = token
+        self.respuestas = []
+        self._lock = threading.Lock()
+        self._version = 0
+        self.cambiar_usuarios(USUARIOS_EJEMPLO if usuarios is None else usuarios)
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", puerto), self._manejador())
+        self.servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.servidor.server_address[1]}{RUTA_USUARIOS}"
+
+    def cambiar_usuarios(self, usuarios):
+        """Nuevo contenido: cambian el ETag y el Last-Modified."""
+        raiz = ET.Element("MediaContainer", friendlyName="myPlex", identifier="com.plexapp.plugins.myplex",
+                          machineIdentifier="simulado", totalSize=str(len(usuarios)), size=str(len(usuarios)))
+        for uid, u in sorted(usuarios.items()):
+            ET.SubElement(raiz, "User", id=str(uid), title=u["name"], username=u["name"], email=u["email"])
+        cuerpo = ET.tostring(raiz, encoding="utf-8", xml_declaration=True)
+        with self._lock:
+            self._version += 1
+            self.cuerpo = cuerpo
+            self.etag = f'"{hashlib.sha1(cuerpo).hexdigest()}"'
+            # Una versión por segundo simulado: dos cambios seguidos no comparten Last-Modified
+            self.last_modified = formatdate(1_700_000_000 + self._version, usegmt=True)
+
+    def _manejador(self):
+        simulado = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                codigo = self._responder()
+                with simulado._lock: simulado.respuestas.append(codigo)
+
+            def _responder(self):
+                if self.path.split("?")[0] != RUTA_USUARIOS:
+                    return self._vacia(404)
+                if simulado.token and self.headers.get("X-Plex-Token") != simulado.token:
+                    return self._vacia(401)
+                with simulado._lock:
+                    cuerpo, etag, last_modified = simulado.cuerpo, simulado.etag, simulado.last_modified
+                # If-None-Match manda sobre If-Modified-Since (RFC 9110)
+                inm = self.headers.get("If-None-Match")
+                if (inm == etag) if inm is not None else self.headers.get("If-Modified-Since") == last_modified:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return 304
+                self.send_response(200)
+                self.send_header("Content-Type", "application/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+                return 200
+
+            def _vacia(self, codigo):
+                self.send_response(codigo)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return codigo
+
+            def log_message(self, *args):
+                pass
+
+        return Manejador
+
+    def arrancar(self):
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, name="plex-tv-simulado", daemon=True)
+        self._hilo.start()
+        return self.url
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+# ==========================================
+# COMPROBACIÓN DE LA CACHÉ DE 09
+# ==========================================
+def cargar_09():
+    ruta = os.path.join(SCRIPTS_DIR, "09_reporte_usuarios_plex.py")
+    spec = importlib.util.spec_from_file_location("reporte_usuarios_plex", ruta)
+    m = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(m)
+    return m
+
+def caducar_cache(m):
+    with open(m.USERS_CACHE_FILE, encoding="utf-8") as f: cache = json.load(f)
+    cache["fetched"] = time.time() - m.USERS_CACHE_TTL - 1
+    with open(m.USERS_CACHE_FILE, "w", encoding="utf-8") as f: json.dump(cache, f)
+
+def comprobar():
+    """Ejecuta los casos contra un servidor simulado. Devuelve el número de fallos."""
+    if SCRIPTS_DIR not in sys.path: sys.path.insert(0, SCRIPTS_DIR)
+    m = cargar_09()
+    temporal = tempfile.mkdtemp(prefix="plex_tv_simulado_")
+    m.CACHE_DIR = temporal
+    m.USERS_CACHE_FILE = os.path.join(temporal, "plex_users.json")
+    simulado = PlexTVSimulado()
+    m.USERS_URL = simulado.arrancar()
+    fallos = 0
+
+    def caso(ok, descripcion):
+        nonlocal fallos
+        print(f"  {'✅' if ok else '❌'} {descripcion}", flush=True)
+        if not ok: fallos += 1
+
+    try:
+        usuarios, refresco = m.get_api(TOKEN_DEFECTO)
+        caso(simulado.respuestas == [200] and not refresco and set(usuarios) == {1, 2, 3},
+             "Sin caché: descarga completa (200) y guarda ETag/Last-Modified")
+        cache = m.load_users_cache()
+        caso(cache and cache.get("etag") == simulado.etag and cache.get("last_modified") == simulado.last_modified,
+             "La caché guarda los validadores del servidor")
+
+        usuarios, refresco = m.get_api(TOKEN_DEFECTO)
+        caso(simulado.respuestas == [200] and not refresco and set(usuarios) == {1, 2, 3},
+             "Caché vigente: el informe sale sin tocar la red")
+
+        caducar_cache(m)
+        usuarios, refresco = m.get_api(TOKEN_DEFECTO)
+        caso(simulado.respuestas == [200] and refresco and set(usuarios) == {1, 2, 3},
+             "Caché caducada: se devuelve al instante y se pide refresco")
+        resultado = {}
+        m.refresh_users(TOKEN_DEFECTO, resultado)
+        caso(simulado.respuestas == [200, 304] and "users" not in resultado,
+             "Revalidación sin cambios: 304 y no se regenera el informe")
+        caso(time.time() - m.load_users_cache()["fetched"] < 60, "El 304 renueva la fecha de la caché")
+
+        simulado.cambiar_usuarios({**USUARIOS_EJEMPLO, 4: {"name": "eva", "email": "eva@example.com"}})
+        caducar_cache(m)
+        _, refresco = m.get_api(TOKEN_DEFECTO)
+        resultado = {}
+        hilo = threading.Thread(target=m.refresh_users, args=(TOKEN_DEFECTO, resultado))
+        hilo.start()
+        hilo.join(timeout=30)
+        caso(refresco and simulado.respuestas[-1] == 200 and set(resultado.get("users", {})) == {2, 3, 4},
+             "Refresco en segundo plano con usuarios nuevos: 200 y directorio actualizado")
+        caso(m.load_users_cache().get("etag") == simulado.etag, "La caché queda con el ETag nuevo")
+
+        os.remove(m.USERS_CACHE_FILE)
+        usuarios, _ = m.get_api("token-erroneo")
+        caso(simulado.respuestas[-1] == 401 and set(usuarios) == {1},
+             "Token rechazado y sin caché: solo el admin, sin romper el informe")
+    finally:
+        simulado.parar()
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    print(f"\n{'Todo correcto' if not fallos else f'{fallos} comprobaciones fallidas'}", flush=True)
+    return fallos
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita plex.tv/api/users")
+    parser.add_argument("--puerto", type=int, default=0, help="Puerto (0 = uno libre)")
+    parser.add_argument("--token", default=TOKEN_DEFECTO, help="X-Plex-Token aceptado ('' = cualquiera)")
+    parser.add_argument("--comprobar", action="store_true", help="Probar la caché de usuarios de 09 y salir")
+    args = parser.parse_args()
+
+    if args.comprobar:
+        sys.exit(1 if comprobar() else 0)
+
+    simulado = PlexTVSimulado(token=args.token, puerto=args.puerto)
+    print(f"Sirviendo {len(USUARIOS_EJEMPLO)} usuarios en {simulado.url}", flush=True)
+    print(f"  PLEX_TV_USERS_URL={simulado.url}", flush=True)
+    try:
+        simulado.servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulado.servidor.server_close()
+
+if __name__ == "__main__":
+    main()
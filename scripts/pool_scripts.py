@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pool de scripts precalentado (zygote).
+
+Un proceso que ya tiene importados los módulos comunes y cargados los
+metadatos de Plex escucha en un socket unix. Por cada job hace fork: el hijo
+abre una sesión nueva (para que stop_script pueda hacer killpg), aplica la
+prioridad, redirige stdout/stderr al pipe que le pasa app.py y ejecuta el
+script con runpy como __main__, igual que 'python -u script.py args'. Cada
+job sigue aislado en su propio proceso pero no paga el arranque del
+intérprete ni la carga de la DB.
+
+Protocolo (una conexión por job, mensajes JSON de una línea):
+  app -> pool: {"archivo", "args", "prioridad", "cgroup"} + fd de escritura del pipe (SCM_RIGHTS)
+  pool -> app: {"pid": N}  nada más hacer fork  |  {"error": "..."}
+  pool -> app: {"codigo": N}  al terminar (mismo criterio que Popen.returncode)
+
+Uso: python3 pool_scripts.py [--socket RUTA]   (app.py lo arranca con MM_POOL_SCRIPTS=1)
+"""
+
+import os
+import sys
+import io
+import json
+import runpy
+import signal
+import socket
+import ctypes
+import platform
+import selectors
+import traceback
+import argparse
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+SOCKET_DEFECTO = os.environ.get("MM_POOL_SOCKET", "/tmp/media-manager-pool.sock")
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Módulos que importan la mayoría de scripts: los hijos los heredan ya cargados
+MODULOS_PRECARGA = [
+    "sqlite3", "json", "csv", "html", "re", "shutil", "concurrent.futures", "collections",
+    "plex_db", "plex_metadata", "plex_historial", "uso_disco", "motor_movimientos",
+    "fragmentacion", "limitador_io", "estado_discos",
+]
+
+IOPRIO_CLASES = {"best-effort": 2, "idle": 3}
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+SYS_IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}.get(platform.machine())
+
+def log(msg):
+    print(f"[pool] {msg}", flush=True)
+
+# ==========================================
+# PRECARGA
+# ==========================================
+def precargar_modulos():
+    for nombre in MODULOS_PRECARGA:
+        try: __import__(nombre)
+        except Exception as e: log(f"No se pudo precargar {nombre}: {e}")
+
+_ultimo_error = {"msg": None}
+
+def refrescar_metadatos():
+    """Recarga los metadatos de Plex si la DB cambió (dos stat si no)."""
+    try:
+        import plex_metadata
+        n = plex_metadata.precargar()
+        _ultimo_error["msg"] = None
+        return n
+    except Exception as e:
+        # Solo se avisa una vez por error distinto, no en cada job
+        if str(e) != _ultimo_error["msg"]:
+            _ultimo_error["msg"] = str(e)
+            log(f"Metadatos de Plex no disponibles: {e}")
+        return None
+
+# ==========================================
+# HIJO
+# ==========================================
+def aplicar_prioridad(prio, cgroup):
+    """Lo mismo que preparar_hijo() de app.py: cgroup, nice e ioprio."""
+    if cgroup:
+        try:
+            with open(os.path.join(cgroup, "cgroup.procs"), "w") as f: f.write("0")
+        except OSError: pass
+    try:
+        if prio.get("nice"): os.nice(int(prio["nice"]))
+    except (OSError, ValueError): pass
+    clase = prio.get("io")
+    if SYS_IOPRIO_SET is None or clase not in IOPRIO_CLASES: return
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        nivel = min(7, (os.nice(0) + 20) // 5) if clase == "best-effort" else 0
+        libc.syscall(SYS_IOPRIO_SET, IOPRIO_WHO_PROCESS, 0, (IOPRIO_CLASES[clase] << IOPRIO_CLASS_SHIFT) | nivel)
+    except Exception: pass
+
+def ejecutar_hijo(peticion, fd_salida):
+    """Corre en el hijo tras el fork (ya con sesión propia). No vuelve: termina con os._exit."""
+    codigo = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        for sig in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        aplicar_prioridad(peticion.get("prioridad") or {}, peticion.get("cgroup"))
+
+        os.dup2(fd_salida, 1)
+        os.dup2(fd_salida, 2)
+        os.close(fd_salida)
+        # Equivalente a 'python -u': sin buffer en la salida
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), encoding="utf-8",
+                                      errors="replace", line_buffering=True, write_through=True)
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding="utf-8",
+                                      errors="backslashreplace", line_buffering=True, write_through=True)
+
+        ruta = os.path.join(SCRIPTS_DIR, os.path.basename(peticion["archivo"]))
+        sys.argv = [ruta] + [str(a) for a in peticion.get("args", [])]
+        try:
+            runpy.run_path(ruta, run_name="__main__")
+            codigo = 0
+        except SystemExit as e:
+            if e.code is None: codigo = 0
+            elif isinstance(e.code, int): codigo = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                codigo = 1
+        except KeyboardInterrupt:
+            codigo = 130
+        except BaseException:
+            traceback.print_exc()
+            codigo = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception: pass
+        os._exit(codigo)
+
+# ==========================================
+# SERVIDOR
+# ==========================================
+def enviar(conn, msg):
+    try: conn.sendall(json.dumps(msg).encode("utf-8") + b"\n")
+    except OSError: pass
+
+def conexion_cerrada(conn):
+    """True si el otro extremo ya cerró (un recv sin bloquear devuelve EOF)."""
+    try: return conn.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+    except (BlockingIOError, InterruptedError): return False
+    except OSError: return True
+
+class Pool:
+    def __init__(self, ruta_socket):
+        self.ruta_socket = ruta_socket
+        self.sel = selectors.DefaultSelector()
+        self.hijos = {}  # pid -> conexión que espera el código de salida
+
+        # Self-pipe: SIGCHLD despierta al select para recoger hijos al momento
+        self.aviso_r, self.aviso_w = os.pipe()
+        os.set_blocking(self.aviso_r, False)
+        os.set_blocking(self.aviso_w, False)
+        signal.signal(signal.SIGCHLD, lambda *a: None)
+        signal.set_wakeup_fd(self.aviso_w)
+
+        if os.path.exists(ruta_socket): os.unlink(ruta_socket)
+        self.srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.srv.bind(ruta_socket)
+        os.chmod(ruta_socket, 0o600)
+        self.srv.listen(16)
+        self.sel.register(self.srv, selectors.EVENT_READ, self.aceptar)
+        self.sel.register(self.aviso_r, selectors.EVENT_READ, self.recoger_hijos)
+
+    def aceptar(self, _):
+        conn, _ = self.srv.accept()
+        self.sel.register(conn, selectors.EVENT_READ, self.atender)
+
+    def atender(self, conn):
+        self.sel.unregister(conn)
+        try:
+            datos, fds, _, _ = socket.recv_fds(conn, 64 * 1024, 1)
+        except OSError:
+            conn.close()
+            return
+        try:
+            peticion = json.loads(datos.decode("utf-8"))
+            if not fds: raise ValueError("falta el descriptor de salida")
+            if not os.path.isfile(os.path.join(SCRIPTS_DIR, os.path.basename(peticion["archivo"]))):
+                raise ValueError(f"No encuentro {peticion['archivo']}")
+        except (ValueError, KeyError) as e:
+            for fd in fds: os.close(fd)
+            enviar(conn, {"error": str(e)})
+            conn.close()
+            return
+
+        if conexion_cerrada(conn):
+            # app.py se cansó de esperar y ya lo lanzó por su cuenta: no ejecutarlo dos veces
+            for fd in fds: os.close(fd)
+            conn.close()
+            log(f"{peticion['archivo']}: la petición ya no tiene quien la espere, se descarta")
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            # Sesión propia antes que nada: desde aquí el killpg de stop_script solo alcanza al job
+            os.setsid()
+            # Hijo: fuera todo lo del servidor
+            self.sel.close()
+            self.srv.close()
+            for c in self.hijos.values(): c.close()
+            conn.close()
+            os.close(self.aviso_r)
+            os.close(self.aviso_w)
+            # Si la DB cambió, el job carga los metadatos nuevos él mismo
+            refrescar_metadatos()
+            ejecutar_hijo(peticion, fds[0])
+        os.close(fds[0])
+        self.hijos[pid] = conn
+        enviar(conn, {"pid": pid})
+        log(f"{peticion['archivo']} -> pid {pid}")
+        # Después de responder: así los siguientes jobs nacen con los metadatos al día
+        # sin que app.py espere la recarga para recibir el pid
+        refrescar_metadatos()
+
+    def recoger_hijos(self, _):
+        try:
+            while os.read(self.aviso_r, 512): pass
+        except BlockingIOError: pass
+        while self.hijos:
+            try: pid, estado = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError: break
+            if pid == 0: break
+            conn = self.hijos.pop(pid, None)
+            if conn:
+                enviar(conn, {"codigo": os.waitstatus_to_exitcode(estado)})
+                conn.close()
+
+    def servir(self):
+        log(f"Escuchando en {self.ruta_socket} (pid {os.getpid()})")
+        while True:
+            for clave, _ in self.sel.select(timeout=5):
+                clave.data(clave.fileobj)
+            # Por si se perdió algún SIGCHLD
+            self.recoger_hijos(None)
+
+def ya_en_marcha(ruta_socket):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(ruta_socket)
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Pool de scripts precalentado")
+    parser.add_argument("--socket", default=SOCKET_DEFECTO, help="Ruta del socket unix")
+    args = parser.parse_args()
+
+    if ya_en_marcha(args.socket):
+        log(f"Ya hay un pool escuchando en {args.socket}")
+        return
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    precargar_modulos()
+    n = refrescar_metadatos()
+    if n is not None: log(f"Metadatos de Plex precargados: {n} partes")
+
+    signal.signal(signal.SIGTERM, lambda *a: sys.exit(0))
+    pool = Pool(args.socket)
+    try:
+        pool.servir()
+    finally:
+        try: os.unlink(args.socket)
+        except OSError: pass
+
+if __name__ == "__main__":
+    main()
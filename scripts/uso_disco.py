@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Contabilidad de espacio que entiende de hardlinks.
+
+Sumar st_size por ruta cuenta dos veces los ficheros enlazados (lo normal con
+las descargas que se importan con hardlink). UsoDisco distingue:
+
+  - aparente: suma de st_size de cada ruta (lo que se ve en el explorador)
+  - real:     st_size de cada inodo una sola vez (lo que ocupa de verdad)
+
+La clave es (st_dev, st_ino). Solo se recuerdan los inodos con st_nlink > 1,
+así que la memoria no crece con la biblioteca. Sobre /mnt/user los inodos
+solo son fiables si shfs tiene activado el soporte de hardlinks; para
+resultados exactos conviene recorrer /mnt/diskN.
+"""
+
+import os
+
+class UsoDisco:
+    def __init__(self, vistos=None):
+        self.aparente = 0
+        self.real = 0
+        self.ficheros = 0
+        self.enlazados = 0
+        # Se puede compartir 'vistos' entre contadores para que un inodo solo cuente una vez en total
+        self.vistos = set() if vistos is None else vistos
+        # Inodos añadidos desde el último sacar_diario() (para checkpoints), None si no se usa
+        self.diario = None
+
+    def sumar(self, st):
+        """Añade un os.stat_result. Devuelve los bytes reales que aporta (0 si el inodo ya se contó)."""
+        self.aparente += st.st_size
+        self.ficheros += 1
+        if st.st_nlink > 1:
+            clave = (st.st_dev, st.st_ino)
+            if clave in self.vistos:
+                self.enlazados += 1
+                return 0
+            self.vistos.add(clave)
+            if self.diario is not None: self.diario.append(clave)
+        self.real += st.st_size
+        return st.st_size
+
+    def sumar_ruta(self, ruta, seguir_enlaces=False):
+        """seguir_enlaces: un symlink cuenta con el tamaño de su destino (como os.path.getsize)."""
+        try: st = os.stat(ruta, follow_symlinks=seguir_enlaces)
+        except OSError: return 0
+        return self.sumar(st)
+
+    def iniciar_diario(self):
+        self.diario = []
+
+    def sacar_diario(self):
+        """Inodos nuevos desde la última llamada, como listas [dev, ino] (serializables a JSON)."""
+        nuevos, self.diario = self.diario or [], []
+        return [list(c) for c in nuevos]
+
+    def contadores(self):
+        return [self.aparente, self.real, self.ficheros, self.enlazados]
+
+    def aporte_desde(self, antes):
+        """Lo sumado desde que contadores() devolvió 'antes': lo que aporta una unidad de checkpoint."""
+        return [a - b for a, b in zip(self.contadores(), antes)]
+
+    def restaurar(self, aporte=None, inodos=()):
+        """Reañade lo que aportó una unidad de un checkpoint (aporte_desde) y sus inodos ya vistos.
+        Suma en vez de sobrescribir: lo contado antes en esta ejecución se conserva."""
+        if aporte:
+            ap, real, fich, enl = aporte
+            self.aparente += ap
+            self.real += real
+            self.ficheros += fich
+            self.enlazados += enl
+        self.vistos.update(tuple(c) for c in inodos)
+
+    @property
+    def ahorro(self):
+        return max(0, self.aparente - self.real)